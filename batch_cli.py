@@ -0,0 +1,227 @@
+"""命令行批量处理（无需 Tk）
+
+用法:
+    python -m image_metadata_editor batch 输入路径/通配符... -o 输出目录 [操作选项]
+    python -m image_metadata_editor cache stats|clear
+
+示例:
+    python -m image_metadata_editor batch "photos/**/*.jpg" -o out --strip
+    python -m image_metadata_editor batch photos -o out --strip-private --resize 1920x1080 --crop center
+
+每处理完一个文件输出一行进度，有文件失败时以非零状态退出。
+"""
+import argparse
+import glob
+import os
+import signal
+import sys
+
+from batch_engine import (BatchController, BatchJob, EXECUTOR_PROCESS, EXECUTOR_THREAD, IMAGE_EXTENSIONS,
+                          ORDER_TYPES, ORDER_INPUT, STATUS_CANCELLED, apply_plan, default_workers, plan_jobs,
+                          run_batch)
+from batch_pipeline import BatchOptions, CROP_POSITIONS, RESIZE_BALANCED, RESIZE_MODES
+from batch_journal import default_journal_path
+from batch_plan import CLEAN_COPY, CLEAN_HARDLINK, format_summary, summarize
+from output_cache import DEFAULT_CACHE_SIZE, CacheConfig, OutputCache, default_cache_dir, format_stats
+from duplicate_finder import find_duplicates
+from folder_scan import iter_image_files
+from run_report import RunReport, format_report
+
+
+def _parse_size(value):
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的尺寸: {value}（格式为 宽x高，如 1920x1080）")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError("尺寸必须大于0")
+    return width, height
+
+
+def _positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的数值: {value}")
+    if number <= 0:
+        raise argparse.ArgumentTypeError("数值必须大于0")
+    return number
+
+
+def expand_inputs(patterns):
+    """展开输入路径：文件原样保留，目录递归查找图片，其他按通配符匹配
+
+    结果去重并保持首次出现的顺序。
+    """
+    files = []
+    seen = set()
+
+    def add(path):
+        path = os.path.normpath(path)
+        if path not in seen:
+            seen.add(path)
+            files.append(path)
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for path, _ in iter_image_files(pattern):
+                add(path)
+        elif os.path.isfile(pattern):
+            add(pattern)
+        else:
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                    add(path)
+    return files
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m image_metadata_editor batch",
+        description="批量处理图片（清除元数据、调整尺寸、裁剪）"
+    )
+    parser.add_argument('inputs', nargs='+', help="输入文件、目录或通配符（支持 **）")
+    parser.add_argument('-o', '--output-dir', required=True, help="输出目录")
+    parser.add_argument('--strip', action='store_true', help="清除全部元数据")
+    parser.add_argument('--strip-private', action='store_true',
+                        help="仅清除隐私信息（GPS/序列号/缩略图/制造商注释）")
+    parser.add_argument('--resize', type=_parse_size, metavar='宽x高', help="调整到指定尺寸")
+    parser.add_argument('--no-keep-ratio', action='store_true', help="调整尺寸时不保持宽高比")
+    parser.add_argument('--crop', nargs='?', const='center', choices=list(CROP_POSITIONS.values()),
+                        help="缩放填满目标尺寸后按位置裁剪（需要 --resize，默认 center）")
+    parser.add_argument('--resize-mode', choices=list(RESIZE_MODES.values()), default=RESIZE_BALANCED,
+                        help="缩小 JPEG 时的解码方式：best 全尺寸解码，balanced 缩放解码后保留目标尺寸 2 倍以上（默认），"
+                             "fast 缩放解码到不小于目标尺寸")
+    parser.add_argument('--quality', type=_positive_int, default=95, help="JPEG/WebP 编码质量")
+    parser.add_argument('-j', '--workers', type=_positive_int, default=default_workers(),
+                        help="并发数（默认 CPU 核心数）")
+    parser.add_argument('--executor', choices=(EXECUTOR_PROCESS, EXECUTOR_THREAD), default=EXECUTOR_PROCESS,
+                        help="执行方式（默认 process）")
+    parser.add_argument('--order', choices=list(ORDER_TYPES.values()), default=ORDER_INPUT,
+                        help="处理顺序：input 按输入顺序，smallest 小文件优先，largest 大文件优先")
+    parser.add_argument('--memory-budget', type=_positive_int, metavar='MB',
+                        help="同时解码的像素数据内存上限（MB，默认物理内存的一半）")
+    parser.add_argument('--journal', metavar='PATH',
+                        help="断点续传日志路径（默认保存在输出目录中）")
+    parser.add_argument('--no-journal', action='store_true', help="不记录日志，重新处理全部文件")
+    parser.add_argument('--precheck', choices=(CLEAN_COPY, CLEAN_HARDLINK),
+                        help="先只读文件头预检，已符合要求的文件直接复制（copy）或硬链接（hardlink）")
+    parser.add_argument('--plan-only', action='store_true', help="只预检并输出各分类的文件数，不处理")
+    parser.add_argument('--dedup', action='store_true',
+                        help="按内容检测重复的输入文件，内容相同的文件只处理一次，输出复制给其余文件")
+    parser.add_argument('--report', action='append', default=[], metavar='PATH',
+                        help="处理结束后保存运行报告，按扩展名为 .json、.csv 或 .prom（Prometheus 文本格式），可重复指定")
+    _add_cache_arguments(parser)
+    parser.add_argument('--cache', action='store_true', help="使用输出缓存，相同文件用相同参数处理过时直接复制")
+    return parser
+
+
+def _add_cache_arguments(parser):
+    parser.add_argument('--cache-dir', default=default_cache_dir(), help="缓存目录")
+    parser.add_argument('--cache-size', type=_positive_int, default=DEFAULT_CACHE_SIZE // (1024 * 1024), metavar='MB',
+                        help="缓存大小上限（MB），超过时淘汰最久未使用的条目")
+
+
+def cache_main(argv=None):
+    """python -m image_metadata_editor cache stats|clear"""
+    parser = argparse.ArgumentParser(prog="python -m image_metadata_editor cache", description="管理输出缓存")
+    parser.add_argument('action', choices=('stats', 'clear'), help="stats 显示统计，clear 清空缓存")
+    _add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    cache = OutputCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    try:
+        if args.action == 'clear':
+            cache.clear()
+            print("输出缓存已清空")
+        else:
+            print(format_stats(cache.stats()))
+            print(f"位置: {args.cache_dir}")
+    finally:
+        cache.close()
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if not (args.strip or args.strip_private or args.resize):
+        parser.error("请至少选择一个操作（--strip、--strip-private 或 --resize）")
+    if args.crop and not args.resize:
+        parser.error("--crop 需要同时指定 --resize")
+
+    # 输出目录在输入目录之内时，不处理上次运行的输出
+    output_root = os.path.join(os.path.abspath(args.output_dir), '')
+    files = [path for path in expand_inputs(args.inputs) if not os.path.abspath(path).startswith(output_root)]
+    if not files:
+        print("没有找到要处理的图片", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    options = BatchOptions(
+        strip_metadata=args.strip,
+        strip_private=args.strip_private,
+        resize_to=args.resize,
+        keep_ratio=not args.no_keep_ratio,
+        crop=bool(args.crop),
+        crop_position=args.crop or 'center',
+        quality=args.quality,
+        resize_mode=args.resize_mode
+    )
+    cache = CacheConfig(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache else None
+    jobs = [BatchJob(path, path, args.output_dir, options, None, None, cache=cache) for path in files]
+
+    if args.dedup:
+        duplicates = find_duplicates((path, None) for path in files)
+        print(f"重复检测: {len(duplicates)} 个文件与其他文件内容相同，将直接复制输出", flush=True)
+        jobs = [job._replace(duplicate_of=duplicates.get(job.source_path)) for job in jobs]
+
+    if args.precheck or args.plan_only:
+        plans = plan_jobs(jobs, args.executor, args.workers)
+        print(f"预检: {format_summary(summarize(plans))}", flush=True)
+        if args.plan_only:
+            return 0
+        jobs = apply_plan(jobs, plans, args.precheck)
+
+    # Ctrl+C 时不再提交新任务，等待正在处理的文件完成后退出
+    controller = BatchController()
+    previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: controller.cancel())
+    try:
+        total = len(jobs)
+        failed = 0
+        report = RunReport()
+        memory_budget = args.memory_budget * 1024 * 1024 if args.memory_budget else None
+        journal_path = None if args.no_journal else (args.journal or default_journal_path(args.output_dir))
+        results = run_batch(jobs, args.executor, args.workers, controller, args.order,
+                            memory_budget=memory_budget, journal_path=journal_path)
+        for completed, result in enumerate(results, 1):
+            if result.status == STATUS_CANCELLED:
+                failed += 1
+                continue
+            report.add(result)
+            if result.ok:
+                print(f"[{completed}/{total}] 完成 {result.job_id} -> {result.output_path}（{result.status}）", flush=True)
+            else:
+                failed += 1
+                print(f"[{completed}/{total}] 失败 {result.job_id}: {result.status}", flush=True)
+
+        report.finish()
+        if args.report:
+            print(format_report(report.summary()))
+            for path in args.report:
+                report.write(path)
+                print(f"运行报告已保存: {path}")
+
+        if controller.cancelled:
+            print(f"处理已取消: 成功 {total - failed}，失败或未处理 {failed}")
+            return 130
+        print(f"处理完成: 成功 {total - failed}，失败 {failed}")
+        return 1 if failed else 0
+    finally:
+        # 在进程内调用时恢复原来的处理方式
+        signal.signal(signal.SIGINT, previous_handler)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,471 @@
+"""批量处理执行引擎
+
+把每个文件描述为可 pickle 的 BatchJob，交给线程池或进程池执行，
+按完成顺序逐个返回 BatchResult。进程池可以绕开 GIL，
+让 piexif 解析、标签转换等 Python 代码在多核上并行。
+"""
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+import signal
+import threading
+from collections import namedtuple
+
+from batch_journal import BatchJournal, operation_key
+from batch_plan import CLEAN_HARDLINK, PLAN_CLEAN, classify_file, link_or_copy
+from batch_pipeline import CROP_POSITIONS, estimate_working_set, process_image
+from output_cache import open_cache
+from run_report import StageTimer
+
+EXECUTOR_THREAD = 'thread'
+EXECUTOR_PROCESS = 'process'
+
+# 批量处理支持的图片扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
+# 执行方式：显示名称 -> 取值
+EXECUTOR_TYPES = {
+    "线程": EXECUTOR_THREAD,
+    "进程": EXECUTOR_PROCESS,
+}
+
+# 处理顺序
+ORDER_INPUT = 'input'
+ORDER_SMALLEST_FIRST = 'smallest'
+ORDER_LARGEST_FIRST = 'largest'
+
+# 处理顺序：显示名称 -> 取值
+ORDER_TYPES = {
+    "按列表顺序": ORDER_INPUT,
+    "小文件优先": ORDER_SMALLEST_FIRST,
+    "大文件优先": ORDER_LARGEST_FIRST,
+}
+
+# 取消后未开始的任务使用的状态文字
+STATUS_CANCELLED = "已取消"
+
+# 日志中已完成、本次跳过的任务使用的状态文字
+STATUS_SKIPPED = "已完成（跳过）"
+
+# 默认内存预算占物理内存的比例，无法获取物理内存时使用固定值
+MEMORY_BUDGET_RATIO = 0.5
+FALLBACK_MEMORY_BUDGET = 1024 * 1024 * 1024
+
+# 等待任务完成时检查暂停/取消的间隔（秒）
+SCHEDULER_POLL_SECONDS = 0.1
+
+# 单个文件的处理任务，只包含可 pickle 的数据
+#   job_id: 调用方用于对应结果的标识（如文件路径）
+#   metadata: 要写入的 {标签名: 值}，None 表示不写入
+#   preset_name: 预设名称，仅用于状态文字
+#   size: 文件大小（字节），用于排序，None 表示需要时再读取
+#   output_path: 输出路径，None 表示由 plan_output_paths 生成
+#   clean_action: 预检认为已符合要求时的处理方式（CLEAN_COPY/CLEAN_HARDLINK），None 表示正常处理
+#   cache: output_cache.CacheConfig，None 表示不使用输出缓存
+#   duplicate_of: 内容相同的另一个任务的 job_id，该任务完成后直接复制其输出，None 表示正常处理
+BatchJob = namedtuple('BatchJob', ['job_id', 'source_path', 'output_dir', 'options', 'metadata', 'preset_name', 'size',
+                                   'output_path', 'clean_action', 'cache', 'duplicate_of'],
+                      defaults=(None, None, None, None, None))
+
+# 运行报告中的附加耗时项
+TIMING_COPY = 'copy'      # 复制/硬链接已符合要求的文件或重复文件的输出
+TIMING_CACHE = 'cache'    # 计算缓存键、查找并取出缓存的输出
+
+# 处理结果：ok 为是否成功，status 为状态文字（失败时为错误信息）
+#   stats: {'timings': {阶段: 秒}, 'bytes_in': 输入字节数, 'bytes_out': 输出字节数, 'worker': 执行的工作者}，
+#       未执行时为 None；在调度线程中复制的重复文件没有 'worker'
+BatchResult = namedtuple('BatchResult', ['job_id', 'ok', 'status', 'output_path', 'stats'], defaults=(None,))
+
+
+def default_workers():
+    """默认并发数：CPU 核心数"""
+    return os.cpu_count() or 1
+
+
+def describe_operations(options):
+    """返回 (文件名前缀片段, 状态文字片段) 两个列表"""
+    operations = []
+    status = []
+    if options.strip_metadata:
+        operations.append("清除元数据")
+        status.append("已清除元数据")
+    elif options.strip_private:
+        operations.append("清除隐私信息")
+        status.append("已清除隐私信息")
+
+    if options.resize_to is not None:
+        width, height = options.resize_to
+        if options.crop:
+            position_name = {v: k for k, v in CROP_POSITIONS.items()}.get(options.crop_position, options.crop_position)
+            operations.append(f"裁剪_{width}x{height}_{position_name}")
+            status.append(f"已裁剪至 {width}x{height}")
+        else:
+            operations.append(f"调整尺寸_{width}x{height}")
+            status.append(f"已调整为 {width}x{height}")
+    return operations, status
+
+
+def output_path_for(source_path, output_dir, options, unique=False):
+    """生成输出路径，同样的输入和操作总是得到同样的路径
+
+    Args:
+        unique: 为 True 时在文件名后附加源文件完整路径的短哈希，
+            用于区分不同目录中的同名文件
+    """
+    name, ext = os.path.splitext(os.path.basename(source_path))
+    operations, _ = describe_operations(options)
+    new_name = "_".join(operations) if operations else "processed"
+    if unique:
+        digest = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:8]
+        name = f"{name}_{digest}"
+    return os.path.join(output_dir, f"{new_name}_{name}{ext}")
+
+
+def plan_output_paths(jobs):
+    """为没有指定输出路径的任务生成确定的输出路径
+
+    同一批中输出文件名相同的任务（不同目录中的同名文件）都附加路径哈希，
+    结果只取决于任务本身，与处理顺序和输出目录中已有的文件无关。
+    """
+    paths = [output_path_for(job.source_path, job.output_dir, job.options) for job in jobs]
+    counts = {}
+    for job, path in zip(jobs, paths):
+        if job.output_path is None:
+            key = os.path.normcase(path)
+            counts[key] = counts.get(key, 0) + 1
+
+    result = []
+    for job, path in zip(jobs, paths):
+        if job.output_path is None:
+            if counts[os.path.normcase(path)] > 1:
+                path = output_path_for(job.source_path, job.output_dir, job.options, unique=True)
+            job = job._replace(output_path=path)
+        result.append(job)
+    return result
+
+
+def _worker_id():
+    """当前工作进程/线程的标识"""
+    return f"{os.getpid()}-{threading.get_ident()}"
+
+
+def _job_stats(timer, source_path, output_path=None, worker=None):
+    stats = {'timings': timer.timings, 'bytes_in': 0, 'bytes_out': 0}
+    if worker is not None:
+        stats['worker'] = worker
+    try:
+        stats['bytes_in'] = os.path.getsize(source_path)
+        if output_path is not None:
+            stats['bytes_out'] = os.path.getsize(output_path)
+    except OSError:
+        pass
+    return stats
+
+
+def run_job(job):
+    """处理单个任务（在工作线程或工作进程中执行）"""
+    timer = StageTimer()
+    try:
+        output_path = job.output_path or output_path_for(job.source_path, job.output_dir, job.options)
+        if job.clean_action is not None:
+            with timer.stage(TIMING_COPY):
+                link_or_copy(job.source_path, output_path, job.clean_action)
+            action = "已硬链接" if job.clean_action == CLEAN_HARDLINK else "已复制"
+            return BatchResult(job.job_id, True, f"已符合要求，{action}", output_path,
+                               _job_stats(timer, job.source_path, output_path, _worker_id()))
+
+        _, status = describe_operations(job.options)
+        if job.preset_name:
+            status.append(f"已应用{job.preset_name}预设")
+
+        # 先写入临时文件，完整写出后再改名，中断时不会留下不完整的输出
+        temp_path = output_path + ".part"
+        cache = cache_key = None
+        if job.cache is not None:
+            try:
+                with timer.stage(TIMING_CACHE):
+                    cache = open_cache(job.cache)
+                    cache_key = cache.key_for(job.source_path, job.options, job.metadata, job.preset_name)
+                    hit = cache.fetch(cache_key, temp_path)
+                    if hit:
+                        os.replace(temp_path, output_path)
+                if hit:
+                    status.append("来自缓存")
+                    return BatchResult(job.job_id, True, ", ".join(status), output_path,
+                                       _job_stats(timer, job.source_path, output_path, _worker_id()))
+            except Exception:
+                # 缓存不可用时照常处理
+                cache = None
+
+        result = process_image(job.source_path, temp_path, job.options, job.metadata, timer)
+        if result is not True:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return BatchResult(job.job_id, False, result, None, _job_stats(timer, job.source_path, worker=_worker_id()))
+        os.replace(temp_path, output_path)
+
+        if cache is not None:
+            try:
+                with timer.stage(TIMING_CACHE):
+                    cache.store(cache_key, output_path)
+            except Exception:
+                pass
+        return BatchResult(job.job_id, True, ", ".join(status) if status else "处理完成", output_path,
+                           _job_stats(timer, job.source_path, output_path, _worker_id()))
+    except Exception as e:
+        return BatchResult(job.job_id, False, f"错误: {str(e)}", None)
+
+
+def split_duplicates(jobs):
+    """把重复文件的任务从任务列表中分出
+
+    只有被依赖的任务在同一批中、且操作参数和写入的元数据都相同时才复制其输出，
+    否则照常处理。
+
+    Returns:
+        (需要处理的任务列表, {被依赖任务的 job_id: [重复文件的任务, ...]})
+    """
+    by_id = {job.job_id: job for job in jobs}
+    primaries = []
+    followers = {}
+    for job in jobs:
+        original = by_id.get(job.duplicate_of)
+        if (original is not None and original.duplicate_of is None and original.metadata == job.metadata
+                and operation_key(original.options, original.preset_name) == operation_key(job.options, job.preset_name)):
+            followers.setdefault(original.job_id, []).append(job)
+        else:
+            primaries.append(job._replace(duplicate_of=None))
+    return primaries, followers
+
+
+def copy_duplicate_output(job, result):
+    """按被依赖任务的结果（BatchResult）生成重复文件的结果，成功时复制其输出"""
+    if not result.ok:
+        return BatchResult(job.job_id, False, result.status, None)
+    timer = StageTimer()
+    try:
+        with timer.stage(TIMING_COPY):
+            link_or_copy(result.output_path, job.output_path)
+    except Exception as e:
+        return BatchResult(job.job_id, False, f"错误: {str(e)}", None)
+    return BatchResult(job.job_id, True, f"与 {os.path.basename(str(result.job_id))} 内容相同，已复制", job.output_path,
+                       _job_stats(timer, job.source_path, job.output_path))
+
+
+class BatchController:
+    """批量任务的暂停/继续/取消控制，可在任意线程中调用
+
+    控制是协作式的：暂停和取消只影响尚未提交的任务，已在执行的文件会正常完成。
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        # 让暂停中的调度循环立即醒来并结束
+        self._running.set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def wait_running(self, timeout):
+        """暂停时最多等待 timeout 秒，返回是否处于运行状态"""
+        return self._running.wait(timeout)
+
+
+def default_memory_budget():
+    """默认的像素数据内存预算（字节）：物理内存的一半"""
+    try:
+        total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return FALLBACK_MEMORY_BUDGET
+    return int(total * MEMORY_BUDGET_RATIO) if total > 0 else FALLBACK_MEMORY_BUDGET
+
+
+def _job_memory(job):
+    if job.clean_action is not None:
+        return 0
+    try:
+        return estimate_working_set(job.source_path, job.options)
+    except Exception:
+        # 无法读取文件头的任务会在处理时报错，不占用预算
+        return 0
+
+
+def _job_size(job):
+    if job.size is not None:
+        return job.size
+    try:
+        return os.path.getsize(job.source_path)
+    except OSError:
+        return 0
+
+
+def order_jobs(jobs, order=ORDER_INPUT):
+    """按处理顺序排列任务（小文件优先可以更快看到结果，大文件优先总耗时更短）"""
+    if order == ORDER_SMALLEST_FIRST:
+        return sorted(jobs, key=_job_size)
+    if order == ORDER_LARGEST_FIRST:
+        return sorted(jobs, key=_job_size, reverse=True)
+    if order == ORDER_INPUT:
+        return list(jobs)
+    raise ValueError(f"未知的处理顺序: {order}")
+
+
+def _ignore_sigint():
+    # 工作进程忽略 Ctrl+C，由主进程通过 BatchController 协作取消
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _classify_job(job):
+    return classify_file(job.source_path, job.options, bool(job.metadata))
+
+
+def plan_jobs(jobs, executor_type=EXECUTOR_THREAD, workers=None):
+    """并行预检所有任务（只读取文件头），返回与 jobs 一一对应的 PLAN_* 列表"""
+    with create_executor(executor_type, workers) as executor:
+        return list(executor.map(_classify_job, jobs, chunksize=64))
+
+
+def apply_plan(jobs, plans, clean_action):
+    """把预检为无需处理的任务改为直接复制/硬链接"""
+    return [job._replace(clean_action=clean_action) if plan == PLAN_CLEAN else job
+            for job, plan in zip(jobs, plans)]
+
+
+def create_executor(executor_type=EXECUTOR_THREAD, workers=None):
+    """创建线程池或进程池
+
+    进程池使用 spawn 方式启动，避免在已加载 Tk 的进程中 fork。
+    """
+    workers = workers or default_workers()
+    if executor_type == EXECUTOR_PROCESS:
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_ignore_sigint
+        )
+    if executor_type == EXECUTOR_THREAD:
+        return concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    raise ValueError(f"未知的执行方式: {executor_type}")
+
+
+def run_batch(jobs, executor_type=EXECUTOR_THREAD, workers=None, controller=None, order=ORDER_INPUT,
+              max_in_flight=None, memory_budget=None, journal_path=None):
+    """执行一批任务，按完成顺序逐个产出 BatchResult
+
+    任务不会一次性全部提交，同时在执行器中的任务数不超过 max_in_flight，
+    因此暂停/取消能在几个文件之内生效。取消后未开始的任务以 STATUS_CANCELLED 产出。
+
+    提交前只读取文件头估算解码后的像素内存，已提交任务的估算之和加上新任务
+    超过 memory_budget 时先等待；单个文件就超过预算时，等其他任务完成后单独处理。
+
+    指定 journal_path 时把每个结果记入日志，日志中已成功完成的任务以 STATUS_SKIPPED 产出，
+    失败的任务重新处理。
+
+    设置了 duplicate_of 的任务不单独处理，等内容相同的任务完成后复制其输出
+    （见 split_duplicates）。
+
+    Args:
+        jobs: BatchJob 列表
+        executor_type: EXECUTOR_THREAD 或 EXECUTOR_PROCESS
+        workers: 并发数，None 表示 CPU 核心数
+        controller: BatchController，None 表示不可暂停/取消
+        order: ORDER_INPUT、ORDER_SMALLEST_FIRST 或 ORDER_LARGEST_FIRST
+        max_in_flight: 同时提交的任务数上限，None 表示并发数的 2 倍
+        memory_budget: 像素数据内存预算（字节），None 表示物理内存的一半
+        journal_path: 日志文件路径，None 表示不记录
+    """
+    workers = workers or default_workers()
+    max_in_flight = max_in_flight or workers * 2
+    memory_budget = memory_budget or default_memory_budget()
+    controller = controller or BatchController()
+    pending, followers = split_duplicates(plan_output_paths(jobs))
+    pending = order_jobs(pending, order)
+    pending.reverse()  # 从末尾弹出
+    # 日志只在本线程中读写
+    journal = BatchJournal(journal_path) if journal_path else None
+
+    try:
+        with create_executor(executor_type, workers) as executor:
+            in_flight = {}       # future -> (任务, 估算内存)
+            reserved = 0         # 已提交任务的估算内存之和
+            next_memory = None   # 下一个待提交任务的估算内存
+            while pending or in_flight:
+                if controller.cancelled:
+                    while pending:
+                        job = pending.pop()
+                        yield BatchResult(job.job_id, False, STATUS_CANCELLED, None)
+                        for follower in followers.pop(job.job_id, ()):
+                            yield BatchResult(follower.job_id, False, STATUS_CANCELLED, None)
+                elif not controller.paused:
+                    while pending and len(in_flight) < max_in_flight:
+                        if journal is not None and next_memory is None:
+                            output_path = journal.completed_output(pending[-1])
+                            if output_path is not None:
+                                result = BatchResult(pending.pop().job_id, True, STATUS_SKIPPED, output_path)
+                                yield result
+                                yield from _fan_out(followers.pop(result.job_id, ()), result, journal)
+                                continue
+                        if next_memory is None:
+                            next_memory = _job_memory(pending[-1])
+                        if in_flight and reserved + next_memory > memory_budget:
+                            break
+                        job = pending.pop()
+                        in_flight[executor.submit(run_job, job)] = (job, next_memory)
+                        reserved += next_memory
+                        next_memory = None
+
+                if not in_flight:
+                    if pending:
+                        controller.wait_running(SCHEDULER_POLL_SECONDS)
+                    continue
+
+                done, _ = concurrent.futures.wait(
+                    in_flight, timeout=SCHEDULER_POLL_SECONDS,
+                    return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    job, memory = in_flight.pop(future)
+                    reserved -= memory
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # 工作进程异常退出等情况
+                        result = BatchResult(job.job_id, False, f"错误: {str(e)}", None)
+                    if journal is not None:
+                        journal.record(job, result)
+                    yield result
+                    yield from _fan_out(followers.pop(job.job_id, ()), result, journal)
+    finally:
+        if journal is not None:
+            journal.close()
+
+
+def _fan_out(followers, result, journal):
+    """产出重复文件的结果（在调度线程中复制输出）"""
+    for follower in followers:
+        if journal is not None:
+            output_path = journal.completed_output(follower)
+            if output_path is not None:
+                yield BatchResult(follower.job_id, True, STATUS_SKIPPED, output_path)
+                continue
+        follower_result = copy_duplicate_output(follower, result)
+        if journal is not None:
+            journal.record(follower, follower_result)
+        yield follower_result
@@ -0,0 +1,88 @@
+"""批量处理文件列表
+
+按添加顺序保存文件记录，并以路径建立索引：添加、查找、删除、更新状态均为 O(1)
+（删除后的空位在下次按行访问时统一压缩）。界面只按行号读取当前可见的一小段记录，
+不必为每个文件创建一行 Treeview。
+"""
+
+STATUS_PENDING = "待处理"
+
+
+def format_size(size):
+    """把字节数格式化为列表中显示的大小文字"""
+    if size is None:
+        return ""
+    return f"{size/1024/1024:.1f} MB" if size > 1024*1024 else f"{size/1024:.1f} KB"
+
+
+class FileRecord:
+    """单个文件的记录"""
+    __slots__ = ('path', 'size', 'status')
+
+    def __init__(self, path, size=None, status=STATUS_PENDING):
+        self.path = path
+        self.size = size
+        self.status = status
+
+
+class BatchFileList:
+    """带路径索引的文件记录列表"""
+
+    def __init__(self):
+        self._records = []    # 按添加顺序排列，删除的位置暂时为 None
+        self._index = {}      # 路径 -> 在 _records 中的位置
+        self._holes = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, path):
+        return path in self._index
+
+    def __iter__(self):
+        return (record for record in self._records if record is not None)
+
+    def get(self, path):
+        position = self._index.get(path)
+        return None if position is None else self._records[position]
+
+    def add(self, path, size=None):
+        """添加文件，已存在时返回 False"""
+        if path in self._index:
+            return False
+        self._index[path] = len(self._records)
+        self._records.append(FileRecord(path, size))
+        return True
+
+    def remove(self, path):
+        """移除文件，不存在时返回 False"""
+        position = self._index.pop(path, None)
+        if position is None:
+            return False
+        self._records[position] = None
+        self._holes += 1
+        return True
+
+    def clear(self):
+        self._records = []
+        self._index = {}
+        self._holes = 0
+
+    def set_status(self, path, status):
+        """更新文件状态，文件已被移除时返回 False"""
+        record = self.get(path)
+        if record is None:
+            return False
+        record.status = status
+        return True
+
+    def _compact(self):
+        if self._holes:
+            self._records = [record for record in self._records if record is not None]
+            self._index = {record.path: position for position, record in enumerate(self._records)}
+            self._holes = 0
+
+    def rows(self, start, count):
+        """返回从第 start 行开始的最多 count 条记录（用于渲染可见区域）"""
+        self._compact()
+        return self._records[start:start + count]
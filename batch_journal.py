@@ -0,0 +1,113 @@
+"""批量处理日志（断点续传）
+
+用 SQLite 记录每个文件的处理结果，键为 (源文件路径, 大小, 修改时间, 操作参数, 输出目录)。
+重新运行同一批任务时，已成功且输出文件仍存在的文件直接跳过，失败的文件重新处理；
+源文件、操作参数或输出目录变化后键不同，会重新处理。
+"""
+import json
+import os
+import sqlite3
+import time
+
+# 日志文件默认保存在输出目录中
+JOURNAL_FILE_NAME = '.image_metadata_journal.sqlite3'
+
+JOURNAL_DONE = 'done'
+JOURNAL_FAILED = 'failed'
+
+# 累计多少条记录或多少秒提交一次事务
+COMMIT_EVERY = 200
+COMMIT_INTERVAL_SECONDS = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    source TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    operations TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output_path TEXT,
+    message TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (source, size, mtime_ns, operations, output_dir)
+)
+"""
+
+
+def default_journal_path(output_dir):
+    return os.path.join(output_dir, JOURNAL_FILE_NAME)
+
+
+def operation_key(options, preset_name=None):
+    """把操作参数规范化为字符串（字段排序，元组转为列表）"""
+    params = dict(vars(options))
+    params['preset'] = preset_name
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+class BatchJournal:
+    """批量处理日志，只能在创建它的线程中使用"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if columns and 'output_dir' not in columns:
+            # 旧版本的日志没有按输出目录区分，丢弃后重新记录
+            self._conn.execute("DROP TABLE jobs")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def _key(self, job):
+        """返回 (源文件路径, 大小, 修改时间, 操作参数, 输出目录)，源文件不存在时返回 None"""
+        source = os.path.abspath(job.source_path)
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        return (source, stat.st_size, stat.st_mtime_ns, operation_key(job.options, job.preset_name),
+                os.path.abspath(job.output_dir))
+
+    def completed_output(self, job):
+        """任务已成功完成且输出文件仍存在时返回输出路径，否则返回 None"""
+        key = self._key(job)
+        if key is None:
+            return None
+        row = self._conn.execute(
+            "SELECT status, output_path FROM jobs"
+            " WHERE source = ? AND size = ? AND mtime_ns = ? AND operations = ? AND output_dir = ?",
+            key
+        ).fetchone()
+        if row and row[0] == JOURNAL_DONE and row[1] and os.path.exists(row[1]):
+            return row[1]
+        return None
+
+    def record(self, job, result):
+        """记录任务结果（BatchResult）"""
+        key = self._key(job)
+        if key is None:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs"
+            " (source, size, mtime_ns, operations, output_dir, status, output_path, message, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            key + (JOURNAL_DONE if result.ok else JOURNAL_FAILED, result.output_path, result.status, time.time())
+        )
+        self._uncommitted += 1
+        if (self._uncommitted >= COMMIT_EVERY
+                or time.monotonic() - self._last_commit >= COMMIT_INTERVAL_SECONDS):
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def close(self):
+        self.commit()
+        self._conn.close()
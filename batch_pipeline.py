@@ -0,0 +1,376 @@
+"""批量处理流水线
+
+每个文件只解码一次、编码一次、写入一次：
+    读取元数据 -> 解码 -> 裁剪/调整尺寸（可选）-> 附加最终元数据并编码写出
+
+不需要改变像素时（只清除元数据/隐私信息或只写入预设），跳过解码，
+直接按容器格式重写文件，像素数据按字节复制。
+"""
+import shutil
+
+import piexif
+from PIL import Image
+
+import exif_tags
+import image_container
+from image_metadata_editor import (RESIZE_BALANCED, RESIZE_BEST, RESIZE_FAST, crop_box, draft_for_resize,
+                                   drop_image_metadata, fit_size)
+from run_report import StageTimer
+
+# 处理阶段
+STAGE_METADATA = 'metadata'    # 计算最终写入的 EXIF
+STAGE_REWRITE = 'rewrite'      # 按容器格式重写，不解码像素
+STAGE_DECODE = 'decode'        # 解码像素并清除图像对象上的元数据
+STAGE_RESIZE = 'resize'        # 等比缩放或拉伸到目标尺寸
+STAGE_CROP = 'crop'            # 缩放填满目标尺寸后按位置裁剪（一次重采样完成）
+STAGE_ENCODE = 'encode'        # 附加 EXIF 并编码写出
+
+# 只用于耗时统计的子步骤
+TIMING_OPEN = 'open'           # 读取文件头
+TIMING_EXIF_DUMP = 'exif_dump' # 序列化 EXIF
+TIMING_WRITE = 'write'         # 把编码结果写入磁盘
+
+# 可以携带 EXIF 的格式
+EXIF_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+# 裁剪位置：显示名称 -> crop_box 取值
+CROP_POSITIONS = {
+    "居中": "center",
+    "左上角": "top_left",
+    "右上角": "top_right",
+    "左下角": "bottom_left",
+    "右下角": "bottom_right"
+}
+
+# JPEG 缩小时的解码方式：显示名称 -> 取值
+RESIZE_MODES = {
+    "质量优先": RESIZE_BEST,
+    "均衡": RESIZE_BALANCED,
+    "速度优先": RESIZE_FAST,
+}
+
+# 预设分辨率（横向）
+RESOLUTIONS_LANDSCAPE = {
+    "自定义": (0, 0),
+    "540p": (960, 540),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "2K": (2048, 1080),
+    "2160p": (3840, 2160),
+    "4K": (4096, 2160)
+}
+
+# 预设分辨率（竖向）
+RESOLUTIONS_PORTRAIT = {
+    "自定义": (0, 0),
+    "540p": (540, 960),
+    "720p": (720, 1280),
+    "1080p": (1080, 1920),
+    "2K": (1080, 2048),
+    "2160p": (2160, 3840),
+    "4K": (2160, 4096)
+}
+
+
+class BatchOptions:
+    """一次批量处理的选项，由界面上的复选框/输入框生成
+
+    Args:
+        strip_metadata: 清除全部元数据
+        strip_private: 仅清除隐私信息（GPS/序列号/缩略图/制造商注释）
+        resize_to: (width, height) 目标尺寸，None 表示不调整尺寸
+        keep_ratio: 调整尺寸时是否保持宽高比
+        crop: 是否裁剪到目标尺寸
+        crop_position: 裁剪位置，取值同 crop_box
+        quality: JPEG/WebP 编码质量
+        resize_mode: 缩小 JPEG 时的解码方式，取值同 RESIZE_MODES
+    """
+
+    def __init__(self, strip_metadata=False, strip_private=False, resize_to=None,
+                 keep_ratio=True, crop=False, crop_position='center', quality=95,
+                 resize_mode=RESIZE_BALANCED):
+        self.strip_metadata = strip_metadata
+        self.strip_private = strip_private
+        self.resize_to = resize_to
+        self.keep_ratio = keep_ratio
+        self.crop = crop
+        self.crop_position = crop_position
+        self.quality = quality
+        self.resize_mode = resize_mode
+
+    @property
+    def reencode(self):
+        """是否需要解码并重新编码像素"""
+        return self.resize_to is not None
+
+
+class _PipelineContext:
+    """单个文件在各阶段之间传递的状态"""
+
+    def __init__(self, source_path, output_path, options, metadata, timer):
+        self.source_path = source_path
+        self.output_path = output_path
+        self.options = options
+        self.metadata = metadata or {}
+        self.image = None
+        self.image_format = None
+        self.source_size = None  # 原图尺寸（缩放解码前）
+        self.exif_bytes = b""
+        self.icc_profile = None  # 重新编码时保留的色彩配置
+        # 未改动任何 EXIF 时可以直接复制原文件
+        self.exif_changed = False
+        self.timer = timer
+
+
+def build_stages(options, image_format, can_splice_exif=True):
+    """根据批量选项生成处理阶段列表
+
+    Args:
+        options: BatchOptions
+        image_format: Pillow 格式名
+        can_splice_exif: 容器能否直接写入新的 EXIF（简单格式的 WebP 不能）
+    """
+    if not options.reencode and not options.strip_metadata and image_format not in EXIF_FORMATS:
+        # GIF/BMP 不能携带 EXIF，没有可清除的隐私信息，也无法写入预设，原样复制
+        return [STAGE_REWRITE]
+
+    stages = [STAGE_METADATA]
+    if (not options.reencode and can_splice_exif
+            and image_container.supports_lossless_strip(image_format)):
+        stages.append(STAGE_REWRITE)
+        return stages
+
+    stages.append(STAGE_DECODE)
+    if options.resize_to is not None:
+        stages.append(STAGE_CROP if options.crop else STAGE_RESIZE)
+    stages.append(STAGE_ENCODE)
+    return stages
+
+
+def _stage_metadata(ctx):
+    options = ctx.options
+    exif_dict = None
+    # 清除全部元数据、或重新编码且未要求保留时，从空白 EXIF 开始
+    keep_existing = not options.strip_metadata and (options.strip_private or not options.reencode)
+    if keep_existing and 'exif' in ctx.image.info:
+        exif_dict = piexif.load(ctx.image.info['exif'])
+        if options.strip_private:
+            ctx.exif_changed = exif_tags.remove_exif_blocks(
+                exif_dict, tuple(exif_tags.SELECTIVE_STRIP_BLOCKS))
+
+    if ctx.metadata:
+        if exif_dict is None:
+            exif_dict = {'0th': {}, '1st': {}, 'Exif': {}, 'GPS': {}, 'Interop': {}}
+        exif_tags.apply_fields(exif_dict, ctx.metadata)
+        ctx.exif_changed = True
+
+    if exif_dict is not None and ctx.image_format in EXIF_FORMATS:
+        with ctx.timer.stage(TIMING_EXIF_DUMP):
+            ctx.exif_bytes = piexif.dump(exif_dict)
+
+
+def _stage_rewrite(ctx):
+    options = ctx.options
+    if options.strip_metadata:
+        image_container.strip_metadata(
+            ctx.source_path, ctx.output_path, ctx.image_format, exif_bytes=ctx.exif_bytes)
+    elif ctx.exif_changed:
+        # 只替换 EXIF，其他元数据（ICC、XMP 等）原样保留
+        image_container.replace_exif(
+            ctx.source_path, ctx.output_path, ctx.image_format, ctx.exif_bytes)
+    else:
+        shutil.copyfile(ctx.source_path, ctx.output_path)
+
+
+def resize_output_size(size, options):
+    """按批量选项缩放后整张原图对应的尺寸（裁剪时为裁剪前填满目标尺寸的缩放尺寸）"""
+    target_width, target_height = options.resize_to
+    if options.crop:
+        ratio = max(target_width / size[0], target_height / size[1])
+        return (size[0] * ratio, size[1] * ratio)
+    if options.keep_ratio:
+        return fit_size(size, options.resize_to)
+    return options.resize_to
+
+
+def _stage_decode(ctx):
+    if ctx.options.strip_private and not ctx.options.strip_metadata:
+        # 仅清除隐私信息时保留色彩配置，与不重新编码的路径一致
+        ctx.icc_profile = ctx.image.info.get('icc_profile')
+    if ctx.options.resize_to is not None:
+        draft_for_resize(ctx.image, resize_output_size(ctx.source_size, ctx.options), ctx.options.resize_mode)
+    drop_image_metadata(ctx.image)
+
+
+def _replace_image(ctx, new_image):
+    if new_image is not ctx.image:
+        ctx.image.close()
+        ctx.image = new_image
+
+
+def _stage_resize(ctx):
+    options = ctx.options
+    size = options.resize_to
+    if options.keep_ratio:
+        # 按原图尺寸计算，缩放解码不改变输出尺寸
+        size = fit_size(ctx.source_size, size)
+    if size != ctx.image.size:
+        _replace_image(ctx, ctx.image.resize(size, Image.Resampling.LANCZOS))
+
+
+def _stage_crop(ctx):
+    target_width, target_height = ctx.options.resize_to
+    width, height = ctx.image.size
+    # 在原图上取与目标宽高比一致的最大区域，缩放与裁剪合并为一次重采样
+    if width * target_height > height * target_width:
+        region = (round(height * target_width / target_height), height)
+    else:
+        region = (width, round(width * target_height / target_width))
+    box = crop_box(ctx.image.size, region, ctx.options.crop_position)
+    if region != (target_width, target_height):
+        _replace_image(ctx, ctx.image.resize((target_width, target_height), Image.Resampling.LANCZOS, box=box))
+    elif region != ctx.image.size:
+        _replace_image(ctx, ctx.image.crop(box))
+
+
+def encode_params(image_format, quality=95, exif_bytes=b"", icc_profile=None):
+    """重新编码时使用的保存参数（不带原有元数据，icc_profile 不为空时写入该色彩配置）"""
+    save_params = {
+        'format': image_format,
+        'quality': quality if image_format in ('JPEG', 'WEBP') else None,
+    }
+
+    if image_format == 'JPEG':
+        save_params.update({
+            'optimize': False,
+            'icc_profile': None,
+            'comment': None,
+            'subsampling': -1,  # 使用默认的子采样
+            'qtables': None,    # 使用默认的量化表
+            'progressive': False,
+            'smooth': 0,
+            'streamtype': 0,    # 基本 JPEG
+            'dpi': (72, 72),    # 标准分辨率
+            'jfif': None,       # 不写入 JFIF 标记
+            'adobe': None       # 不写入 Adobe 标记
+        })
+    elif image_format == 'PNG':
+        save_params.update({
+            'optimize': False,
+            'pnginfo': None
+        })
+
+    if image_format in EXIF_FORMATS:
+        save_params['exif'] = exif_bytes
+        if icc_profile:
+            save_params['icc_profile'] = icc_profile
+    return save_params
+
+
+class _TimedWriter:
+    """统计 write() 耗时的文件包装
+
+    不提供 fileno()，Pillow 会把编码结果分块交给 write()，
+    这样编码和磁盘写入的耗时可以分开统计，也不必在内存中保存整个编码结果。
+    """
+
+    def __init__(self, f, timer):
+        self._f = f
+        self._timer = timer
+
+    def write(self, data):
+        with self._timer.stage(TIMING_WRITE):
+            return self._f.write(data)
+
+    def flush(self):
+        self._f.flush()
+
+    def tell(self):
+        return self._f.tell()
+
+    def seek(self, *args):
+        return self._f.seek(*args)
+
+
+def _stage_encode(ctx):
+    with open(ctx.output_path, 'wb') as f:
+        ctx.image.save(_TimedWriter(f, ctx.timer),
+                       **encode_params(ctx.image_format, ctx.options.quality, ctx.exif_bytes,
+                                      ctx.icc_profile))
+
+
+# 阶段名 -> 处理函数
+STAGES = {
+    STAGE_METADATA: _stage_metadata,
+    STAGE_REWRITE: _stage_rewrite,
+    STAGE_DECODE: _stage_decode,
+    STAGE_RESIZE: _stage_resize,
+    STAGE_CROP: _stage_crop,
+    STAGE_ENCODE: _stage_encode,
+}
+
+
+def _frame_bytes(size, mode):
+    """解码后图像帧占用的字节数（Pillow 内部三、四通道图像每像素 4 字节）"""
+    bands = Image.getmodebands(mode)
+    if bands >= 3:
+        pixel_bytes = 4
+    elif mode in ('I', 'F'):
+        pixel_bytes = 4
+    elif mode.startswith('I;16'):
+        pixel_bytes = 2
+    else:
+        pixel_bytes = bands
+    return size[0] * size[1] * pixel_bytes
+
+
+def estimate_working_set(source_path, options):
+    """只读取文件头，估算处理该文件时像素数据占用的内存（字节）
+
+    不需要解码像素的任务返回 0；需要重新编码时为原图帧加上缩放/裁剪后的输出帧。
+    """
+    with Image.open(source_path) as image:
+        image_format = image.format or 'JPEG'
+        if build_stages(options, image_format)[-1] == STAGE_REWRITE:
+            return 0
+        source_size = image.size
+        if options.resize_to is not None:
+            # 只修改解码参数，不读取像素
+            draft_for_resize(image, resize_output_size(source_size, options), options.resize_mode)
+        estimate = _frame_bytes(image.size, image.mode)
+        if options.resize_to is not None:
+            estimate += _frame_bytes(options.resize_to, image.mode)
+        return estimate
+
+
+def process_image(source_path, output_path, options, metadata=None, timer=None):
+    """按批量选项处理单个文件并写出到 output_path
+
+    Args:
+        source_path: 源文件路径
+        output_path: 输出文件路径（不能与源文件相同）
+        options: BatchOptions
+        metadata: 要写入的 {标签名: 值}，None 表示不写入
+        timer: StageTimer，记录各阶段耗时，None 表示不记录
+
+    Returns:
+        成功返回 True，失败返回错误信息
+    """
+    ctx = _PipelineContext(source_path, output_path, options, metadata, timer or StageTimer())
+    try:
+        # 只读取文件头，像素在 decode 阶段才解码
+        with ctx.timer.stage(TIMING_OPEN):
+            ctx.image = Image.open(source_path)
+        ctx.image_format = ctx.image.format or 'JPEG'
+        ctx.source_size = ctx.image.size
+        can_splice_exif = (ctx.image_format != 'WEBP' or 'exif' in ctx.image.info
+                           or not ctx.metadata)
+        for stage in build_stages(options, ctx.image_format, can_splice_exif):
+            with ctx.timer.stage(stage):
+                STAGES[stage](ctx)
+        return True
+    except Exception as e:
+        return f"处理图片失败: {str(e)}"
+    finally:
+        if ctx.image is not None:
+            ctx.image.close()
@@ -0,0 +1,113 @@
+"""批量处理预检
+
+处理前只读取文件头，把每个文件归为：无需处理 / 需清除元数据 / 需调整尺寸。
+已经符合要求的文件在处理时直接复制或硬链接到输出目录，不再解码和重新编码。
+"""
+import os
+import shutil
+
+import piexif
+from PIL import Image
+
+import exif_tags
+import image_container
+from exif_reader import read_exif_block
+from image_metadata_editor import fit_size
+
+PLAN_CLEAN = 'clean'
+PLAN_STRIP = 'strip'
+PLAN_RESIZE = 'resize'
+PLAN_ERROR = 'error'
+
+# 分类：取值 -> 显示名称
+PLAN_NAMES = {
+    PLAN_CLEAN: "无需处理",
+    PLAN_STRIP: "需清除元数据",
+    PLAN_RESIZE: "需调整尺寸",
+    PLAN_ERROR: "无法读取",
+}
+
+# 已符合要求的文件的处理方式
+CLEAN_COPY = 'copy'
+CLEAN_HARDLINK = 'hardlink'
+
+
+def _has_private_exif(path):
+    tiff_data = read_exif_block(path)
+    if not tiff_data:
+        return False
+    exif_dict = piexif.load(image_container.EXIF_HEADER + tiff_data)
+    return exif_tags.remove_exif_blocks(exif_dict, tuple(exif_tags.SELECTIVE_STRIP_BLOCKS))
+
+
+def _needs_resize(size, options):
+    if options.resize_to is None:
+        return False
+    target = tuple(options.resize_to)
+    if options.crop or not options.keep_ratio:
+        return size != target
+    return fit_size(size, target) != size
+
+
+def classify_file(source_path, options, writes_metadata=False):
+    """只读取文件头，返回 PLAN_* 之一
+
+    Args:
+        source_path: 文件路径
+        options: BatchOptions
+        writes_metadata: 是否要写入预设元数据（写入时文件不可能已经符合要求）
+    """
+    try:
+        with Image.open(source_path) as image:
+            image_format = image.format
+            size = image.size
+        if _needs_resize(size, options):
+            return PLAN_RESIZE
+        if writes_metadata:
+            return PLAN_STRIP
+        if options.reencode:
+            # 调整尺寸的任务会重新编码，原有元数据不会原样保留；尺寸已符合要求的文件
+            # 只有没有元数据（仅清除隐私信息时色彩配置除外）才能直接复制，否则按需处理
+            if not image_container.supports_lossless_strip(image_format):
+                return PLAN_STRIP
+            keep_icc = options.strip_private and not options.strip_metadata
+            if image_container.has_metadata(source_path, image_format, keep_icc=keep_icc):
+                return PLAN_STRIP
+            return PLAN_CLEAN
+        if options.strip_metadata:
+            if not image_container.supports_lossless_strip(image_format):
+                # GIF/BMP 无法只读结构判断，按需要处理
+                return PLAN_STRIP
+            if image_container.has_metadata(source_path, image_format):
+                return PLAN_STRIP
+        elif options.strip_private and image_format in ('JPEG', 'PNG', 'WEBP'):
+            if _has_private_exif(source_path):
+                return PLAN_STRIP
+        return PLAN_CLEAN
+    except Exception:
+        return PLAN_ERROR
+
+
+def link_or_copy(source_path, output_path, clean_action=CLEAN_COPY):
+    """把已符合要求的文件放到输出位置，硬链接失败（如跨磁盘）时改为复制"""
+    if clean_action == CLEAN_HARDLINK:
+        try:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            os.link(source_path, output_path)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(source_path, output_path)
+
+
+def summarize(plans):
+    """统计各分类的文件数，返回 {PLAN_*: 数量}"""
+    counts = {plan: 0 for plan in PLAN_NAMES}
+    for plan in plans:
+        counts[plan] += 1
+    return counts
+
+
+def format_summary(counts):
+    return "，".join(f"{PLAN_NAMES[plan]} {count} 个" for plan, count in counts.items() if count)
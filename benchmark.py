@@ -0,0 +1,747 @@
+"""性能基准测试
+
+用法:
+    python benchmark.py memory [--megapixels 50 150]
+    python benchmark.py suite [--quick] [--repeat 3] [--baseline PATH] [--save-baseline] [--tolerance 0.25]
+    python benchmark.py draft [--megapixels 24] [--repeat 3]
+
+memory: 在生成的大图（默认 50 和 150 百万像素）上，于独立子进程中逐个执行
+        ImageMetadataEditor 的公开方法和批量处理流水线，测量峰值内存（RSS）和 Python 对象峰值
+        （tracemalloc）相对于解码后帧大小的倍数，超过上限时以非零状态退出。
+        同样的检查也由 tests/test_memory.py 在 pytest 中运行。
+suite:  在临时目录中生成固定内容的测试图片（JPEG/PNG/GIF，多种分辨率，带或不带大块
+        EXIF/MakerNote/ICC/缩略图），逐个测量 ImageMetadataEditor 各操作和各批量处理方式的
+        耗时、CPU 时间和峰值内存，与保存的基准比较，变慢或内存增加超过容差、
+        或没有基准（先用 --save-baseline 保存）时以非零状态退出。
+draft:  用横向和竖向的大 JPEG 按各预设分辨率批量缩放，比较各缩放方式（RESIZE_MODES）
+        相对全尺寸解码的加速比和画质（PSNR）。
+"""
+import argparse
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import piexif
+import PIL
+from PIL import Image, ImageChops, ImageStat
+
+# 重新编码路径的峰值内存上限（解码帧大小的倍数，帧大小按 Pillow 内部 RGB 每像素 4 字节计算）：
+# 原图帧加上输出帧和编码器缓冲
+MEMORY_LIMIT_RATIO = 2.5
+
+
+def _peak_rss_bytes():
+    """当前进程的峰值 RSS（字节），不支持的平台返回 None"""
+    # Linux 的 ru_maxrss 会跨 exec 继承父进程的峰值，优先读取 VmHWM
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def generate_image(path, size, image_format, seed=0, **save_params):
+    """生成测试图片（渐变 + 噪声，避免压缩率过高），同样的 seed 总是得到同样的像素"""
+    width, height = size
+    noise_size = (min(width, 1024), min(height, 1024))
+    rng = random.Random(seed)
+    image = Image.linear_gradient('L').resize(size)
+    noise = Image.frombytes('L', noise_size, rng.randbytes(noise_size[0] * noise_size[1])).resize(size)
+    image = Image.merge('RGB', (image, noise, image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    image.save(path, image_format, **save_params)
+    image.close()
+    noise.close()
+
+
+def _open_editor(path):
+    from image_metadata_editor import ImageMetadataEditor
+    return ImageMetadataEditor(path)
+
+
+def _op_get_metadata(path, output_dir):
+    editor = _open_editor(path)
+    metadata = editor.get_metadata()
+    editor.image.close()
+    return "错误" not in metadata or metadata["错误"]
+
+
+def _op_strip_all_metadata(path, output_dir):
+    editor = _open_editor(path)
+    result = editor.strip_all_metadata()
+    editor.image.close()
+    return result
+
+
+def _op_save_clean_copy(path, output_dir):
+    editor = _open_editor(path)
+    result = editor.save_clean_copy(os.path.join(output_dir, 'clean' + os.path.splitext(path)[1]))
+    editor.image.close()
+    return result
+
+
+def _op_strip_selected_metadata(path, output_dir):
+    editor = _open_editor(path)
+    result = editor.strip_selected_metadata()
+    editor.image.close()
+    return result
+
+
+def _op_update_metadata(path, output_dir):
+    editor = _open_editor(path)
+    result = editor.update_metadata(UPDATE_FIELDS)
+    editor.image.close()
+    return result
+
+
+def _op_resize_image(path, output_dir):
+    editor = _open_editor(path)
+    width, height = editor.image.size
+    result = editor.resize_image((width // 2, height // 2))
+    editor.image.close()
+    return result
+
+
+def _op_crop_image(path, output_dir):
+    editor = _open_editor(path)
+    width, height = editor.image.size
+    cropped = editor.crop_image((width // 2, height // 2))
+    if cropped is None:
+        editor.image.close()
+        return "裁剪失败"
+    cropped.load()
+    cropped.close()
+    editor.image.close()
+    return True
+
+
+def _op_reencode(path, output_dir):
+    """批量处理中需要重新编码时的路径"""
+    from image_metadata_editor import drop_image_metadata
+    with Image.open(path) as original:
+        image_format = original.format
+        drop_image_metadata(original).save(
+            os.path.join(output_dir, 'reencoded' + os.path.splitext(path)[1]),
+            format=image_format
+        )
+    return True
+
+
+def _pipeline(path, output_dir, **option_params):
+    from batch_pipeline import BatchOptions, process_image
+    with Image.open(path) as image:
+        width, height = image.size
+    if option_params.pop('half', False):
+        option_params['resize_to'] = (width // 2, height // 2)
+    return process_image(path, os.path.join(output_dir, 'pipeline' + os.path.splitext(path)[1]),
+                         BatchOptions(**option_params))
+
+
+def _op_pipeline_strip(path, output_dir):
+    return _pipeline(path, output_dir, strip_metadata=True)
+
+
+def _op_pipeline_resize(path, output_dir):
+    return _pipeline(path, output_dir, strip_metadata=True, half=True)
+
+
+def _op_pipeline_crop(path, output_dir):
+    return _pipeline(path, output_dir, strip_metadata=True, half=True, crop=True)
+
+
+# 只重写容器、不解码像素的操作的峰值内存上限（解码帧大小的倍数，重新编码的上限见 MEMORY_LIMIT_RATIO）
+LOSSLESS_LIMIT_RATIO = 0.25
+# Python 对象的峰值（tracemalloc）上限：像素数据不应被复制成 Python 列表或 bytes
+PYTHON_HEAP_LIMIT_RATIO = 0.1
+# 低于此值的峰值增量不检查比例（读取文件头、导入模块等固定开销，小图时会超过比例上限）
+MEMORY_FLOOR = 16 * 1024 * 1024
+
+DEFAULT_MEGAPIXELS = (50, 150)
+
+# 操作：名称 -> (函数, 输入格式, 峰值内存上限)
+MEMORY_CASES = {
+    'get_metadata[JPEG]': (_op_get_metadata, 'JPEG', LOSSLESS_LIMIT_RATIO),
+    'strip_all_metadata[JPEG]': (_op_strip_all_metadata, 'JPEG', LOSSLESS_LIMIT_RATIO),
+    'strip_all_metadata[PNG]': (_op_strip_all_metadata, 'PNG', LOSSLESS_LIMIT_RATIO),
+    'strip_all_metadata[BMP]': (_op_strip_all_metadata, 'BMP', MEMORY_LIMIT_RATIO),
+    'save_clean_copy[JPEG]': (_op_save_clean_copy, 'JPEG', LOSSLESS_LIMIT_RATIO),
+    'save_clean_copy[BMP]': (_op_save_clean_copy, 'BMP', MEMORY_LIMIT_RATIO),
+    'strip_selected_metadata[JPEG]': (_op_strip_selected_metadata, 'JPEG', LOSSLESS_LIMIT_RATIO),
+    'update_metadata[JPEG]': (_op_update_metadata, 'JPEG', LOSSLESS_LIMIT_RATIO),
+    'resize_image[JPEG]': (_op_resize_image, 'JPEG', MEMORY_LIMIT_RATIO),
+    'crop_image[JPEG]': (_op_crop_image, 'JPEG', MEMORY_LIMIT_RATIO),
+    'reencode[JPEG]': (_op_reencode, 'JPEG', MEMORY_LIMIT_RATIO),
+    'reencode[PNG]': (_op_reencode, 'PNG', MEMORY_LIMIT_RATIO),
+    'pipeline_strip[JPEG]': (_op_pipeline_strip, 'JPEG', LOSSLESS_LIMIT_RATIO),
+    'pipeline_resize[JPEG]': (_op_pipeline_resize, 'JPEG', MEMORY_LIMIT_RATIO),
+    'pipeline_resize[PNG]': (_op_pipeline_resize, 'PNG', MEMORY_LIMIT_RATIO),
+    'pipeline_crop[JPEG]': (_op_pipeline_crop, 'JPEG', MEMORY_LIMIT_RATIO),
+}
+
+
+def _memory_worker(case, path, output_dir, queue):
+    import tracemalloc
+    import warnings
+    # 测试图片有意超过 Pillow 的解压炸弹警告阈值
+    warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+    func = MEMORY_CASES[case][0]
+    baseline = _peak_rss_bytes()
+    tracemalloc.start()
+    try:
+        result = func(path, output_dir)
+    except Exception as e:
+        result = f"错误: {str(e)}"
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    queue.put((result, baseline, _peak_rss_bytes(), python_peak))
+
+
+def _memory_source_params(image_format):
+    # JPEG/PNG 带上 EXIF，让清除、更新元数据的操作有实际内容可处理
+    if image_format in ('JPEG', 'PNG'):
+        return {'exif': _heavy_exif(0)}
+    return {}
+
+
+def memory_image_size(megapixels):
+    """指定百万像素数的 3:2 测试图片尺寸"""
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    return width, int(width * 2 / 3)
+
+
+def prepare_memory_sources(work_dir, size):
+    """为 MEMORY_CASES 用到的每种格式生成一张测试图片，返回 {格式: 路径}"""
+    sources = {}
+    for _, image_format, _ in MEMORY_CASES.values():
+        if image_format not in sources:
+            path = os.path.join(work_dir, f'source.{image_format.lower()}')
+            generate_image(path, size, image_format, **_memory_source_params(image_format))
+            sources[image_format] = path
+    return sources
+
+
+def measure_memory_case(case, source_path, work_dir):
+    """在新进程中对原图副本执行一个用例，返回 (结果, 峰值 RSS 增量, Python 对象峰值)
+
+    不支持测量 RSS 的平台上峰值 RSS 增量为 None。
+    """
+    # 每次使用原图的副本，避免原地修改影响后续用例
+    path = os.path.join(work_dir, 'input' + os.path.splitext(source_path)[1])
+    shutil.copyfile(source_path, path)
+
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_memory_worker, args=(case, path, work_dir, queue))
+    process.start()
+    result, baseline, peak, python_peak = queue.get()
+    process.join()
+    rss_delta = peak - baseline if peak is not None and baseline is not None else None
+    return result, rss_delta, python_peak
+
+
+def memory_within_limits(case, frame_bytes, rss_delta, python_peak):
+    """峰值 RSS 增量和 Python 对象峰值是否都在用例的上限内"""
+    limit = MEMORY_CASES[case][2]
+    rss_ok = rss_delta is None or rss_delta <= limit * frame_bytes or rss_delta <= MEMORY_FLOOR
+    python_ok = python_peak <= PYTHON_HEAP_LIMIT_RATIO * frame_bytes or python_peak <= MEMORY_FLOOR
+    return rss_ok and python_ok
+
+
+def run_memory_benchmark(megapixels):
+    """逐个操作在新进程中运行并比较峰值内存，返回是否全部通过"""
+    if _peak_rss_bytes() is None:
+        print("当前平台不支持测量峰值内存，跳过")
+        return True
+
+    size = memory_image_size(megapixels)
+    frame_bytes = size[0] * size[1] * 4
+    print(f"测试图片: {size[0]}x{size[1]}（{megapixels:g} MP），解码帧大小 {frame_bytes / 1024 / 1024:.1f} MB")
+
+    work_dir = tempfile.mkdtemp(prefix='imeta_bench_')
+    passed = True
+    try:
+        sources = prepare_memory_sources(work_dir, size)
+        for case, (_, image_format, limit) in MEMORY_CASES.items():
+            result, rss_delta, python_peak = measure_memory_case(case, sources[image_format], work_dir)
+            ok = result is True and memory_within_limits(case, frame_bytes, rss_delta, python_peak)
+            passed = passed and ok
+            print(f"{'通过' if ok else '失败'}  {case:<30} 峰值增量 {rss_delta / 1024 / 1024:8.1f} MB"
+                  f"  ({rss_delta / frame_bytes:.2f}x 帧大小，上限 {limit}x)"
+                  f"  Python 对象 {python_peak / 1024 / 1024:7.1f} MB"
+                  f" ({python_peak / frame_bytes:.3f}x，上限 {PYTHON_HEAP_LIMIT_RATIO}x)"
+                  + ("" if result is True else f"  {result}"), flush=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return passed
+
+
+# ---- suite ----
+
+# 测试图片的分辨率，--quick 只使用前两种
+SUITE_RESOLUTIONS = ((640, 480), (1920, 1080), (4000, 3000))
+QUICK_RESOLUTIONS = SUITE_RESOLUTIONS[:2]
+SUITE_FORMATS = ('JPEG', 'PNG', 'GIF')
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_TOLERANCE = 0.25
+# 差值小于这些值时不算回归，避免短操作的计时抖动
+MIN_TIME_DELTA = 0.005
+MIN_MEMORY_DELTA = 8 * 1024 * 1024
+
+# 写入 update_metadata 的字段
+UPDATE_FIELDS = {
+    'Make': 'Benchmark',
+    'Model': 'Synthetic Camera',
+    'DateTimeOriginal': '2024:01:01 12:00:00',
+    'Artist': 'benchmark.py',
+}
+
+
+def _heavy_exif(seed):
+    """带 MakerNote、GPS、序列号和内嵌缩略图的大块 EXIF（约 50 KB）"""
+    rng = random.Random(seed)
+    thumbnail = io.BytesIO()
+    Image.frombytes('L', (160, 120), rng.randbytes(160 * 120)).convert('RGB').save(thumbnail, 'JPEG')
+    exif_dict = {
+        '0th': {
+            piexif.ImageIFD.Make: b'Benchmark',
+            piexif.ImageIFD.Model: b'Synthetic Camera',
+            piexif.ImageIFD.Software: b'benchmark.py',
+            piexif.ImageIFD.ImageDescription: b'x' * 2048,
+        },
+        'Exif': {
+            piexif.ExifIFD.DateTimeOriginal: b'2024:01:01 12:00:00',
+            piexif.ExifIFD.MakerNote: rng.randbytes(48 * 1024),
+            piexif.ExifIFD.BodySerialNumber: b'SN0123456789',
+        },
+        'GPS': {
+            piexif.GPSIFD.GPSLatitudeRef: b'N',
+            piexif.GPSIFD.GPSLatitude: ((39, 1), (54, 1), (2700, 100)),
+            piexif.GPSIFD.GPSLongitudeRef: b'E',
+            piexif.GPSIFD.GPSLongitude: ((116, 1), (23, 1), (1700, 100)),
+        },
+        '1st': {},
+        'thumbnail': thumbnail.getvalue(),
+    }
+    return piexif.dump(exif_dict)
+
+
+def _icc_profile():
+    try:
+        from PIL import ImageCms
+        return ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    except Exception:
+        # Pillow 未编译 LittleCMS 时不写入 ICC
+        return None
+
+
+def _metadata_params(image_format, seed):
+    """生成带大块元数据的图片时使用的保存参数"""
+    if image_format == 'GIF':
+        # GIF 不能携带 EXIF/ICC，用大段注释代替
+        return {'comment': b'benchmark ' * 3000}
+    params = {'exif': _heavy_exif(seed)}
+    icc_profile = _icc_profile()
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    return params
+
+
+def build_corpus(work_dir, resolutions):
+    """生成测试图片，返回 {名称: 路径}，名称如 JPEG_1920x1080_meta"""
+    corpus = {}
+    seed = 0
+    for image_format in SUITE_FORMATS:
+        for size in resolutions:
+            for with_metadata in (False, True):
+                seed += 1
+                name = f"{image_format}_{size[0]}x{size[1]}_{'meta' if with_metadata else 'plain'}"
+                path = os.path.join(work_dir, f"{name}.{image_format.lower()}")
+                params = _metadata_params(image_format, seed) if with_metadata else {}
+                generate_image(path, size, image_format, seed, **params)
+                corpus[name] = path
+    return corpus
+
+
+def _bench_get_metadata(editor, output_dir):
+    return editor.get_metadata()
+
+
+def _bench_strip_all_metadata(editor, output_dir):
+    return editor.strip_all_metadata()
+
+
+def _bench_save_clean_copy(editor, output_dir):
+    return editor.save_clean_copy(os.path.join(output_dir, 'clean' + os.path.splitext(editor.image_path)[1]))
+
+
+def _bench_resize_image(editor, output_dir):
+    width, height = editor.image.size
+    return editor.resize_image((width // 2, height // 2))
+
+
+def _bench_crop_image(editor, output_dir):
+    width, height = editor.image.size
+    cropped = editor.crop_image((width // 2, height // 2))
+    if cropped is None:
+        return "裁剪失败"
+    # crop 是惰性的，加载后才真正复制像素
+    cropped.load()
+    cropped.close()
+    return True
+
+
+def _bench_update_metadata(editor, output_dir):
+    return editor.update_metadata(UPDATE_FIELDS)
+
+
+# ImageMetadataEditor 的操作：名称 -> 函数(editor, 输出目录)，返回 True 或错误信息
+SUITE_OPERATIONS = {
+    'get_metadata': _bench_get_metadata,
+    'strip_all_metadata': _bench_strip_all_metadata,
+    'save_clean_copy': _bench_save_clean_copy,
+    'resize_image': _bench_resize_image,
+    'crop_image': _bench_crop_image,
+    'update_metadata': _bench_update_metadata,
+}
+
+# 批量处理方式：名称 -> (执行方式, BatchOptions 参数)
+SUITE_BATCH_MODES = {
+    'batch_strip[thread]': ('thread', {'strip_metadata': True}),
+    'batch_strip[process]': ('process', {'strip_metadata': True}),
+    'batch_resize[thread]': ('thread', {'strip_metadata': True, 'resize_to': (1280, 720)}),
+    'batch_resize[process]': ('process', {'strip_metadata': True, 'resize_to': (1280, 720)}),
+}
+SUITE_BATCH_WORKERS = 4
+
+
+def _cpu_seconds(include_children=False):
+    """本进程（可选加上已结束的子进程）的 CPU 时间"""
+    seconds = time.process_time()
+    if include_children:
+        try:
+            import resource
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            seconds += usage.ru_utime + usage.ru_stime
+        except ImportError:
+            pass
+    return seconds
+
+
+def _children_peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _is_ok(result):
+    # get_metadata 返回字典，出错时包含“错误”键
+    if isinstance(result, dict):
+        return "错误" not in result
+    return result is True
+
+
+def _measure(run, prepare, repeat, include_children=False):
+    """执行 repeat 次，返回 (最短耗时, 最短 CPU 时间, 峰值内存增量, 错误信息)"""
+    baseline = _peak_rss_bytes() or 0
+    walls = []
+    cpus = []
+    for _ in range(repeat):
+        prepare()
+        cpu_start = _cpu_seconds(include_children)
+        start = time.perf_counter()
+        result = run()
+        walls.append(time.perf_counter() - start)
+        cpus.append(_cpu_seconds(include_children) - cpu_start)
+        if not _is_ok(result):
+            return None, None, None, str(result)
+    peak = _peak_rss_bytes() or 0
+    if include_children:
+        peak = max(peak, _children_peak_rss_bytes())
+    return min(walls), min(cpus), max(0, peak - baseline), None
+
+
+def _operation_worker(operation, source_path, work_dir, repeat, queue):
+    """在子进程中测量一个操作（每次使用原图的新副本，复制时间不计入）"""
+    from image_metadata_editor import ImageMetadataEditor
+    input_path = os.path.join(work_dir, 'input' + os.path.splitext(source_path)[1])
+    state = {}
+
+    def prepare():
+        if 'editor' in state:
+            state['editor'].image.close()
+        shutil.copyfile(source_path, input_path)
+        state['editor'] = ImageMetadataEditor(input_path)
+
+    def run():
+        return SUITE_OPERATIONS[operation](state['editor'], work_dir)
+
+    try:
+        queue.put(_measure(run, prepare, repeat))
+    except Exception as e:
+        queue.put((None, None, None, f"错误: {str(e)}"))
+    finally:
+        if 'editor' in state:
+            state['editor'].image.close()
+
+
+def _batch_worker(mode, sources, work_dir, repeat, queue):
+    """在子进程中测量一种批量处理方式"""
+    from batch_engine import BatchJob, run_batch
+    from batch_pipeline import BatchOptions
+    executor_type, option_params = SUITE_BATCH_MODES[mode]
+    options = BatchOptions(**option_params)
+    output_dir = os.path.join(work_dir, 'batch_out')
+
+    def prepare():
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.makedirs(output_dir)
+
+    def run():
+        jobs = [BatchJob(path, path, output_dir, options, None, None) for path in sources]
+        failures = [result.status for result in run_batch(jobs, executor_type, SUITE_BATCH_WORKERS)
+                    if not result.ok]
+        return f"{len(failures)} 个文件失败: {failures[0]}" if failures else True
+
+    try:
+        queue.put(_measure(run, prepare, repeat, include_children=executor_type == 'process'))
+    except Exception as e:
+        queue.put((None, None, None, f"错误: {str(e)}"))
+
+
+def _run_case(ctx, target, args):
+    """在新的 spawn 子进程中运行一个用例，避免前一个用例的内存峰值影响结果"""
+    queue = ctx.Queue()
+    process = ctx.Process(target=target, args=args + (queue,))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'piexif': piexif.VERSION,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_suite(resolutions, repeat):
+    """运行全部用例，返回 {用例名: {'wall': 秒, 'cpu': 秒, 'peak_bytes': 字节} 或 {'error': 信息}}"""
+    ctx = multiprocessing.get_context('spawn')
+    work_dir = tempfile.mkdtemp(prefix='imeta_suite_')
+    results = {}
+    try:
+        corpus = build_corpus(work_dir, resolutions)
+        case_dir = os.path.join(work_dir, 'case')
+        os.makedirs(case_dir)
+        cases = [(f"{operation}/{name}", _operation_worker, (operation, path, case_dir, repeat))
+                 for operation in SUITE_OPERATIONS for name, path in corpus.items()]
+        cases += [(mode, _batch_worker, (mode, list(corpus.values()), case_dir, repeat))
+                  for mode in SUITE_BATCH_MODES]
+
+        for case, target, args in cases:
+            wall, cpu, peak, error = _run_case(ctx, target, args)
+            if error is not None:
+                results[case] = {'error': error}
+                print(f"失败  {case:<48} {error}", flush=True)
+            else:
+                results[case] = {'wall': wall, 'cpu': cpu, 'peak_bytes': peak}
+                print(f"      {case:<48} {wall * 1000:9.1f} ms  CPU {cpu * 1000:9.1f} ms"
+                      f"  峰值 +{peak / 1024 / 1024:7.1f} MB", flush=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """返回回归描述列表（耗时或峰值内存超过基准的 1 + tolerance 倍）"""
+    regressions = []
+    for case, base in sorted(baseline.items()):
+        current = results.get(case)
+        if current is None or 'error' in base:
+            continue
+        if 'error' in current:
+            regressions.append(f"{case}: 基准中成功，现在失败（{current['error']}）")
+            continue
+        wall_limit = base['wall'] * (1 + tolerance)
+        if current['wall'] > wall_limit and current['wall'] - base['wall'] > MIN_TIME_DELTA:
+            regressions.append(f"{case}: 耗时 {current['wall'] * 1000:.1f} ms，"
+                               f"基准 {base['wall'] * 1000:.1f} ms（+{current['wall'] / base['wall'] - 1:.0%}）")
+        memory_limit = base['peak_bytes'] * (1 + tolerance)
+        if (current['peak_bytes'] > memory_limit
+                and current['peak_bytes'] - base['peak_bytes'] > MIN_MEMORY_DELTA):
+            regressions.append(f"{case}: 峰值内存 +{current['peak_bytes'] / 1024 / 1024:.1f} MB，"
+                               f"基准 +{base['peak_bytes'] / 1024 / 1024:.1f} MB")
+    return regressions
+
+
+def run_suite_command(args):
+    resolutions = QUICK_RESOLUTIONS if args.quick else SUITE_RESOLUTIONS
+    results = run_suite(resolutions, args.repeat)
+    failed = [case for case, result in results.items() if 'error' in result]
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'environment': _environment(), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"基准已保存: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('environment') != _environment():
+            print(f"注意: 基准的运行环境不同，比较结果仅供参考\n  基准: {baseline.get('environment')}\n"
+                  f"  当前: {_environment()}")
+        regressions = compare_with_baseline(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"\n性能回归 {len(regressions)} 项（容差 {args.tolerance:.0%}）:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n与基准相比没有回归（容差 {args.tolerance:.0%}）")
+    else:
+        # 没有基准时无法发现回归，不能当作通过
+        print(f"\n没有找到基准 {args.baseline}，使用 --save-baseline 保存本次结果作为基准", file=sys.stderr)
+        return 1
+
+    if failed:
+        print(f"{len(failed)} 个用例执行失败")
+        return 1
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# 缩放解码（draft）对比
+# ---------------------------------------------------------------------------
+
+DEFAULT_DRAFT_MEGAPIXELS = 24
+
+
+def psnr(reference_path, path):
+    """两张同尺寸图片的峰值信噪比（dB），完全相同时为 inf"""
+    with Image.open(reference_path) as reference, Image.open(path) as image:
+        difference = ImageChops.difference(reference.convert('RGB'), image.convert('RGB'))
+    mse = sum(value * value for value in ImageStat.Stat(difference).rms) / 3
+    if mse == 0:
+        return float('inf')
+    return 10 * math.log10(255 * 255 / mse)
+
+
+def _draft_sources(work_dir, megapixels):
+    """生成 3:2 的横向和竖向 JPEG，返回 [(方向, 路径, 预设表)]"""
+    from batch_pipeline import RESOLUTIONS_LANDSCAPE, RESOLUTIONS_PORTRAIT
+    height = int(math.sqrt(megapixels * 1e6 / 1.5))
+    width = int(height * 1.5)
+    sources = []
+    for orientation, size, resolutions in (('横向', (width, height), RESOLUTIONS_LANDSCAPE),
+                                           ('竖向', (height, width), RESOLUTIONS_PORTRAIT)):
+        path = os.path.join(work_dir, f'{orientation}.jpg')
+        generate_image(path, size, 'JPEG', quality=90)
+        sources.append((orientation, path, resolutions))
+    return sources
+
+
+def run_draft_benchmark(megapixels, repeat):
+    from batch_pipeline import RESIZE_MODES, BatchOptions, process_image
+    from image_metadata_editor import RESIZE_BEST
+
+    work_dir = tempfile.mkdtemp(prefix='draft_bench_')
+    failed = False
+    try:
+        print(f"缩放解码对比: {megapixels:g} 百万像素 JPEG，每项取 {repeat} 次中最短耗时")
+        for orientation, source_path, resolutions in _draft_sources(work_dir, megapixels):
+            for preset, target in resolutions.items():
+                if target == (0, 0):
+                    continue
+                timings = {}
+                outputs = {}
+                for name, mode in RESIZE_MODES.items():
+                    output_path = os.path.join(work_dir, f'{mode}.jpg')
+                    options = BatchOptions(strip_metadata=True, resize_to=target, resize_mode=mode)
+                    best = None
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        result = process_image(source_path, output_path, options)
+                        elapsed = time.perf_counter() - start
+                        if result is not True:
+                            print(f"  {orientation} {preset} {name}: 失败 {result}")
+                            failed = True
+                            break
+                        best = elapsed if best is None else min(best, elapsed)
+                    timings[mode] = best
+                    outputs[mode] = output_path
+                reference = timings.get(RESIZE_BEST)
+                if reference is None:
+                    continue
+                parts = []
+                for name, mode in RESIZE_MODES.items():
+                    if timings[mode] is None:
+                        continue
+                    text = f"{name} {timings[mode] * 1000:.0f} ms"
+                    if mode != RESIZE_BEST:
+                        quality = psnr(outputs[RESIZE_BEST], outputs[mode])
+                        quality = "输出相同" if math.isinf(quality) else f"PSNR {quality:.1f} dB"
+                        text += f"（{reference / timings[mode]:.1f}x，{quality}）"
+                    parts.append(text)
+                print(f"  {orientation} {preset:>5} {target[0]}x{target[1]}: " + "，".join(parts))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return not failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="图片元数据编辑器性能基准测试")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    memory_parser = subparsers.add_parser('memory', help="测量各操作在大图上的峰值内存")
+    memory_parser.add_argument('--megapixels', type=float, nargs='+', default=list(DEFAULT_MEGAPIXELS),
+                               help="测试图片的像素数（百万），可指定多个（默认 50 150）")
+
+    suite_parser = subparsers.add_parser('suite', help="测量各操作和批量处理方式，并与基准比较")
+    suite_parser.add_argument('--quick', action='store_true', help="只使用较小的分辨率")
+    suite_parser.add_argument('--repeat', type=int, default=3, help="每个用例执行次数（取最短耗时）")
+    suite_parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基准文件路径")
+    suite_parser.add_argument('--save-baseline', '--update-baseline', action='store_true',
+                              help="把本次结果保存为基准（没有基准时不加此选项会以非零状态退出）")
+    suite_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                              help="允许的变慢/内存增加比例（默认 0.25）")
+
+    draft_parser = subparsers.add_parser('draft', help="比较 JPEG 各缩放方式在预设分辨率下的速度和画质")
+    draft_parser.add_argument('--megapixels', type=float, default=DEFAULT_DRAFT_MEGAPIXELS,
+                              help=f"测试图片的像素数（百万，默认 {DEFAULT_DRAFT_MEGAPIXELS}）")
+    draft_parser.add_argument('--repeat', type=int, default=3, help="每项执行次数（取最短耗时）")
+
+    args = parser.parse_args(argv)
+    if args.command == 'draft':
+        return 0 if run_draft_benchmark(args.megapixels, args.repeat) else 1
+    if args.command == 'memory':
+        results = [run_memory_benchmark(megapixels) for megapixels in args.megapixels]
+        return 0 if all(results) else 1
+    if args.command == 'suite':
+        return run_suite_command(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
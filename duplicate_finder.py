@@ -0,0 +1,95 @@
+"""按内容检测重复的输入文件
+
+依次比较：文件大小 -> 文件首尾各一小段的哈希 -> 完整内容的哈希。
+大小不同的文件不读取内容，只有部分哈希也相同时才读取整个文件，
+因此大多数文件只需一次 stat 或读取很少的数据。
+"""
+import hashlib
+import os
+
+from output_cache import hash_file
+
+# 部分哈希读取文件开头和结尾各多少字节
+PARTIAL_HASH_SIZE = 64 * 1024
+
+
+def partial_hash(path, size):
+    """文件开头和结尾各 PARTIAL_HASH_SIZE 字节的哈希"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        digest.update(f.read(PARTIAL_HASH_SIZE))
+        if size > PARTIAL_HASH_SIZE:
+            f.seek(max(PARTIAL_HASH_SIZE, size - PARTIAL_HASH_SIZE))
+            digest.update(f.read(PARTIAL_HASH_SIZE))
+    return digest.hexdigest()
+
+
+class DuplicateIndex:
+    """可逐个添加文件的重复检测索引，只能在一个线程中使用
+
+    每组内容相同的文件以最先添加的一个为代表，之后添加的文件与各代表比较。
+    """
+
+    def __init__(self):
+        self._by_size = {}    # 大小 -> 代表文件列表
+        self._known = {}      # 路径 -> 代表路径（自身是代表时为 None）
+        self._partial = {}    # 路径 -> 部分哈希
+        self._full = {}       # 路径 -> 完整哈希
+
+    def _partial_hash(self, path, size):
+        if path not in self._partial:
+            self._partial[path] = partial_hash(path, size)
+        return self._partial[path]
+
+    def _full_hash(self, path):
+        if path not in self._full:
+            self._full[path] = hash_file(path)
+        return self._full[path]
+
+    def add(self, path, size=None):
+        """添加文件，与已添加的某个文件内容相同时返回那个文件的路径，否则返回 None
+
+        无法读取的文件视为不重复。
+        """
+        if path in self._known:
+            return self._known[path]
+        try:
+            if size is None:
+                size = os.path.getsize(path)
+            original = None
+            candidates = self._by_size.get(size, ())
+            if candidates:
+                digest = self._partial_hash(path, size)
+                for candidate in candidates:
+                    if (self._partial_hash(candidate, size) == digest
+                            and self._full_hash(candidate) == self._full_hash(path)):
+                        original = candidate
+                        break
+        except OSError:
+            original = None
+        else:
+            if original is None:
+                self._by_size.setdefault(size, []).append(path)
+        self._known[path] = original
+        return original
+
+
+def find_duplicates(items, cancel_event=None):
+    """检测一组文件中的重复文件
+
+    Args:
+        items: (路径, 大小) 列表，大小为 None 时读取
+        cancel_event: threading.Event，被设置后停止检测，返回已得到的结果
+
+    Returns:
+        {重复文件路径: 最先出现的相同文件路径}
+    """
+    index = DuplicateIndex()
+    duplicates = {}
+    for path, size in items:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        original = index.add(path, size)
+        if original is not None:
+            duplicates[path] = original
+    return duplicates
@@ -0,0 +1,250 @@
+"""EXIF 快速读取
+
+只读取文件开头的少量标记段/数据块来定位 EXIF（TIFF）数据，然后按需遍历 IFD，
+只解析调用方请求的标签。不解码像素，也不构造 Pillow/piexif 对象，
+适合对大量文件批量读取少数几个字段（如 Make/Model/DateTimeOriginal）。
+"""
+import os
+import struct
+
+import piexif
+
+from exif_tags import TAG_LOCATIONS
+from image_container import EXIF_HEADER, PNG_SIGNATURE
+
+# 子 IFD 的指针所在位置：IFD名 -> (父IFD名, 指针标签ID)
+_SUB_IFD_POINTERS = {
+    'Exif': ('0th', piexif.ImageIFD.ExifTag),
+    'GPS': ('0th', piexif.ImageIFD.GPSTag),
+    'Interop': ('Exif', piexif.ExifIFD.InteroperabilityTag),
+}
+
+# TIFF 数据类型 -> (struct 格式字符, 单个值字节数)
+_TIFF_TYPES = {
+    1: ('B', 1),    # BYTE
+    2: ('s', 1),    # ASCII
+    3: ('H', 2),    # SHORT
+    4: ('I', 4),    # LONG
+    5: ('I', 8),    # RATIONAL
+    6: ('b', 1),    # SBYTE
+    7: ('s', 1),    # UNDEFINED
+    8: ('h', 2),    # SSHORT
+    9: ('i', 4),    # SLONG
+    10: ('i', 8),   # SRATIONAL
+    11: ('f', 4),   # FLOAT
+    12: ('d', 8),   # DOUBLE
+}
+
+
+def _strip_exif_header(data):
+    """去掉部分写入程序在 TIFF 数据前附加的 Exif 头"""
+    return data[6:] if data.startswith(EXIF_HEADER) else data
+
+
+def _find_jpeg_exif(f):
+    """顺序读取 JPEG 标记段头部，遇到 SOS 即停止"""
+    f.seek(2)
+    while True:
+        marker_bytes = f.read(2)
+        if len(marker_bytes) < 2 or marker_bytes[0] != 0xFF:
+            return None
+        marker = marker_bytes[1]
+        # 跳过填充字节
+        while marker == 0xFF:
+            byte = f.read(1)
+            if not byte:
+                return None
+            marker = byte[0]
+        if marker in (0xD9, 0xDA):
+            return None
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0] - 2
+        if marker == 0xE1:
+            payload = f.read(length)
+            if payload.startswith(EXIF_HEADER):
+                return payload[6:]
+        else:
+            f.seek(length, os.SEEK_CUR)
+
+
+def _find_png_exif(f):
+    """顺序读取 PNG 数据块头部，遇到 IDAT 即停止（与 Pillow 打开文件时的行为一致）"""
+    f.seek(8)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"eXIf":
+            return _strip_exif_header(f.read(length))
+        if chunk_type in (b"IDAT", b"IEND"):
+            return None
+        f.seek(length + 4, os.SEEK_CUR)
+
+
+def _find_webp_exif(f, riff_end):
+    """跳过 RIFF 块内容，只读取 EXIF 块"""
+    pos = 12
+    f.seek(pos)
+    while pos + 8 <= riff_end:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        fourcc, size = struct.unpack("<4sI", header)
+        if fourcc == b"EXIF":
+            return _strip_exif_header(f.read(size))
+        padded = size + (size & 1)
+        f.seek(padded, os.SEEK_CUR)
+        pos += 8 + padded
+    return None
+
+
+def read_exif_block(image_path):
+    """只读取文件头部，返回 EXIF 的 TIFF 数据（以 II/MM 开头），没有则返回 None"""
+    with open(image_path, "rb") as f:
+        head = f.read(12)
+        if head[:2] == b"\xff\xd8":
+            return _find_jpeg_exif(f)
+        if head[:8] == PNG_SIGNATURE:
+            return _find_png_exif(f)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return _find_webp_exif(f, 8 + struct.unpack("<I", head[4:8])[0])
+    return None
+
+
+class _TiffReader:
+    """在 TIFF 数据上按需读取 IFD 条目"""
+
+    def __init__(self, data):
+        if len(data) < 8:
+            raise ValueError("无效的EXIF数据")
+        if data[:2] == b"II":
+            self.endian = "<"
+        elif data[:2] == b"MM":
+            self.endian = ">"
+        else:
+            raise ValueError("无效的EXIF数据")
+        self.data = data
+        self.ifd0_offset = struct.unpack_from(self.endian + "I", data, 4)[0]
+
+    def read_ifd(self, offset, wanted=None):
+        """读取一个 IFD，wanted 为需要的标签ID集合（None 表示全部）"""
+        data = self.data
+        endian = self.endian
+        if offset <= 0 or offset + 2 > len(data):
+            return {}
+        count = struct.unpack_from(endian + "H", data, offset)[0]
+        entries = {}
+        pos = offset + 2
+        for _ in range(count):
+            if pos + 12 > len(data):
+                break
+            tag_id, tag_type, value_count = struct.unpack_from(endian + "HHI", data, pos)
+            if wanted is None or tag_id in wanted:
+                value = self._read_value(tag_type, value_count, pos + 8)
+                if value is not None:
+                    entries[tag_id] = value
+                if wanted is not None and len(entries) == len(wanted):
+                    break
+            pos += 12
+        return entries
+
+    def _read_value(self, tag_type, count, value_pos):
+        type_info = _TIFF_TYPES.get(tag_type)
+        if type_info is None:
+            return None
+        fmt, size = type_info
+        total = size * count
+        if total > 4:
+            value_pos = struct.unpack_from(self.endian + "I", self.data, value_pos)[0]
+        if value_pos + total > len(self.data):
+            return None
+
+        raw = self.data[value_pos:value_pos + total]
+        if tag_type == 2:
+            return raw.split(b"\x00", 1)[0].decode("utf-8", "replace")
+        if tag_type == 7:
+            return bytes(raw)
+        if tag_type in (5, 10):
+            values = struct.unpack(f"{self.endian}{count * 2}{fmt}", raw)
+            values = tuple(zip(values[0::2], values[1::2]))
+        else:
+            values = struct.unpack(f"{self.endian}{count}{fmt}", raw)
+        return values[0] if count == 1 else values
+
+
+def parse_exif_fields(tiff_data, fields=None):
+    """从 TIFF 数据中读取指定字段
+
+    Args:
+        tiff_data: EXIF 的 TIFF 数据
+        fields: 需要的标签名列表（如 ['Make', 'Model']），None 表示读取全部
+
+    Returns:
+        {标签名: 值}，ASCII 值为 str，有理数为 (分子, 分母)，找不到的字段不出现在结果中
+    """
+    reader = _TiffReader(tiff_data)
+
+    # 按 IFD 归类需要的标签
+    if fields is None:
+        wanted = {'0th': None, 'Exif': None, 'GPS': None, 'Interop': None}
+    else:
+        wanted = {}
+        for name in fields:
+            for ifd, tag_id in TAG_LOCATIONS.get(name, ()):
+                wanted.setdefault(ifd, set()).add(tag_id)
+        # 需要子 IFD 时，父 IFD 中的指针也要读取
+        for ifd in ('Interop', 'GPS', 'Exif'):
+            if ifd in wanted:
+                parent, pointer = _SUB_IFD_POINTERS[ifd]
+                if wanted.get(parent, set()) is not None:
+                    wanted.setdefault(parent, set()).add(pointer)
+
+    ifds = {}
+    for ifd in ('0th', 'Exif', 'GPS', 'Interop'):
+        if ifd not in wanted:
+            continue
+        if ifd == '0th':
+            offset = reader.ifd0_offset
+        else:
+            parent, pointer = _SUB_IFD_POINTERS[ifd]
+            offset = ifds.get(parent, {}).get(pointer)
+            if not isinstance(offset, int):
+                continue
+        ifds[ifd] = reader.read_ifd(offset, wanted[ifd])
+
+    result = {}
+    if fields is None:
+        for ifd, entries in ifds.items():
+            for tag_id, value in entries.items():
+                tag_info = piexif.TAGS[ifd].get(tag_id)
+                result.setdefault(tag_info['name'] if tag_info else tag_id, value)
+        return result
+
+    for name in fields:
+        for ifd, tag_id in TAG_LOCATIONS.get(name, ()):
+            if tag_id in ifds.get(ifd, {}):
+                result[name] = ifds[ifd][tag_id]
+                break
+    return result
+
+
+def read_exif_fields(image_path, fields=None):
+    """快速读取图片的 EXIF 字段，不解码像素
+
+    Args:
+        image_path: JPEG/PNG/WebP 文件路径
+        fields: 需要的标签名列表，None 表示读取全部
+
+    Returns:
+        {标签名: 值}，没有 EXIF 时返回空字典
+    """
+    tiff_data = read_exif_block(image_path)
+    if not tiff_data:
+        return {}
+    return parse_exif_fields(tiff_data, fields)
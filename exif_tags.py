@@ -0,0 +1,283 @@
+"""EXIF 标签注册表
+
+模块加载时一次性构建标签名到 (IFD, 标签ID, 类型, 转换函数) 的映射，
+以及按 IFD 区分的显示名称和中文说明，避免每次读写元数据时重复遍历 piexif.TAGS。
+"""
+from collections import namedtuple
+
+import piexif
+from PIL.ExifTags import GPSTAGS, TAGS
+
+TagSpec = namedtuple('TagSpec', ['ifd', 'tag_id', 'type', 'converter'])
+
+# update_metadata 按此顺序查找标签名，先找到的生效
+UPDATE_IFD_ORDER = ('0th', '1st', 'Exif', 'GPS')
+
+# EXIF标签说明
+TAG_DESCRIPTIONS = {
+    'EXIF_Orientation': '图片方向',
+    'EXIF_XResolution': '水平分辨率',
+    'EXIF_YResolution': '垂直分辨率',
+    'EXIF_ResolutionUnit': '分辨率单位',
+    'EXIF_ExifOffset': 'Exif数据偏移量',
+    'EXIF_Make': '相机制造商',
+    'EXIF_Model': '相机型号',
+    'EXIF_Software': '软件',
+    'EXIF_DateTime': '修改时间',
+    'EXIF_YCbCrPositioning': '色彩位置',
+    'EXIF_ExifVersion': 'Exif版本',
+    'EXIF_ComponentsConfiguration': '图像构成',
+    'EXIF_FlashPixVersion': 'FlashPix版本',
+    'EXIF_ColorSpace': '色彩空间',
+    'EXIF_ExifImageWidth': '图像宽度',
+    'EXIF_ExifImageHeight': '图像高度',
+    'EXIF_SceneCaptureType': '场景拍摄类型',
+    'EXIF_Compression': '压缩方式',
+    'EXIF_JPEGInterchangeFormat': 'JPEG数据位置',
+    'EXIF_JPEGInterchangeFormatLength': 'JPEG数据长度',
+    'EXIF_Artist': '作者',
+    'EXIF_Copyright': '版权',
+    'EXIF_ImageDescription': '图像描述',
+    'EXIF_DateTimeOriginal': '原始拍摄时间',
+    'EXIF_DateTimeDigitized': '数字化时间',
+    'EXIF_SubSecTime': '秒小数',
+    'EXIF_SubSecTimeOriginal': '原始秒小数',
+    'EXIF_SubSecTimeDigitized': '数字化秒小数',
+    'EXIF_ExposureTime': '曝光时间',
+    'EXIF_FNumber': '光圈值',
+    'EXIF_ExposureProgram': '曝光程序',
+    'EXIF_ISOSpeedRatings': 'ISO感光度',
+    'EXIF_SensitivityType': '感光度类型',
+    'EXIF_CompressedBitsPerPixel': '压缩位深',
+    'EXIF_ShutterSpeedValue': '快门速度',
+    'EXIF_ApertureValue': '光圈值',
+    'EXIF_BrightnessValue': '亮度值',
+    'EXIF_ExposureBiasValue': '曝光补偿',
+    'EXIF_MaxApertureValue': '最大光圈值',
+    'EXIF_SubjectDistance': '主体距离',
+    'EXIF_MeteringMode': '测光模式',
+    'EXIF_LightSource': '光源',
+    'EXIF_Flash': '闪光灯',
+    'EXIF_FocalLength': '焦距',
+    'EXIF_MakerNote': '制造商注释',
+    'EXIF_UserComment': '用户评论',
+    'EXIF_SubsecTime': '秒小数',
+    'EXIF_SubsecTimeOriginal': '原始秒小数',
+    'EXIF_SubsecTimeDigitized': '数字化秒小数',
+    'EXIF_InteroperabilityOffset': '互通性偏移量',
+    'EXIF_FocalPlaneXResolution': '焦平面水平分辨率',
+    'EXIF_FocalPlaneYResolution': '焦平面垂直分辨率',
+    'EXIF_FocalPlaneResolutionUnit': '焦平面分辨率单位',
+    'EXIF_SensingMethod': '感应方式',
+    'EXIF_FileSource': '文件来源',
+    'EXIF_SceneType': '场景类型',
+    'EXIF_CustomRendered': '自定义图像处理',
+    'EXIF_ExposureMode': '曝光模式',
+    'EXIF_WhiteBalance': '白平衡',
+    'EXIF_DigitalZoomRatio': '数字变焦比率',
+    'EXIF_FocalLengthIn35mmFilm': '35mm等效焦距',
+    'EXIF_GainControl': '增益控制',
+    'EXIF_Contrast': '对比度',
+    'EXIF_Saturation': '饱和度',
+    'EXIF_Sharpness': '锐度',
+    'EXIF_SubjectDistanceRange': '主体距离范围',
+    'EXIF_GPSVersionID': 'GPS版本',
+    'EXIF_GPSLatitudeRef': '纬度参考',
+    'EXIF_GPSLatitude': '纬度',
+    'EXIF_GPSLongitudeRef': '经度参考',
+    'EXIF_GPSLongitude': '经度',
+    'EXIF_GPSAltitudeRef': '高度参考',
+    'EXIF_GPSAltitude': '高度',
+    'EXIF_GPSTimeStamp': 'GPS时间戳',
+    'EXIF_GPSSatellites': 'GPS卫星',
+    'EXIF_GPSStatus': 'GPS状态',
+    'EXIF_GPSMeasureMode': 'GPS测量模式',
+    'EXIF_GPSDOP': 'GPS精度',
+    'EXIF_GPSSpeedRef': 'GPS速度参考',
+    'EXIF_GPSSpeed': 'GPS速度',
+    'EXIF_GPSTrackRef': 'GPS方向参考',
+    'EXIF_GPSTrack': 'GPS方向',
+    'EXIF_GPSImgDirectionRef': 'GPS图像方向参考',
+    'EXIF_GPSImgDirection': 'GPS图像方向',
+    'EXIF_GPSMapDatum': 'GPS地图基准',
+    'EXIF_GPSDestLatitudeRef': 'GPS目标纬度参考',
+    'EXIF_GPSDestLatitude': 'GPS目标纬度',
+    'EXIF_GPSDestLongitudeRef': 'GPS目标经度参考',
+    'EXIF_GPSDestLongitude': 'GPS目标经度',
+    'EXIF_GPSDestBearingRef': 'GPS目标方位参考',
+    'EXIF_GPSDestBearing': 'GPS目标方位',
+    'EXIF_GPSDestDistanceRef': 'GPS目标距离参考',
+    'EXIF_GPSDestDistance': 'GPS目标距离',
+    'EXIF_GPSProcessingMethod': 'GPS处理方法',
+    'EXIF_GPSAreaInformation': 'GPS区域信息',
+    'EXIF_GPSDateStamp': 'GPS日期戳',
+    'EXIF_GPSDifferential': 'GPS差分校正',
+}
+
+
+def _parse_fraction(value):
+    num, den = map(int, value.split('/'))
+    return (num, den)
+
+
+def _to_ascii(value):
+    return value.encode('utf-8')
+
+
+def _to_short(value):
+    if isinstance(value, str):
+        if '/' in value:  # 处理分数格式
+            return _parse_fraction(value)
+        return int(value)
+    return value
+
+
+def _to_long(value):
+    if isinstance(value, str):
+        return int(value)
+    return value
+
+
+def _to_rational(value):
+    if isinstance(value, str):
+        if '/' in value:
+            return _parse_fraction(value)
+        value = float(value)
+        # 转换为分数形式
+        return (int(value * 100), 100)
+    return value
+
+
+def _keep(value):
+    return value
+
+
+_CONVERTERS = {
+    piexif.TYPES.Ascii: _to_ascii,
+    piexif.TYPES.Short: _to_short,
+    piexif.TYPES.Long: _to_long,
+    piexif.TYPES.Rational: _to_rational,
+}
+
+
+def convert_value(value, spec):
+    """按标签类型转换用户输入的值，转换失败时原样返回"""
+    try:
+        return spec.converter(value)
+    except Exception:
+        return value
+
+
+def _build_registry():
+    registry = {}
+    for ifd in UPDATE_IFD_ORDER:
+        for tag_id, tag_info in piexif.TAGS[ifd].items():
+            if tag_info['name'] not in registry:
+                converter = _CONVERTERS.get(tag_info['type'], _keep)
+                registry[tag_info['name']] = TagSpec(ifd, tag_id, tag_info['type'], converter)
+    return registry
+
+
+def _build_locations():
+    locations = {}
+    for ifd in ('0th', 'Exif', 'GPS', 'Interop'):
+        for tag_id, tag_info in piexif.TAGS[ifd].items():
+            locations.setdefault(tag_info['name'], []).append((ifd, tag_id))
+    return locations
+
+
+def _find_fallback_tag():
+    for tag_id, tag_info in piexif.TAGS['0th'].items():
+        if tag_info['type'] == piexif.TYPES.Ascii:
+            return TagSpec('0th', tag_id, tag_info['type'], _to_ascii)
+    return None
+
+
+# 标签名 -> TagSpec
+TAG_REGISTRY = _build_registry()
+
+# 标签名 -> [(IFD名, 标签ID), ...]，同名标签出现在多个 IFD 时按顺序依次尝试
+TAG_LOCATIONS = _build_locations()
+
+# 找不到对应标签时，作为字符串存储使用的标签
+FALLBACK_ASCII_TAG = _find_fallback_tag()
+
+# 可选择性清除的元数据块
+SELECTIVE_STRIP_BLOCKS = {
+    'gps': 'GPS定位信息',
+    'makernote': '制造商注释',
+    'thumbnail': '内嵌缩略图',
+    'serial': '设备序列号',
+}
+
+# 可识别设备或拍摄者的标签
+SERIAL_NUMBER_TAGS = {
+    '0th': (piexif.ImageIFD.CameraSerialNumber,),
+    'Exif': (
+        piexif.ExifIFD.BodySerialNumber,
+        piexif.ExifIFD.LensSerialNumber,
+        piexif.ExifIFD.CameraOwnerName,
+        piexif.ExifIFD.ImageUniqueID,
+    ),
+}
+
+
+def apply_fields(exif_dict, metadata):
+    """把 {标签名: 值} 写入 piexif 格式的 EXIF 字典（原地修改）
+
+    找不到对应标签的字段作为字符串存储在 FALLBACK_ASCII_TAG 中。
+    """
+    for field, value in metadata.items():
+        spec = TAG_REGISTRY.get(field)
+        if spec is not None:
+            exif_dict.setdefault(spec.ifd, {})[spec.tag_id] = convert_value(value, spec)
+        elif FALLBACK_ASCII_TAG is not None:
+            exif_dict.setdefault('0th', {})[FALLBACK_ASCII_TAG.tag_id] = str(value).encode('utf-8')
+    return exif_dict
+
+
+def remove_exif_blocks(exif_dict, blocks):
+    """从 piexif.load 得到的字典中删除指定的元数据块
+
+    Args:
+        exif_dict: piexif 格式的 EXIF 字典，原地修改
+        blocks: SELECTIVE_STRIP_BLOCKS 中的键
+
+    Returns:
+        是否有数据被删除
+    """
+    unknown = set(blocks) - set(SELECTIVE_STRIP_BLOCKS)
+    if unknown:
+        raise ValueError(f"未知的元数据块: {', '.join(sorted(unknown))}")
+
+    changed = False
+    if 'gps' in blocks and exif_dict.get('GPS'):
+        exif_dict['GPS'] = {}
+        changed = True
+    if 'makernote' in blocks and piexif.ExifIFD.MakerNote in exif_dict.get('Exif', {}):
+        del exif_dict['Exif'][piexif.ExifIFD.MakerNote]
+        changed = True
+    if 'thumbnail' in blocks and (exif_dict.get('thumbnail') or exif_dict.get('1st')):
+        exif_dict['thumbnail'] = None
+        exif_dict['1st'] = {}
+        changed = True
+    if 'serial' in blocks:
+        for ifd, tag_ids in SERIAL_NUMBER_TAGS.items():
+            for tag_id in tag_ids:
+                if tag_id in exif_dict.get(ifd, {}):
+                    del exif_dict[ifd][tag_id]
+                    changed = True
+    return changed
+
+
+def display_name(ifd, tag_id):
+    """返回标签的显示名称，GPS IFD 使用 GPS 标签表"""
+    if ifd == 'GPS':
+        return GPSTAGS.get(tag_id, tag_id)
+    return TAGS.get(tag_id, tag_id)
+
+
+def describe(ifd, tag_id):
+    """返回 (显示名称, 中文说明)，没有说明时为空字符串"""
+    tag_name = f"EXIF_{display_name(ifd, tag_id)}"
+    return tag_name, TAG_DESCRIPTIONS.get(tag_name, '')
@@ -0,0 +1,56 @@
+"""文件夹扫描
+
+用 os.scandir 遍历目录，文件类型和大小直接取自 DirEntry（Windows 上无需额外系统调用，
+其他平台每个文件一次 stat），按批次产出结果，便于在后台线程中边扫描边显示。
+"""
+import os
+
+from batch_engine import IMAGE_EXTENSIONS
+
+# 每批产出的文件数
+SCAN_BATCH_SIZE = 500
+
+
+def iter_image_files(folder, cancel_event=None, extensions=IMAGE_EXTENSIONS):
+    """递归查找图片文件，按目录名、文件名排序后逐个产出 (路径, 大小)
+
+    Args:
+        folder: 要扫描的目录
+        cancel_event: threading.Event，被设置后尽快停止扫描
+        extensions: 小写的扩展名元组
+    """
+    pending = [folder]
+    while pending:
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            # 无权限或扫描过程中被删除的目录直接跳过
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(extensions) and entry.is_file():
+                    yield entry.path, entry.stat().st_size
+            except OSError:
+                continue
+        # 倒序入栈，保证按名称顺序深度优先遍历
+        pending.extend(reversed(subdirs))
+
+
+def scan_in_batches(folder, cancel_event=None, batch_size=SCAN_BATCH_SIZE):
+    """与 iter_image_files 相同，但每次产出最多 batch_size 个 (路径, 大小)"""
+    batch = []
+    for item in iter_image_files(folder, cancel_event):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
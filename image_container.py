@@ -0,0 +1,581 @@
+"""图片容器级别的元数据处理
+
+直接按 JPEG 标记段、PNG 数据块、WebP (RIFF) 块结构读写文件，
+像素数据（扫描数据/IDAT/VP8/VP8L）按字节原样复制，
+不解码、不重新编码，因此处理结果与原图像素完全一致。
+"""
+import mmap
+import os
+import struct
+import zlib
+
+# JPEG 标记
+JPEG_SOI = 0xD8
+JPEG_EOI = 0xD9
+JPEG_SOS = 0xDA
+JPEG_COM = 0xFE
+JPEG_APP0 = 0xE0
+JPEG_APP1 = 0xE1
+JPEG_APP2 = 0xE2
+JPEG_APP13 = 0xED
+JPEG_APP14 = 0xEE
+
+# 没有长度字段的独立标记：TEM、RST0-RST7、SOI、EOI
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8), JPEG_SOI, JPEG_EOI}
+
+ICC_PROFILE_SIGNATURE = b"ICC_PROFILE\x00"
+EXIF_HEADER = b"Exif\x00\x00"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# 默认清除的 PNG 元数据块
+PNG_METADATA_CHUNKS = frozenset({b"tEXt", b"zTXt", b"iTXt", b"eXIf", b"tIME", b"iCCP"})
+
+# WebP 元数据块及其在 VP8X 标志位中对应的位
+WEBP_METADATA_CHUNKS = {b"EXIF": 0x08, b"XMP ": 0x04}
+WEBP_ICC_CHUNK = b"ICCP"
+WEBP_ICC_FLAG = 0x20
+
+# 流式复制时每次读取的字节数
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def _keep_jpeg_segment(marker, payload, keep_icc):
+    """判断 JPEG 标记段是否需要保留
+
+    APP0 (JFIF) 和 APP14 (Adobe) 影响解码方式，必须保留；
+    APP2 中的 ICC 色彩配置按需保留；其余 APPn（EXIF/XMP/IPTC/FPXR/MPF 等）
+    和 COM 注释全部丢弃。非 APP/COM 的标记段（SOF/DQT/DHT/DRI 等）原样保留。
+    """
+    if marker == JPEG_COM:
+        return False
+    if not 0xE0 <= marker <= 0xEF:
+        return True
+    if marker == JPEG_APP0:
+        return payload.startswith(b"JFIF\x00")
+    if marker == JPEG_APP14:
+        return payload.startswith(b"Adobe")
+    if marker == JPEG_APP2:
+        return keep_icc and payload.startswith(ICC_PROFILE_SIGNATURE)
+    return False
+
+
+def _iter_jpeg_segments(data):
+    """遍历 JPEG 标记段
+
+    依次产出 (marker, start, end)：start 为 0xFF 标记所在位置，end 为该段结束位置。
+    SOS 段之后的熵编码数据作为 marker=None 的段产出，EOI 之后的尾随数据被忽略。
+    """
+    size = len(data)
+    if size < 4 or data[0] != 0xFF or data[1] != JPEG_SOI:
+        raise ValueError("不是有效的JPEG文件")
+    yield JPEG_SOI, 0, 2
+
+    pos = 2
+    while pos < size:
+        if data[pos] != 0xFF:
+            raise ValueError(f"JPEG标记段损坏（位置 {pos}）")
+        # 跳过填充字节
+        while pos < size and data[pos] == 0xFF:
+            pos += 1
+        if pos >= size:
+            break
+        start = pos - 1
+        marker = data[pos]
+        pos += 1
+
+        if marker == JPEG_EOI:
+            yield marker, start, pos
+            return
+        if marker in JPEG_STANDALONE_MARKERS:
+            yield marker, start, pos
+            continue
+
+        if pos + 2 > size:
+            raise ValueError("JPEG文件被截断")
+        length = struct.unpack(">H", data[pos:pos + 2])[0]
+        end = pos + length
+        if length < 2 or end > size:
+            raise ValueError(f"JPEG标记段长度无效（位置 {start}）")
+        yield marker, start, end
+        pos = end
+
+        if marker == JPEG_SOS:
+            # 扫描熵编码数据，直到遇到下一个真正的标记
+            # （0xFF00 为字节填充，0xFFD0-0xFFD7 为重启标记）
+            scan_start = pos
+            while True:
+                pos = data.find(b"\xff", pos)
+                if pos < 0 or pos + 1 >= size:
+                    # 文件没有 EOI，按原样保留剩余数据
+                    yield None, scan_start, size
+                    return
+                next_byte = data[pos + 1]
+                if next_byte == 0x00 or 0xD0 <= next_byte <= 0xD7 or next_byte == 0xFF:
+                    pos += 1
+                    continue
+                break
+            yield None, scan_start, pos
+
+
+def _jpeg_exif_segment(exif_bytes):
+    """由 piexif.dump 的结果构造完整的 APP1 标记段，数据为空时返回空字节串"""
+    if not exif_bytes:
+        return b""
+    if not exif_bytes.startswith(EXIF_HEADER):
+        exif_bytes = EXIF_HEADER + exif_bytes
+    if len(exif_bytes) + 2 > 0xFFFF:
+        raise ValueError("EXIF数据超过JPEG标记段的最大长度（64KB）")
+    return b"\xff\xe1" + struct.pack(">H", len(exif_bytes) + 2) + exif_bytes
+
+
+def strip_jpeg_metadata(src_path, dst_path, keep_icc=False, exif_bytes=b""):
+    """按标记段重写 JPEG，去除元数据，像素数据按字节复制
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 输出文件路径（不能与源文件相同）
+        keep_icc: 是否保留 ICC 色彩配置
+        exif_bytes: 同时写入的新 EXIF 数据（插入在 SOI/APP0 之后），为空则不写入
+    """
+    segment = _jpeg_exif_segment(exif_bytes)
+    if os.path.getsize(src_path) == 0:
+        raise ValueError("不是有效的JPEG文件")
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                # 连续保留的段合并为一次写入
+                copy_start = 0
+                last_end = 0
+                inserted = not segment
+                for marker, start, end in _iter_jpeg_segments(data):
+                    if not inserted and marker not in (JPEG_SOI, JPEG_APP0):
+                        dst.write(view[copy_start:start])
+                        dst.write(segment)
+                        copy_start = start
+                        inserted = True
+                    if marker is not None and not _keep_jpeg_segment(marker, data[start + 4:start + 18], keep_icc):
+                        dst.write(view[copy_start:start])
+                        copy_start = end
+                    last_end = end
+                # EOI 之后的尾随数据被丢弃
+                dst.write(view[copy_start:last_end])
+            finally:
+                view.release()
+
+
+def _copy_bytes(src, dst, length):
+    """从 src 向 dst 流式复制 length 个字节"""
+    while length > 0:
+        buf = src.read(min(length, COPY_BUFFER_SIZE))
+        if not buf:
+            raise ValueError("文件被截断")
+        dst.write(buf)
+        length -= len(buf)
+
+
+def _png_exif_chunk(exif_bytes):
+    """由 piexif.dump 的结果构造完整的 eXIf 数据块，数据为空时返回空字节串"""
+    if exif_bytes.startswith(EXIF_HEADER):
+        exif_bytes = exif_bytes[len(EXIF_HEADER):]
+    if not exif_bytes:
+        return b""
+    return (struct.pack(">I", len(exif_bytes)) + b"eXIf" + exif_bytes
+            + struct.pack(">I", zlib.crc32(b"eXIf" + exif_bytes)))
+
+
+def strip_png_metadata(src_path, dst_path, keep_icc=False, drop_chunks=PNG_METADATA_CHUNKS, exif_bytes=b""):
+    """按数据块重写 PNG，去除元数据块，IDAT 原样复制
+
+    只做一次顺序读写，不解压也不重新计算 CRC。
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 输出文件路径（不能与源文件相同）
+        keep_icc: 是否保留 iCCP 色彩配置
+        drop_chunks: 需要丢弃的数据块类型集合
+        exif_bytes: 同时写入的新 EXIF 数据（写在第一个 IDAT 之前），为空则不写入
+    """
+    exif_chunk = _png_exif_chunk(exif_bytes)
+    if exif_chunk:
+        drop_chunks = set(drop_chunks) | {b"eXIf"}
+    if keep_icc:
+        drop_chunks = set(drop_chunks) - {b"iCCP"}
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        if src.read(8) != PNG_SIGNATURE:
+            raise ValueError("不是有效的PNG文件")
+        dst.write(PNG_SIGNATURE)
+
+        while True:
+            header = src.read(8)
+            if len(header) < 8:
+                raise ValueError("PNG文件被截断（缺少IEND）")
+            length, chunk_type = struct.unpack(">I4s", header)
+            if exif_chunk and chunk_type in (b"IDAT", b"IEND"):
+                dst.write(exif_chunk)
+                exif_chunk = b""
+            # 数据 + 4 字节 CRC
+            if chunk_type in drop_chunks:
+                src.seek(length + 4, os.SEEK_CUR)
+            else:
+                dst.write(header)
+                _copy_bytes(src, dst, length + 4)
+            if chunk_type == b"IEND":
+                break
+
+
+def strip_webp_metadata(src_path, dst_path, keep_icc=False, exif_bytes=b""):
+    """按 RIFF 块重写 WebP，去除 EXIF/XMP 块，VP8/VP8L 位流原样复制
+
+    同时清除 VP8X 中对应的标志位并修正 RIFF 总长度。
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 输出文件路径（不能与源文件相同）
+        keep_icc: 是否保留 ICCP 色彩配置
+        exif_bytes: 同时写入的新 EXIF 数据（追加在末尾），为空则不写入；
+            只有扩展格式（带 VP8X 块）的 WebP 可以写入
+    """
+    if exif_bytes.startswith(EXIF_HEADER):
+        exif_bytes = exif_bytes[len(EXIF_HEADER):]
+    drop_chunks = dict(WEBP_METADATA_CHUNKS)
+    if not keep_icc:
+        drop_chunks[WEBP_ICC_CHUNK] = WEBP_ICC_FLAG
+    clear_flags = 0
+    for flag in drop_chunks.values():
+        clear_flags |= flag
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        header = src.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WEBP":
+            raise ValueError("不是有效的WebP文件")
+        riff_end = 8 + struct.unpack("<I", header[4:8])[0]
+        # RIFF 长度稍后回填
+        dst.write(header)
+
+        has_vp8x = False
+        pos = 12
+        while pos + 8 <= riff_end:
+            chunk_header = src.read(8)
+            if len(chunk_header) < 8:
+                break
+            fourcc, size = struct.unpack("<4sI", chunk_header)
+            padding = size & 1
+            pos += 8 + size + padding
+
+            if fourcc in drop_chunks:
+                src.seek(size + padding, os.SEEK_CUR)
+                continue
+
+            dst.write(chunk_header)
+            if fourcc == b"VP8X":
+                has_vp8x = True
+                payload = bytearray(src.read(size))
+                if len(payload) < size or size < 1:
+                    raise ValueError("WebP文件被截断")
+                payload[0] &= ~clear_flags & 0xFF
+                if exif_bytes:
+                    payload[0] |= WEBP_METADATA_CHUNKS[b"EXIF"]
+                dst.write(payload)
+            else:
+                _copy_bytes(src, dst, size)
+            if padding:
+                src.read(1)
+                dst.write(b"\x00")
+
+        if exif_bytes:
+            if not has_vp8x:
+                raise ValueError("简单格式的WebP不能写入EXIF")
+            _write_riff_chunk(dst, b"EXIF", exif_bytes)
+
+        riff_size = dst.tell() - 8
+        dst.seek(4)
+        dst.write(struct.pack("<I", riff_size))
+
+
+def replace_jpeg_exif(src_path, dst_path, exif_bytes):
+    """替换 JPEG 中的 EXIF (APP1) 标记段，其余数据按字节复制
+
+    原有的 EXIF 段被删除，新的 APP1 段插入在 SOI 和 APP0 (JFIF) 之后；
+    XMP 等其他 APP1 段及扫描数据保持不变。
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 输出文件路径（不能与源文件相同）
+        exif_bytes: piexif.dump 生成的 EXIF 数据，为空时只删除原有 EXIF
+    """
+    segment = _jpeg_exif_segment(exif_bytes)
+    if os.path.getsize(src_path) == 0:
+        raise ValueError("不是有效的JPEG文件")
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                copy_start = 0
+                inserted = False
+                for marker, start, end in _iter_jpeg_segments(data):
+                    if not inserted and marker not in (JPEG_SOI, JPEG_APP0):
+                        dst.write(view[copy_start:start])
+                        dst.write(segment)
+                        copy_start = start
+                        inserted = True
+                    if marker == JPEG_APP1 and data[start + 4:start + 10] == EXIF_HEADER:
+                        dst.write(view[copy_start:start])
+                        copy_start = end
+                # EOI 之后的尾随数据（如 MPF 附加图像）一并保留
+                dst.write(view[copy_start:])
+            finally:
+                view.release()
+
+
+def replace_png_exif(src_path, dst_path, exif_bytes):
+    """替换 PNG 中的 eXIf 数据块，新块写在第一个 IDAT 之前，其余数据块原样复制
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 输出文件路径（不能与源文件相同）
+        exif_bytes: piexif.dump 生成的 EXIF 数据，为空时只删除原有 eXIf
+    """
+    chunk = _png_exif_chunk(exif_bytes)
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        if src.read(8) != PNG_SIGNATURE:
+            raise ValueError("不是有效的PNG文件")
+        dst.write(PNG_SIGNATURE)
+
+        inserted = False
+        while True:
+            header = src.read(8)
+            if len(header) < 8:
+                raise ValueError("PNG文件被截断（缺少IEND）")
+            length, chunk_type = struct.unpack(">I4s", header)
+            if chunk_type == b"eXIf":
+                src.seek(length + 4, os.SEEK_CUR)
+                continue
+            if not inserted and chunk_type in (b"IDAT", b"IEND"):
+                dst.write(chunk)
+                inserted = True
+            dst.write(header)
+            _copy_bytes(src, dst, length + 4)
+            if chunk_type == b"IEND":
+                break
+
+
+def replace_webp_exif(src_path, dst_path, exif_bytes):
+    """替换 WebP 中的 EXIF 块，同步 VP8X 标志位和 RIFF 长度，其余块原样复制
+
+    只支持扩展格式（带 VP8X 块）的 WebP，简单格式无法携带 EXIF。
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 输出文件路径（不能与源文件相同）
+        exif_bytes: piexif.dump 生成的 EXIF 数据，为空时只删除原有 EXIF
+    """
+    if exif_bytes.startswith(EXIF_HEADER):
+        exif_bytes = exif_bytes[len(EXIF_HEADER):]
+    exif_flag = WEBP_METADATA_CHUNKS[b"EXIF"]
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        header = src.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WEBP":
+            raise ValueError("不是有效的WebP文件")
+        riff_end = 8 + struct.unpack("<I", header[4:8])[0]
+        dst.write(header)
+
+        has_vp8x = False
+        inserted = False
+        pos = 12
+        while pos + 8 <= riff_end:
+            chunk_header = src.read(8)
+            if len(chunk_header) < 8:
+                break
+            fourcc, size = struct.unpack("<4sI", chunk_header)
+            padding = size & 1
+            pos += 8 + size + padding
+
+            if fourcc == b"EXIF":
+                src.seek(size + padding, os.SEEK_CUR)
+                # EXIF 块放在原位置，保持块顺序
+                if exif_bytes and not inserted:
+                    _write_riff_chunk(dst, b"EXIF", exif_bytes)
+                    inserted = True
+                continue
+
+            # 按规范 EXIF 块位于图像数据之后、XMP 块之前
+            if fourcc == b"XMP " and exif_bytes and not inserted:
+                _write_riff_chunk(dst, b"EXIF", exif_bytes)
+                inserted = True
+
+            dst.write(chunk_header)
+            if fourcc == b"VP8X":
+                has_vp8x = True
+                payload = bytearray(src.read(size))
+                if len(payload) < size or size < 1:
+                    raise ValueError("WebP文件被截断")
+                if exif_bytes:
+                    payload[0] |= exif_flag
+                else:
+                    payload[0] &= ~exif_flag & 0xFF
+                dst.write(payload)
+            else:
+                _copy_bytes(src, dst, size)
+            if padding:
+                src.read(1)
+                dst.write(b"\x00")
+
+        if exif_bytes and not has_vp8x:
+            raise ValueError("简单格式的WebP不能写入EXIF")
+        if exif_bytes and not inserted:
+            _write_riff_chunk(dst, b"EXIF", exif_bytes)
+
+        riff_size = dst.tell() - 8
+        dst.seek(4)
+        dst.write(struct.pack("<I", riff_size))
+
+
+def _write_riff_chunk(dst, fourcc, payload):
+    dst.write(fourcc + struct.pack("<I", len(payload)) + payload)
+    if len(payload) & 1:
+        dst.write(b"\x00")
+
+
+def replace_exif(src_path, dst_path, image_format, exif_bytes):
+    """按容器格式替换 EXIF 数据，不重新编码像素
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 输出文件路径
+        image_format: Pillow 格式名，如 'JPEG'、'PNG'、'WEBP'
+        exif_bytes: piexif.dump 生成的 EXIF 数据
+    """
+    if image_format == 'JPEG':
+        replace_jpeg_exif(src_path, dst_path, exif_bytes)
+    elif image_format == 'PNG':
+        replace_png_exif(src_path, dst_path, exif_bytes)
+    elif image_format == 'WEBP':
+        replace_webp_exif(src_path, dst_path, exif_bytes)
+    else:
+        raise ValueError(f"不支持直接替换EXIF的格式: {image_format}")
+
+
+def supports_exif_splice(image_format):
+    """是否支持不重新编码的 EXIF 替换
+
+    WebP 只有扩展格式才能携带 EXIF，新增 EXIF 时不一定能直接替换，因此不在此列；
+    已有 EXIF 的 WebP 可以直接调用 replace_webp_exif。
+    """
+    return image_format in ('JPEG', 'PNG')
+
+
+def strip_metadata(src_path, dst_path, image_format, keep_icc=False, exif_bytes=b""):
+    """按容器格式无损清除元数据
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 输出文件路径
+        image_format: Pillow 格式名，如 'JPEG'、'PNG'、'WEBP'
+        keep_icc: 是否保留 ICC 色彩配置
+        exif_bytes: 清除后同时写入的新 EXIF 数据，为空则不写入
+    """
+    if image_format == 'JPEG':
+        strip_jpeg_metadata(src_path, dst_path, keep_icc=keep_icc, exif_bytes=exif_bytes)
+    elif image_format == 'PNG':
+        strip_png_metadata(src_path, dst_path, keep_icc=keep_icc, exif_bytes=exif_bytes)
+    elif image_format == 'WEBP':
+        strip_webp_metadata(src_path, dst_path, keep_icc=keep_icc, exif_bytes=exif_bytes)
+    else:
+        raise ValueError(f"不支持无损清除的格式: {image_format}")
+
+
+def supports_lossless_strip(image_format):
+    """是否支持不重新编码的元数据清除"""
+    return image_format in ('JPEG', 'PNG', 'WEBP')
+
+
+def _jpeg_has_metadata(f, keep_icc):
+    """顺序读取标记段头部直到 SOS，不读取扫描数据"""
+    if f.read(2) != b"\xff\xd8":
+        raise ValueError("不是有效的JPEG文件")
+    # 与 strip_jpeg_metadata 一样，结构损坏或截断的文件报错，而不是当作没有元数据
+    while True:
+        marker_bytes = f.read(2)
+        if len(marker_bytes) < 2:
+            raise ValueError("JPEG文件被截断")
+        if marker_bytes[0] != 0xFF:
+            raise ValueError(f"JPEG标记段损坏（位置 {f.tell() - 2}）")
+        marker = marker_bytes[1]
+        while marker == 0xFF:
+            byte = f.read(1)
+            if not byte:
+                raise ValueError("JPEG文件被截断")
+            marker = byte[0]
+        if marker in (JPEG_SOS, JPEG_EOI):
+            return False
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            raise ValueError("JPEG文件被截断")
+        length = struct.unpack(">H", length_bytes)[0] - 2
+        if length < 0:
+            raise ValueError(f"JPEG标记段长度无效（位置 {f.tell() - 4}）")
+        head = f.read(min(length, 14))
+        if not _keep_jpeg_segment(marker, head, keep_icc):
+            return True
+        f.seek(length - len(head), os.SEEK_CUR)
+
+
+def _png_has_metadata(f, keep_icc):
+    """只读取数据块头部，跳过数据内容"""
+    if f.read(8) != PNG_SIGNATURE:
+        raise ValueError("不是有效的PNG文件")
+    drop_chunks = PNG_METADATA_CHUNKS - {b"iCCP"} if keep_icc else PNG_METADATA_CHUNKS
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return False
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type in drop_chunks:
+            return True
+        if chunk_type == b"IEND":
+            return False
+        f.seek(length + 4, os.SEEK_CUR)
+
+
+def _webp_has_metadata(f, keep_icc):
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WEBP":
+        raise ValueError("不是有效的WebP文件")
+    riff_end = 8 + struct.unpack("<I", header[4:8])[0]
+    pos = 12
+    while pos + 8 <= riff_end:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            return False
+        fourcc, size = struct.unpack("<4sI", chunk_header)
+        if fourcc in WEBP_METADATA_CHUNKS or (fourcc == WEBP_ICC_CHUNK and not keep_icc):
+            return True
+        padded = size + (size & 1)
+        f.seek(padded, os.SEEK_CUR)
+        pos += 8 + padded
+    return False
+
+
+def has_metadata(src_path, image_format, keep_icc=False):
+    """只读取结构信息，判断文件中是否有 strip_metadata 会清除的元数据
+
+    Args:
+        src_path: 文件路径
+        image_format: Pillow 格式名，如 'JPEG'、'PNG'、'WEBP'
+        keep_icc: 是否把 ICC 色彩配置视为需要保留的数据
+    """
+    checkers = {'JPEG': _jpeg_has_metadata, 'PNG': _png_has_metadata, 'WEBP': _webp_has_metadata}
+    if image_format not in checkers:
+        raise ValueError(f"不支持的格式: {image_format}")
+    with open(src_path, "rb") as f:
+        return checkers[image_format](f, keep_icc)
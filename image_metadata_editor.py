@@ -1,128 +1,102 @@
 from PIL import Image
-from PIL.ExifTags import TAGS
 import piexif
+import math
 import os
+import shutil
+import image_container
+import exif_tags
+from run_report import StageTimer, timed
+
+# 重新编码时需要保留的 info 字段（影响像素显示效果，不属于元数据）
+RENDER_INFO_KEYS = ('transparency',)
+
+# 缩小 JPEG 时的解码方式：先由 libjpeg 在 DCT 域按 1/2、1/4、1/8 缩放解码，再用 LANCZOS 缩放到目标尺寸
+RESIZE_BEST = 'best'          # 始终全尺寸解码
+RESIZE_BALANCED = 'balanced'  # 缩放解码后至少保留目标尺寸的 2 倍，画质与全尺寸解码几乎相同
+RESIZE_FAST = 'fast'          # 缩放解码到不小于目标尺寸的最小比例
+
+# 解码方式 -> 缩放解码后相对目标尺寸至少保留的倍数，None 表示全尺寸解码
+DRAFT_OVERSAMPLE = {
+    RESIZE_BEST: None,
+    RESIZE_BALANCED: 2,
+    RESIZE_FAST: 1,
+}
+
+
+def drop_image_metadata(image):
+    """就地清除图像对象上的元数据并返回该图像，像素数据不做任何复制
+
+    Pillow 部分格式保存时会回退读取 image.info 中的 icc_profile/comment 等字段，
+    清空 info 后即可直接保存，无需逐像素复制出一张新图像。
+    """
+    image.load()
+    image.info = {key: image.info[key] for key in RENDER_INFO_KEYS if key in image.info}
+    return image
+
+
+def fit_size(size, new_size):
+    """按比例缩放到不超过 new_size 的最大尺寸"""
+    ratio = min(new_size[0] / size[0], new_size[1] / size[1])
+    return (int(size[0] * ratio), int(size[1] * ratio))
+
+
+def draft_for_resize(image, output_size, resize_mode=RESIZE_BALANCED):
+    """在加载像素之前为 JPEG 请求 DCT 域缩放解码
+
+    Args:
+        image: 尚未加载像素的图像，其他格式或已加载时不做任何处理
+        output_size: 整张图缩放后的尺寸
+        resize_mode: RESIZE_BEST、RESIZE_BALANCED 或 RESIZE_FAST
+
+    Returns:
+        是否使用了缩放解码（使用后 image.size 为缩小后的尺寸）
+    """
+    oversample = DRAFT_OVERSAMPLE.get(resize_mode)
+    if image.format != 'JPEG' or oversample is None:
+        return False
+    original_size = image.size
+    requested = (math.ceil(output_size[0] * oversample), math.ceil(output_size[1] * oversample))
+    # 至少能缩小一半时才有意义
+    if requested[0] * 2 > original_size[0] or requested[1] * 2 > original_size[1]:
+        return False
+    image.draft(image.mode, requested)
+    return image.size != original_size
+
+
+def crop_box(size, target_size, crop_position='center'):
+    """计算裁剪区域 (left, top, right, bottom)
+
+    crop_position 可选 'center'、'top_left'、'top_right'、'bottom_left'、'bottom_right'
+    """
+    orig_width, orig_height = size
+    target_width, target_height = target_size
+
+    if crop_position == 'top_left':
+        left, top = 0, 0
+    elif crop_position == 'top_right':
+        left, top = orig_width - target_width, 0
+    elif crop_position == 'bottom_left':
+        left, top = 0, orig_height - target_height
+    elif crop_position == 'bottom_right':
+        left, top = orig_width - target_width, orig_height - target_height
+    else:
+        left = (orig_width - target_width) // 2
+        top = (orig_height - target_height) // 2
+    return (left, top, left + target_width, top + target_height)
+
 
 class ImageMetadataEditor:
     def __init__(self, image_path):
         self.image_path = image_path
         self.image = Image.open(image_path)
+        self.timer = StageTimer()  # 各操作的累计耗时（秒），见 self.timer.timings
         
+    @timed('get_metadata')
     def get_metadata(self):
         """获取图片的所有元数据"""
         try:
             metadata = {}
             
-            # EXIF标签说明
-            tag_descriptions = {
-                'EXIF_Orientation': '图片方向',
-                'EXIF_XResolution': '水平分辨率',
-                'EXIF_YResolution': '垂直分辨率',
-                'EXIF_ResolutionUnit': '分辨率单位',
-                'EXIF_ExifOffset': 'Exif数据偏移量',
-                'EXIF_Make': '相机制造商',
-                'EXIF_Model': '相机型号',
-                'EXIF_Software': '软件',
-                'EXIF_DateTime': '修改时间',
-                'EXIF_YCbCrPositioning': '色彩位置',
-                'EXIF_ExifVersion': 'Exif版本',
-                'EXIF_ComponentsConfiguration': '图像构成',
-                'EXIF_FlashPixVersion': 'FlashPix版本',
-                'EXIF_ColorSpace': '色彩空间',
-                'EXIF_ExifImageWidth': '图像宽度',
-                'EXIF_ExifImageHeight': '图像高度',
-                'EXIF_SceneCaptureType': '场景类型',
-                'EXIF_Compression': '压缩方式',
-                'EXIF_JPEGInterchangeFormat': 'JPEG数据位置',
-                'EXIF_JPEGInterchangeFormatLength': 'JPEG数据长度',
-                'EXIF_Artist': '作者',
-                'EXIF_Copyright': '版权',
-                'EXIF_ImageDescription': '图像描述',
-                'EXIF_DateTimeOriginal': '原始拍摄时间',
-                'EXIF_DateTimeDigitized': '数字化时间',
-                'EXIF_SubSecTime': '秒小数',
-                'EXIF_SubSecTimeOriginal': '原始秒小数',
-                'EXIF_SubSecTimeDigitized': '数字化秒小数',
-                'EXIF_ExposureTime': '曝光时间',
-                'EXIF_FNumber': '光圈值',
-                'EXIF_ExposureProgram': '曝光程序',
-                'EXIF_ISOSpeedRatings': 'ISO感光度',
-                'EXIF_SensitivityType': '感光度类型',
-                'EXIF_ExifVersion': 'Exif版本',
-                'EXIF_DateTimeOriginal': '原始拍摄时间',
-                'EXIF_DateTimeDigitized': '数字化时间',
-                'EXIF_ComponentsConfiguration': '图像构成',
-                'EXIF_CompressedBitsPerPixel': '压缩位深',
-                'EXIF_ShutterSpeedValue': '快门速度',
-                'EXIF_ApertureValue': '光圈值',
-                'EXIF_BrightnessValue': '亮度值',
-                'EXIF_ExposureBiasValue': '曝光补偿',
-                'EXIF_MaxApertureValue': '最大光圈值',
-                'EXIF_SubjectDistance': '主体距离',
-                'EXIF_MeteringMode': '测光模式',
-                'EXIF_LightSource': '光源',
-                'EXIF_Flash': '闪光灯',
-                'EXIF_FocalLength': '焦距',
-                'EXIF_MakerNote': '制造商注释',
-                'EXIF_UserComment': '用户评论',
-                'EXIF_SubsecTime': '秒小数',
-                'EXIF_SubsecTimeOriginal': '原始秒小数',
-                'EXIF_SubsecTimeDigitized': '数字化秒小数',
-                'EXIF_FlashPixVersion': 'FlashPix版本',
-                'EXIF_ColorSpace': '色彩空间',
-                'EXIF_ExifImageWidth': '图像宽度',
-                'EXIF_ExifImageHeight': '图像高度',
-                'EXIF_InteroperabilityOffset': '互通性偏移量',
-                'EXIF_FocalPlaneXResolution': '焦平面水平分辨率',
-                'EXIF_FocalPlaneYResolution': '焦平面垂直分辨率',
-                'EXIF_FocalPlaneResolutionUnit': '焦平面分辨率单位',
-                'EXIF_SensingMethod': '感应方式',
-                'EXIF_FileSource': '文件来源',
-                'EXIF_SceneType': '场景类型',
-                'EXIF_CustomRendered': '自定义图像处理',
-                'EXIF_ExposureMode': '曝光模式',
-                'EXIF_WhiteBalance': '白平衡',
-                'EXIF_DigitalZoomRatio': '数字变焦比率',
-                'EXIF_FocalLengthIn35mmFilm': '35mm等效焦距',
-                'EXIF_SceneCaptureType': '场景拍摄类型',
-                'EXIF_GainControl': '增益控制',
-                'EXIF_Contrast': '对比度',
-                'EXIF_Saturation': '饱和度',
-                'EXIF_Sharpness': '锐度',
-                'EXIF_SubjectDistanceRange': '主体距离范围',
-                'EXIF_GPSVersionID': 'GPS版本',
-                'EXIF_GPSLatitudeRef': '纬度参考',
-                'EXIF_GPSLatitude': '纬度',
-                'EXIF_GPSLongitudeRef': '经度参考',
-                'EXIF_GPSLongitude': '经度',
-                'EXIF_GPSAltitudeRef': '高度参考',
-                'EXIF_GPSAltitude': '高度',
-                'EXIF_GPSTimeStamp': 'GPS时间戳',
-                'EXIF_GPSSatellites': 'GPS卫星',
-                'EXIF_GPSStatus': 'GPS状态',
-                'EXIF_GPSMeasureMode': 'GPS测量模式',
-                'EXIF_GPSDOP': 'GPS精度',
-                'EXIF_GPSSpeedRef': 'GPS速度参考',
-                'EXIF_GPSSpeed': 'GPS速度',
-                'EXIF_GPSTrackRef': 'GPS方向参考',
-                'EXIF_GPSTrack': 'GPS方向',
-                'EXIF_GPSImgDirectionRef': 'GPS图像方向参考',
-                'EXIF_GPSImgDirection': 'GPS图像方向',
-                'EXIF_GPSMapDatum': 'GPS地图基准',
-                'EXIF_GPSDestLatitudeRef': 'GPS目标纬度参考',
-                'EXIF_GPSDestLatitude': 'GPS目标纬度',
-                'EXIF_GPSDestLongitudeRef': 'GPS目标经度参考',
-                'EXIF_GPSDestLongitude': 'GPS目标经度',
-                'EXIF_GPSDestBearingRef': 'GPS目标方位参考',
-                'EXIF_GPSDestBearing': 'GPS目标方位',
-                'EXIF_GPSDestDistanceRef': 'GPS目标距离参考',
-                'EXIF_GPSDestDistance': 'GPS目标距离',
-                'EXIF_GPSProcessingMethod': 'GPS处理方法',
-                'EXIF_GPSAreaInformation': 'GPS区域信息',
-                'EXIF_GPSDateStamp': 'GPS日期戳',
-                'EXIF_GPSDifferential': 'GPS差分校正'
-            }
-            
             # 1. 检查 EXIF 数据
             if 'exif' in self.image.info:
                 exif_dict = piexif.load(self.image.info['exif'])
@@ -132,15 +106,13 @@ class ImageMetadataEditor:
                     if isinstance(exif_dict[ifd], dict):
                         for tag_id in exif_dict[ifd]:
                             try:
-                                tag = TAGS.get(tag_id, tag_id)
                                 value = exif_dict[ifd][tag_id]
                                 if isinstance(value, bytes):
                                     try:
                                         value = value.decode('utf-8')
                                     except:
                                         value = str(value)
-                                tag_name = f"EXIF_{tag}"
-                                description = tag_descriptions.get(tag_name, '')
+                                tag_name, description = exif_tags.describe(ifd, tag_id)
                                 if description:
                                     metadata[f"{tag_name} ({description})"] = value
                                 else:
@@ -157,17 +129,41 @@ class ImageMetadataEditor:
         except Exception as e:
             return {"错误": f"读取元数据时出错: {str(e)}"}
 
-    def strip_all_metadata(self):
-        """彻底清除所有类型的元数据，仅保留像素数据"""
+    def _strip_container(self, output_path, keep_icc=False):
+        """在容器层面清除元数据并写入 output_path，像素数据按字节复制"""
+        if os.path.abspath(output_path) != os.path.abspath(self.image_path):
+            image_container.strip_metadata(self.image_path, output_path, self.image.format, keep_icc=keep_icc)
+            return
+
+        # 输出覆盖原文件时先写临时文件
+        temp_path = self.image_path + ".temp"
         try:
-            # 获取原始图片格式和模式
+            image_container.strip_metadata(self.image_path, temp_path, self.image.format, keep_icc=keep_icc)
+            self.image.close()
+            os.replace(temp_path, self.image_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.image = Image.open(self.image_path)
+
+    @timed('strip_all_metadata')
+    def strip_all_metadata(self, keep_icc=False):
+        """彻底清除所有类型的元数据，仅保留像素数据
+
+        Args:
+            keep_icc: 是否保留 ICC 色彩配置（仅对无损清除的格式有效）
+        """
+        try:
+            # 支持的格式直接重写文件结构，不重新编码像素
+            if image_container.supports_lossless_strip(self.image.format):
+                self._strip_container(self.image_path, keep_icc=keep_icc)
+                return True
+
+            # 获取原始图片格式
             original_format = self.image.format
-            original_mode = self.image.mode
             
-            # 创建新的空白图像
-            new_image = Image.new(original_mode, self.image.size)
-            # 复制像素数据
-            new_image.putdata(list(self.image.getdata()))
+            # 单独解码一份图像并清空 info，直接保存，不逐像素复制
+            new_image = drop_image_metadata(Image.open(self.image_path))
             
             # 保存时不包含任何元数据
             temp_path = self.image_path + ".temp"
@@ -215,17 +211,24 @@ class ImageMetadataEditor:
         except Exception as e:
             return f"清除元数据失败: {str(e)}"
 
-    def save_clean_copy(self, output_path):
-        """保存无元数据的副本"""
+    @timed('save_clean_copy')
+    def save_clean_copy(self, output_path, keep_icc=False):
+        """保存无元数据的副本
+
+        Args:
+            output_path: 输出文件路径
+            keep_icc: 是否保留 ICC 色彩配置（仅对无损清除的格式有效）
+        """
         try:
-            # 获取原始图片格式和模式
+            if image_container.supports_lossless_strip(self.image.format):
+                self._strip_container(output_path, keep_icc=keep_icc)
+                return True
+
+            # 获取原始图片格式
             original_format = self.image.format
-            original_mode = self.image.mode
             
-            # 创建新的空白图像
-            new_image = Image.new(original_mode, self.image.size)
-            # 复制像素数据
-            new_image.putdata(list(self.image.getdata()))
+            # 单独解码一份图像并清空 info，直接保存，不逐像素复制
+            new_image = drop_image_metadata(Image.open(self.image_path))
             
             # 保存时不包含任何元数据
             save_params = {
@@ -255,6 +258,42 @@ class ImageMetadataEditor:
         except Exception as e:
             return f"保存失败: {str(e)}"
 
+    @timed('strip_selected_metadata')
+    def strip_selected_metadata(self, blocks=tuple(exif_tags.SELECTIVE_STRIP_BLOCKS), output_path=None):
+        """选择性清除 EXIF 中的隐私信息，保留方向、色彩配置等其他元数据
+
+        只重写 EXIF 数据（偏移量由 piexif 重新计算），像素数据按字节复制。
+
+        Args:
+            blocks: 要清除的元数据块，可选 'gps'、'makernote'、'thumbnail'、'serial'
+            output_path: 输出路径，为 None 时直接修改原图
+        """
+        try:
+            if self.image.format not in ('JPEG', 'PNG', 'WEBP'):
+                return f"不支持选择性清除的格式: {self.image.format}"
+
+            exif_dict = None
+            if 'exif' in self.image.info:
+                exif_dict = piexif.load(self.image.info['exif'])
+            changed = exif_dict is not None and exif_tags.remove_exif_blocks(exif_dict, blocks)
+
+            target_path = output_path or self.image_path
+            if os.path.abspath(target_path) == os.path.abspath(self.image_path):
+                if not changed:
+                    return True
+                temp_path = self.image_path + ".temp"
+                image_container.replace_exif(self.image_path, temp_path, self.image.format, piexif.dump(exif_dict))
+                self.image.close()
+                os.replace(temp_path, self.image_path)
+                self.image = Image.open(self.image_path)
+            elif changed:
+                image_container.replace_exif(self.image_path, target_path, self.image.format, piexif.dump(exif_dict))
+            else:
+                shutil.copyfile(self.image_path, target_path)
+            return True
+        except Exception as e:
+            return f"选择性清除元数据失败: {str(e)}"
+
     def verify_clean(self, image_path):
         """验证图片是否已清除所有元数据"""
         try:
@@ -268,29 +307,34 @@ class ImageMetadataEditor:
         except:
             return False
 
-    def resize_image(self, new_size, keep_ratio=True, quality=95):
+    @timed('resize_image')
+    def resize_image(self, new_size, keep_ratio=True, quality=95, resize_mode=RESIZE_BALANCED):
         """调整图片尺寸
         
         Args:
             new_size: (width, height) 新的��寸
             keep_ratio: 是否保持宽高比
             quality: 保存质量（仅对JPEG有效）
+            resize_mode: JPEG 的解码方式（RESIZE_BEST/RESIZE_BALANCED/RESIZE_FAST）
         """
         try:
             if keep_ratio:
-                # 计算缩放比例，保持宽高比
-                ratio = min(new_size[0] / self.image.size[0], new_size[1] / self.image.size[1])
-                new_size = (int(self.image.size[0] * ratio), int(self.image.size[1] * ratio))
+                new_size = fit_size(self.image.size, new_size)
             
-            # 调整尺寸
-            resized_image = self.image.resize(new_size, Image.Resampling.LANCZOS)
+            # 大幅缩小 JPEG 时先在 DCT 域缩放解码；单独打开一份，不改变 self.image 的尺寸
+            with Image.open(self.image_path) as source:
+                draft_for_resize(source, new_size, resize_mode)
+                
+                # 调整尺寸
+                resized_image = source.resize(new_size, Image.Resampling.LANCZOS)
             
             # 保存时清除所有元数据
             format_mapping = {
                 'JPEG': 'JPEG',
                 'PNG': 'PNG',
                 'GIF': 'GIF',
-                'BMP': 'BMP'
+                'BMP': 'BMP',
+                'WEBP': 'WEBP'
             }
             save_format = format_mapping.get(self.image.format, 'JPEG')
             
@@ -303,8 +347,7 @@ class ImageMetadataEditor:
                     exif=b"",
                     icc_profile=None,
                     comment=None,
-                    subsampling=0,
-                    qtables='keep'
+                    subsampling=0
                 )
             else:
                 resized_image.save(
@@ -322,6 +365,7 @@ class ImageMetadataEditor:
         except Exception as e:
             return f"调整图片尺寸失败: {str(e)}"
 
+    @timed('crop_image')
     def crop_image(self, target_size, crop_position='center'):
         """裁剪图片
         
@@ -335,36 +379,13 @@ class ImageMetadataEditor:
                 'bottom_right' - 右下角
         """
         try:
-            # 获取原始尺寸
-            orig_width, orig_height = self.image.size
-            target_width, target_height = target_size
-            
-            # 计算裁剪区域
-            if crop_position == 'center':
-                left = (orig_width - target_width) // 2
-                top = (orig_height - target_height) // 2
-            elif crop_position == 'top_left':
-                left = 0
-                top = 0
-            elif crop_position == 'top_right':
-                left = orig_width - target_width
-                top = 0
-            elif crop_position == 'bottom_left':
-                left = 0
-                top = orig_height - target_height
-            elif crop_position == 'bottom_right':
-                left = orig_width - target_width
-                top = orig_height - target_height
-            
-            right = left + target_width
-            bottom = top + target_height
-            
             # 执行裁剪
-            cropped_image = self.image.crop((left, top, right, bottom))
+            cropped_image = self.image.crop(crop_box(self.image.size, target_size, crop_position))
             return cropped_image
         except Exception as e:
             return None
 
+    @timed('update_metadata')
     def update_metadata(self, metadata):
         """更新图片元数据"""
         try:
@@ -380,55 +401,8 @@ class ImageMetadataEditor:
                 except:
                     pass
 
-            # 数据类型转换函数
-            def convert_value(value, tag_type):
-                try:
-                    if tag_type == piexif.TYPES.Ascii:
-                        return value.encode('utf-8')
-                    elif tag_type == piexif.TYPES.Short:
-                        if isinstance(value, str):
-                            if '/' in value:  # 处理分数格式
-                                num, den = map(int, value.split('/'))
-                                return (num, den)
-                            return int(value)
-                        return value
-                    elif tag_type == piexif.TYPES.Long:
-                        if isinstance(value, str):
-                            return int(value)
-                        return value
-                    elif tag_type == piexif.TYPES.Rational:
-                        if isinstance(value, str):
-                            if '/' in value:
-                                num, den = map(int, value.split('/'))
-                                return (num, den)
-                            value = float(value)
-                            # 转换为分数形式
-                            return (int(value * 100), 100)
-                        return value
-                    return value
-                except:
-                    return value
-
             # 更新元数据
-            for field, value in metadata.items():
-                # 处理不同类型的字段
-                tag_found = False
-                for ifd in ['0th', '1st', 'Exif', 'GPS']:
-                    for tag_id, tag_info in piexif.TAGS[ifd].items():
-                        if tag_info["name"] == field:
-                            converted_value = convert_value(value, tag_info["type"])
-                            exif_dict[ifd][tag_id] = converted_value
-                            tag_found = True
-                            break
-                    if tag_found:
-                        break
-
-                if not tag_found:
-                    # 如果找不到对应的标签，尝试作为字符串存储
-                    for tag_id, tag_info in piexif.TAGS['0th'].items():
-                        if tag_info["type"] == piexif.TYPES.Ascii:
-                            exif_dict['0th'][tag_id] = str(value).encode('utf-8')
-                            break
+            exif_tags.apply_fields(exif_dict, metadata)
 
             # 保存更新后的EXIF数据
             try:
@@ -436,7 +410,11 @@ class ImageMetadataEditor:
                 
                 # 建临时文件
                 temp_path = self.image_path + ".temp"
-                self.image.save(temp_path, format=self.image.format, exif=exif_bytes)
+                if image_container.supports_exif_splice(self.image.format):
+                    # 只替换 EXIF 段，像素数据按字节复制
+                    image_container.replace_exif(self.image_path, temp_path, self.image.format, exif_bytes)
+                else:
+                    self.image.save(temp_path, format=self.image.format, exif=exif_bytes)
                 
                 # 关闭当前图片
                 self.image.close()
@@ -457,6 +435,16 @@ class ImageMetadataEditor:
 
 # 使用示例
 if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        # 命令行批量处理：python -m image_metadata_editor batch ...
+        import batch_cli
+        sys.exit(batch_cli.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'cache':
+        # 输出缓存管理：python -m image_metadata_editor cache stats|clear
+        import batch_cli
+        sys.exit(batch_cli.cache_main(sys.argv[2:]))
+
     # 修改为您电脑上实际存在的图片路径
     image_path = "test.jpg"
     editor = ImageMetadataEditor(image_path)
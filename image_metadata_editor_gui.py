@@ -1,14 +1,35 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from image_metadata_editor import ImageMetadataEditor
+from image_metadata_editor import ImageMetadataEditor, RESIZE_BALANCED
+from batch_pipeline import BatchOptions, CROP_POSITIONS, RESIZE_MODES, RESOLUTIONS_LANDSCAPE, RESOLUTIONS_PORTRAIT
+from batch_engine import (BatchController, BatchJob, EXECUTOR_TYPES, ORDER_TYPES, STATUS_CANCELLED, apply_plan,
+                          default_memory_budget, default_workers, plan_jobs, run_batch)
+from batch_file_list import STATUS_PENDING, BatchFileList, format_size
+from batch_journal import default_journal_path
+from batch_plan import CLEAN_COPY, CLEAN_HARDLINK, PLAN_NAMES, format_summary, summarize
+from output_cache import DEFAULT_CACHE_SIZE, CacheConfig, OutputCache, default_cache_dir, format_stats
+from folder_scan import scan_in_batches
+from duplicate_finder import DuplicateIndex
+from run_report import RunReport, format_report
+from throughput_meter import ThroughputMeter, format_snapshot
 import os
-from PIL import Image
-import concurrent.futures
-from queue import Queue
+import multiprocessing
+from queue import Queue, Empty
 import threading
 import random
 from datetime import datetime, timedelta
 
+# 进度刷新间隔（毫秒）与每次最多更新的行数
+PROGRESS_POLL_MS = 100
+PROGRESS_ROWS_PER_TICK = 2000
+
+# 批量任务结束标记
+_BATCH_DONE = object()
+
+# 清空列表时通知重复检测线程重建索引
+_DEDUP_RESET = object()
+
+
 class ImageMetadataEditorGUI:
     def __init__(self, root):
         self.root = root
@@ -16,7 +37,10 @@ class ImageMetadataEditorGUI:
         
         # 初始化变量
         self.editor = None
-        self.batch_files = []  # 存储批量处理的文件列表
+        self.batch_files = BatchFileList()  # 存储批量处理的文件列表（按路径索引）
+        self.selected_files = set()  # 列表中选中的文件路径
+        self.visible_files = []  # 当前显示在列表中的文件路径
+        self.files_first_row = 0  # 列表可见区域的第一行
         self.pending_operations = {}  # 存储待执行的操作
         
         # 设置最小窗口大小
@@ -60,10 +84,29 @@ class ImageMetadataEditorGUI:
         # 设置批量处理界面
         self.setup_batch_file_ui()
         
-        # 添加线程池和处理队列
-        self.thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        # 添加处理队列（线程池/进程池在每次批量处理时按选项创建）
         self.processing_queue = Queue()
         self.processing_results = {}
+        self.batch_total = 0
+        self.batch_completed = 0
+        self.batch_errors = []  # 后台线程放入队列的错误信息
+        self.batch_controller = None  # 正在运行的批量任务的暂停/取消控制
+        self.plan_queue = Queue()  # 预检结果
+        self.batch_report_text = None  # 后台线程写好的运行报告摘要
+        self.batch_meter = None  # 当前批次的速度/剩余时间统计
+        self.batch_sizes = {}  # job_id -> 输入文件大小
+        
+        # 后台扫描文件夹的结果队列和取消标志
+        self.scan_queue = Queue()
+        self.scan_cancel = None
+        self.scan_found = 0
+        
+        # 后台检测重复文件：输入为 (路径, 大小) 批次，结果为 [(路径, 内容相同的文件)] 批次
+        self.dedup_input = Queue()
+        self.dedup_results = Queue()
+        self.dedup_pending = 0
+        self.duplicate_of = {}  # 路径 -> 内容相同、更早加入列表的文件路径
+        threading.Thread(target=self.find_duplicate_files, daemon=True).start()
 
     def setup_single_file_ui(self):
         """单文件处理界面"""
@@ -380,19 +423,21 @@ class ImageMetadataEditorGUI:
         
         self.files_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
-        # 添加垂直滚动条
-        scrollbar_y = ttk.Scrollbar(self.files_frame, orient=tk.VERTICAL, command=self.files_tree.yview)
-        scrollbar_y.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        # 添加垂直滚动条（列表只创建可见的行，滚动时重新填充内容）
+        self.files_scrollbar_y = ttk.Scrollbar(self.files_frame, orient=tk.VERTICAL, command=self._scroll_file_rows)
+        self.files_scrollbar_y.grid(row=0, column=1, sticky=(tk.N, tk.S))
         
         # 添加水平滚动条
         scrollbar_x = ttk.Scrollbar(self.files_frame, orient=tk.HORIZONTAL, command=self.files_tree.xview)
         scrollbar_x.grid(row=1, column=0, sticky=(tk.W, tk.E))
         
         # 配置滚动条
-        self.files_tree.configure(
-            yscrollcommand=scrollbar_y.set,
-            xscrollcommand=scrollbar_x.set
-        )
+        self.files_tree.configure(xscrollcommand=scrollbar_x.set)
+        self.files_tree.bind('<Configure>', lambda event: self._render_file_rows())
+        self.files_tree.bind('<<TreeviewSelect>>', self._on_file_select)
+        self.files_tree.bind('<MouseWheel>', self._on_file_wheel)
+        self.files_tree.bind('<Button-4>', self._on_file_wheel)
+        self.files_tree.bind('<Button-5>', self._on_file_wheel)
         
         # 右侧：操作按钮区域
         self.batch_controls = ttk.Frame(self.batch_frame)
@@ -404,9 +449,20 @@ class ImageMetadataEditorGUI:
         
         ttk.Button(self.file_ops, text="添加文件", command=self.add_files).pack(fill=tk.X, pady=2)
         ttk.Button(self.file_ops, text="添加文件夹", command=self.add_folder).pack(fill=tk.X, pady=2)
+        self.cancel_scan_button = ttk.Button(self.file_ops, text="停止扫描", command=self.cancel_folder_scan, state="disabled")
+        self.cancel_scan_button.pack(fill=tk.X, pady=2)
         ttk.Button(self.file_ops, text="移除选中", command=self.remove_selected).pack(fill=tk.X, pady=2)
         ttk.Button(self.file_ops, text="清空列表", command=self.clear_file_list).pack(fill=tk.X, pady=2)
         
+        # 按内容检测重复文件，内容相同的文件只处理一次
+        self.dedup_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.file_ops,
+            text="检测重复文件（内容相同只处理一次）",
+            variable=self.dedup_var,
+            command=self.on_dedup_toggle
+        ).pack(fill=tk.X, pady=2)
+        
         # 批量处理按钮组
         self.batch_ops = ttk.LabelFrame(self.batch_controls, text="操作选择", padding="5")
         self.batch_ops.pack(fill=tk.X, pady=5)
@@ -419,6 +475,14 @@ class ImageMetadataEditorGUI:
             variable=self.clear_metadata_var
         ).pack(fill=tk.X, pady=2)
         
+        # 选择性清除隐私信息选项（保留方向、色彩配置等）
+        self.strip_private_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.batch_ops,
+            text="仅清除隐私信息（GPS/序列号/缩略图/制造商注释）",
+            variable=self.strip_private_var
+        ).pack(fill=tk.X, pady=2)
+        
         # 调整尺寸选项框
         self.resize_frame = ttk.LabelFrame(self.batch_controls, text="调整尺寸", padding="5")
         self.resize_frame.pack(fill=tk.X, pady=5)
@@ -436,27 +500,9 @@ class ImageMetadataEditorGUI:
         preset_frame.pack(fill=tk.X, pady=2)
         ttk.Label(preset_frame, text="预设:").pack(side=tk.LEFT, padx=5)
         
-        # 预设分辨率选项（横向）
-        resolutions_landscape = {
-            "自定义": (0, 0),
-            "540p": (960, 540),
-            "720p": (1280, 720),
-            "1080p": (1920, 1080),
-            "2K": (2048, 1080),
-            "2160p": (3840, 2160),
-            "4K": (4096, 2160)
-        }
-        
-        # 预设分辨率选项（竖向）
-        resolutions_portrait = {
-            "自定义": (0, 0),
-            "540p": (540, 960),
-            "720p": (720, 1280),
-            "1080p": (1080, 1920),
-            "2K": (1080, 2048),
-            "2160p": (2160, 3840),
-            "4K": (2160, 4096)
-        }
+        # 预设分辨率选项
+        resolutions_landscape = RESOLUTIONS_LANDSCAPE
+        resolutions_portrait = RESOLUTIONS_PORTRAIT
         
         # 横选择
         self.orientation_var = tk.StringVar(value="横向")
@@ -530,13 +576,20 @@ class ImageMetadataEditorGUI:
         crop_position_combo.pack(side=tk.LEFT, padx=5)
 
         # 裁剪位置映射
-        self.crop_position_map = {
-            "居中": "center",
-            "左上角": "top_left",
-            "右上角": "top_right",
-            "左下": "bottom_left",
-            "右下角": "bottom_right"
-        }
+        self.crop_position_map = CROP_POSITIONS
+
+        # JPEG 缩小时的解码方式
+        resize_mode_frame = ttk.Frame(self.resize_frame)
+        resize_mode_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(resize_mode_frame, text="缩放方式:").pack(side=tk.LEFT, padx=5)
+        self.resize_mode_var = tk.StringVar(value="均衡")
+        ttk.Combobox(
+            resize_mode_frame,
+            textvariable=self.resize_mode_var,
+            values=list(RESIZE_MODES.keys()),
+            width=8,
+            state="readonly"
+        ).pack(side=tk.LEFT, padx=5)
         
         # 绑定预设分辨率选择事件
         def on_resolution_change(event=None):
@@ -566,12 +619,111 @@ class ImageMetadataEditorGUI:
         self.save_frame = ttk.LabelFrame(self.batch_controls, text="保存", padding="5")
         self.save_frame.pack(fill=tk.X, pady=5)
         
+        # 执行方式与并发数
+        executor_frame = ttk.Frame(self.save_frame)
+        executor_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(executor_frame, text="执行方式:").pack(side=tk.LEFT, padx=5)
+        self.executor_type_var = tk.StringVar(value="进程")
+        ttk.Combobox(
+            executor_frame,
+            textvariable=self.executor_type_var,
+            values=list(EXECUTOR_TYPES.keys()),
+            width=6,
+            state="readonly"
+        ).pack(side=tk.LEFT, padx=5)
+        
+        workers_frame = ttk.Frame(self.save_frame)
+        workers_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(workers_frame, text="并发数:").pack(side=tk.LEFT, padx=5)
+        self.workers_var = tk.StringVar(value=str(default_workers()))
+        ttk.Spinbox(
+            workers_frame,
+            from_=1,
+            to=max(64, default_workers()),
+            textvariable=self.workers_var,
+            width=6
+        ).pack(side=tk.LEFT, padx=5)
+        
+        memory_frame = ttk.Frame(self.save_frame)
+        memory_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(memory_frame, text="内存上限(MB):").pack(side=tk.LEFT, padx=5)
+        self.memory_budget_var = tk.StringVar(value=str(default_memory_budget() // (1024 * 1024)))
+        ttk.Entry(memory_frame, textvariable=self.memory_budget_var, width=8).pack(side=tk.LEFT, padx=5)
+        
+        order_frame = ttk.Frame(self.save_frame)
+        order_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(order_frame, text="处理顺序:").pack(side=tk.LEFT, padx=5)
+        self.order_var = tk.StringVar(value="小文件优先")
+        ttk.Combobox(
+            order_frame,
+            textvariable=self.order_var,
+            values=list(ORDER_TYPES.keys()),
+            width=10,
+            state="readonly"
+        ).pack(side=tk.LEFT, padx=5)
+        
+        self.resume_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            self.save_frame,
+            text="断点续传（跳过已完成的文件）",
+            variable=self.resume_var
+        ).pack(fill=tk.X, pady=2)
+        
+        # 运行报告：各阶段耗时、吞吐量，保存在输出目录中
+        self.report_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.save_frame,
+            text="保存运行报告（JSON/CSV）",
+            variable=self.report_var
+        ).pack(fill=tk.X, pady=2)
+        
+        # 预检：已符合要求的文件不再重新编码
+        self.precheck_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            self.save_frame,
+            text="预检（已符合要求的文件直接复制）",
+            variable=self.precheck_var
+        ).pack(fill=tk.X, pady=2)
+        self.hardlink_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.save_frame,
+            text="使用硬链接代替复制",
+            variable=self.hardlink_var
+        ).pack(fill=tk.X, pady=2)
+        
+        # 输出缓存：相同文件用相同参数处理过时直接复制结果
+        self.use_cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.save_frame,
+            text="使用输出缓存",
+            variable=self.use_cache_var
+        ).pack(fill=tk.X, pady=2)
+        cache_frame = ttk.Frame(self.save_frame)
+        cache_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(cache_frame, text="缓存上限(MB):").pack(side=tk.LEFT, padx=5)
+        self.cache_size_var = tk.StringVar(value=str(DEFAULT_CACHE_SIZE // (1024 * 1024)))
+        ttk.Entry(cache_frame, textvariable=self.cache_size_var, width=8).pack(side=tk.LEFT, padx=5)
+        cache_buttons = ttk.Frame(self.save_frame)
+        cache_buttons.pack(fill=tk.X, pady=2)
+        ttk.Button(cache_buttons, text="缓存统计", command=self.show_cache_stats).pack(
+            side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 2))
+        ttk.Button(cache_buttons, text="清空缓存", command=self.clear_cache).pack(
+            side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 0))
+        
         ttk.Button(
             self.save_frame,
             text="另存为新文件",
             command=self.batch_save_as
         ).pack(fill=tk.X, pady=2)
         
+        # 暂停/继续与取消
+        control_frame = ttk.Frame(self.save_frame)
+        control_frame.pack(fill=tk.X, pady=2)
+        self.pause_button = ttk.Button(control_frame, text="暂停", command=self.toggle_batch_pause, state="disabled")
+        self.pause_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 2))
+        self.cancel_button = ttk.Button(control_frame, text="取消", command=self.cancel_batch, state="disabled")
+        self.cancel_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 0))
+        
         # 进度显示框架调整
         self.progress_frame = ttk.LabelFrame(self.batch_frame, text="处理进度", padding="5")
         self.progress_frame.grid(
@@ -597,6 +749,14 @@ class ImageMetadataEditorGUI:
             padx=5, pady=(0,5)
         )
         
+        # 速度、剩余时间和各工作者利用率
+        self.throughput_label = ttk.Label(self.progress_frame, text="")
+        self.throughput_label.grid(
+            row=2, column=0,
+            sticky=(tk.W),
+            padx=5, pady=(0,5)
+        )
+        
         # 添加批量元数据预设选项
         metadata_frame = ttk.LabelFrame(self.batch_frame, text="批量元数据设置", padding="5")
         metadata_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=5)
@@ -629,7 +789,7 @@ class ImageMetadataEditorGUI:
         filename = filedialog.askopenfilename(
             title="选择图片",
             filetypes=[
-                ("图片文件", "*.jpg *.jpeg *.png *.gif *.bmp"),
+                ("图片文件", "*.jpg *.jpeg *.png *.gif *.bmp *.webp"),
                 ("所有文件", "*.*")
             ]
         )
@@ -696,7 +856,8 @@ class ImageMetadataEditorGUI:
             filetypes=[
                 ("JPEG图片", "*.jpg *.jpeg"),
                 ("PNG图片", "*.png"),
-                ("所有图片文件", "*.jpg *.jpeg *.png *.gif *.bmp"),
+                ("WebP图片", "*.webp"),
+                ("所有图片文件", "*.jpg *.jpeg *.png *.gif *.bmp *.webp"),
                 ("所有文件", "*.*")
             ]
         )
@@ -726,7 +887,7 @@ class ImageMetadataEditorGUI:
         files = filedialog.askopenfilenames(
             title="选择图片文件",
             filetypes=[
-                ("图片文件", "*.jpg *.jpeg *.png *.gif *.bmp"),
+                ("图片文件", "*.jpg *.jpeg *.png *.gif *.bmp *.webp"),
                 ("所有文件", "*.*")
             ]
         )
@@ -734,55 +895,219 @@ class ImageMetadataEditorGUI:
 
     def _add_files_to_list(self, files):
         """将文件添加到列表中"""
+        added = []
         for file in files:
             if file not in self.batch_files:
                 try:
                     size = os.path.getsize(file)
-                    size_str = f"{size/1024/1024:.1f} MB" if size > 1024*1024 else f"{size/1024:.1f} KB"
-                    self.batch_files.append(file)
-                    self.files_tree.insert('', tk.END, values=(file, size_str, "待处理"))
+                    self.batch_files.add(file, size)
+                    added.append((file, size))
                 except Exception as e:
                     messagebox.showerror("错误", f"添加文件失败: {str(e)}")
+        self._check_duplicates(added)
+        self._render_file_rows()
 
     def add_folder(self):
-        """添加文件夹中的所有图片"""
+        """添加文件夹中的所有图片（在后台线程中扫描，分批加入列表）"""
+        if self.scan_cancel is not None:
+            messagebox.showwarning("警告", "正在扫描文件夹，请稍候或先停止扫描！")
+            return
         folder = filedialog.askdirectory(title="选择文件夹")
         if folder:
-            for root, dirs, files in os.walk(folder):
-                for file in files:
-                    if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
-                        file_path = os.path.join(root, file)
-                        if file_path not in self.batch_files:
-                            self.batch_files.append(file_path)
-                            self.files_tree.insert('', tk.END, values=(file_path, "待处理"))
+            self.scan_cancel = threading.Event()
+            self.scan_found = 0
+            self.cancel_scan_button.config(state="normal")
+            threading.Thread(
+                target=self.scan_folder,
+                args=(folder, self.scan_cancel),
+                daemon=True
+            ).start()
+            self.root.after(PROGRESS_POLL_MS, self.update_scan_progress)
+
+    def scan_folder(self, folder, cancel_event):
+        """在后台线程中扫描文件夹，不直接访问任何 Tk 控件"""
+        try:
+            for batch in scan_in_batches(folder, cancel_event):
+                self.scan_queue.put(batch)
+        finally:
+            self.scan_queue.put(_BATCH_DONE)
+
+    def cancel_folder_scan(self):
+        """停止正在进行的文件夹扫描，已找到的文件保留在列表中"""
+        if self.scan_cancel is not None:
+            self.scan_cancel.set()
+
+    def update_scan_progress(self):
+        """在主线程中把扫描到的文件加入列表并显示数量"""
+        done = False
+        while True:
+            try:
+                batch = self.scan_queue.get_nowait()
+            except Empty:
+                break
+            if batch is _BATCH_DONE:
+                done = True
+                break
+            added = [(file_path, size) for file_path, size in batch if self.batch_files.add(file_path, size)]
+            self.scan_found += len(added)
+            self._check_duplicates(added)
+        
+        self._render_file_rows()
+        if done:
+            cancelled = self.scan_cancel.is_set()
+            self.scan_cancel = None
+            self.cancel_scan_button.config(state="disabled")
+            self.progress_label['text'] = (f"扫描已停止，添加了 {self.scan_found} 个文件" if cancelled
+                                           else f"扫描完成，添加了 {self.scan_found} 个文件")
+        else:
+            self.progress_label['text'] = f"正在扫描: 已找到 {self.scan_found} 个文件"
+            self.root.after(PROGRESS_POLL_MS, self.update_scan_progress)
+
+    def on_dedup_toggle(self):
+        """开启重复检测时检测列表中已有的文件"""
+        if self.dedup_var.get():
+            self._check_duplicates([(record.path, record.size) for record in self.batch_files])
+
+    def _check_duplicates(self, items):
+        """把新加入列表的文件交给后台线程检测是否重复"""
+        if not items or not self.dedup_var.get():
+            return
+        self.dedup_input.put(items)
+        self.dedup_pending += 1
+        if self.dedup_pending == 1:
+            self.root.after(PROGRESS_POLL_MS, self.update_duplicates)
+
+    def find_duplicate_files(self):
+        """后台线程：依次检测每批文件，不直接访问任何 Tk 控件"""
+        index = DuplicateIndex()
+        while True:
+            items = self.dedup_input.get()
+            if items is _DEDUP_RESET:
+                index = DuplicateIndex()
+                continue
+            results = []
+            for file_path, size in items:
+                original = index.add(file_path, size)
+                if original is not None:
+                    results.append((file_path, original))
+            self.dedup_results.put(results)
+
+    def update_duplicates(self):
+        """在主线程中记录检测到的重复文件，并在状态列标出"""
+        while True:
+            try:
+                results = self.dedup_results.get_nowait()
+            except Empty:
+                break
+            self.dedup_pending -= 1
+            for file_path, original in results:
+                record = self.batch_files.get(file_path)
+                if record is None:
+                    continue
+                self.duplicate_of[file_path] = original
+                if record.status == STATUS_PENDING:
+                    record.status = f"重复: {os.path.basename(original)}"
+        
+        self._render_file_rows()
+        if self.dedup_pending:
+            self.root.after(PROGRESS_POLL_MS, self.update_duplicates)
 
     def clear_file_list(self):
         """清空文件列表"""
         if messagebox.askyesno("确认", "确定要清空文件列表吗？"):
             self.batch_files.clear()
-            for item in self.files_tree.get_children():
-                self.files_tree.delete(item)
+            self.selected_files.clear()
+            self.duplicate_of.clear()
+            self.dedup_input.put(_DEDUP_RESET)
+            self.files_first_row = 0
+            self._render_file_rows()
 
     def remove_selected(self):
         """移除选中的文件"""
-        selected = self.files_tree.selection()
-        if not selected:
+        if not self.selected_files:
             messagebox.showwarning("警告", "请先选择要移除的文件！")
             return
         
-        for item in selected:
-            file_path = self.files_tree.item(item)['values'][0]
+        for file_path in self.selected_files:
             self.batch_files.remove(file_path)
-            self.files_tree.delete(item)
+        self.selected_files.clear()
+        self._render_file_rows()
+
+    def _visible_row_count(self):
+        """列表区域能显示的行数"""
+        row_height = ttk.Style().lookup('Treeview', 'rowheight')
+        row_height = int(row_height) if row_height else 20
+        # 减去表头占用的一行
+        return max(1, self.files_tree.winfo_height() // row_height - 1)
+
+    def _render_file_rows(self):
+        """只为当前可见的行填充 Treeview，行控件数量不随文件数增长"""
+        total = len(self.batch_files)
+        visible = self._visible_row_count()
+        self.files_first_row = max(0, min(self.files_first_row, total - visible))
+        records = self.batch_files.rows(self.files_first_row, visible)
+        
+        items = self.files_tree.get_children()
+        if len(items) > len(records):
+            self.files_tree.delete(*items[len(records):])
+        selected = []
+        self.visible_files = []
+        for position, record in enumerate(records):
+            values = (record.path, format_size(record.size), record.status)
+            if position < len(items):
+                item = items[position]
+                self.files_tree.item(item, values=values)
+            else:
+                item = self.files_tree.insert('', tk.END, values=values)
+            self.visible_files.append(record.path)
+            if record.path in self.selected_files:
+                selected.append(item)
+        self.files_tree.selection_set(selected)
+        
+        if total:
+            self.files_scrollbar_y.set(self.files_first_row / total, (self.files_first_row + len(records)) / total)
+        else:
+            self.files_scrollbar_y.set(0, 1)
+
+    def _scroll_file_rows(self, *args):
+        """垂直滚动条回调：'moveto 比例' 或 'scroll 数量 units/pages'"""
+        if args[0] == 'moveto':
+            self.files_first_row = int(float(args[1]) * len(self.batch_files))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self._visible_row_count()
+            self.files_first_row += amount
+        self._render_file_rows()
+
+    def _on_file_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._scroll_file_rows('scroll', -3, 'units')
+        else:
+            self._scroll_file_rows('scroll', 3, 'units')
+        return "break"
+
+    def _on_file_select(self, event=None):
+        """把可见行的选中状态同步到按路径记录的选中集合"""
+        chosen = set(self.files_tree.selection())
+        for item, file_path in zip(self.files_tree.get_children(), self.visible_files):
+            if item in chosen:
+                self.selected_files.add(file_path)
+            else:
+                self.selected_files.discard(file_path)
 
     def batch_save_as(self):
         """批量另存为处理"""
         if not self.batch_files:
             messagebox.showwarning("警告", "请先添加要处理的文件！")
             return
+        if self.batch_controller is not None:
+            messagebox.showwarning("警告", "上一批文件仍在处理中！")
+            return
             
         # 检查是否选择了操作
-        if not self.clear_metadata_var.get() and not self.resize_enabled_var.get():
+        if (not self.clear_metadata_var.get() and not self.strip_private_var.get()
+                and not self.resize_enabled_var.get()):
             messagebox.showwarning("警告", "请至少选择一个操作！")
             return
             
@@ -797,152 +1122,269 @@ class ImageMetadataEditorGUI:
                 messagebox.showerror("错误", "请输入有效的尺寸数值！")
                 return
         
+        # 验证并发数
+        try:
+            workers = int(self.workers_var.get())
+            if workers <= 0:
+                raise ValueError("并发数必须大于0")
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的并发数！")
+            return
+        
+        # 验证内存上限
+        try:
+            memory_budget = int(self.memory_budget_var.get()) * 1024 * 1024
+            if memory_budget <= 0:
+                raise ValueError("内存上限必须大于0")
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的内存上限！")
+            return
+        
+        # 验证缓存上限
+        cache = None
+        if self.use_cache_var.get():
+            try:
+                cache = CacheConfig(default_cache_dir(), self._cache_size())
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的缓存上限！")
+                return
+        
         # 选择保存目录
         output_dir = filedialog.askdirectory(title="选择保存位置")
         if not output_dir:
             return
             
-        total = len(self.batch_files)
-        self.progress_bar['maximum'] = total
-        self.progress_bar['value'] = 0
-        
+        # 在主线程读取界面选项，工作线程/进程不访问 Tk 变量
+        options = BatchOptions(
+            strip_metadata=self.clear_metadata_var.get(),
+            strip_private=self.strip_private_var.get(),
+            resize_to=(width, height) if self.resize_enabled_var.get() else None,
+            keep_ratio=self.keep_ratio_var.get(),
+            crop=self.crop_enabled_var.get(),
+            crop_position=self.crop_position_map.get(self.crop_position_var.get(), 'center'),
+            resize_mode=RESIZE_MODES.get(self.resize_mode_var.get(), RESIZE_BALANCED)
+        )
+        preset_name = None
+        if self.apply_metadata_var.get() and self.batch_preset_var.get() != "不使用预设":
+            preset_name = self.batch_preset_var.get()
+            
         # 创建处理任务
-        futures = []
-        for item in self.files_tree.get_children():
-            file_path = self.files_tree.item(item)['values'][0]
-            future = self.thread_pool.submit(
-                self.process_single_image,
-                file_path,
-                output_dir,
-                item
-            )
-            futures.append(future)
-        
-        # 启动进度更新线程
-        threading.Thread(target=self.update_progress, args=(futures,), daemon=True).start()
+        jobs = []
+        primaries = {}  # 内容相同的一组文件中第一个仍在列表中的文件
+        for record in self.batch_files:
+            # 每个文件使用不同的动态预设
+            metadata = None
+            if preset_name:
+                metadata = self.generate_dynamic_preset(self.phone_presets[preset_name])
+            duplicate_of = None
+            if self.dedup_var.get():
+                primary = primaries.setdefault(self.duplicate_of.get(record.path, record.path), record.path)
+                if primary != record.path:
+                    duplicate_of = primary
+            jobs.append(BatchJob(record.path, record.path, output_dir, options, metadata, preset_name, record.size,
+                                 cache=cache, duplicate_of=duplicate_of))
+        
+        executor_type = EXECUTOR_TYPES[self.executor_type_var.get()]
+        order = ORDER_TYPES[self.order_var.get()]
+        journal_path = default_journal_path(output_dir) if self.resume_var.get() else None
+        report_dir = output_dir if self.report_var.get() else None
+        run_args = (executor_type, workers, order, memory_budget, journal_path, report_dir)
+        # 从这里开始到处理结束，不允许再启动新的批量任务
+        self.batch_controller = BatchController()
+        
+        if self.precheck_var.get():
+            clean_action = CLEAN_HARDLINK if self.hardlink_var.get() else CLEAN_COPY
+            self.progress_label['text'] = f"正在预检 {len(jobs)} 个文件..."
+            threading.Thread(
+                target=self.plan_batch_jobs,
+                args=(jobs, executor_type, workers),
+                daemon=True
+            ).start()
+            self.root.after(PROGRESS_POLL_MS, self.wait_for_plan, jobs, run_args, clean_action)
+        else:
+            self.start_batch(jobs, run_args)
+
+    def _cache_size(self):
+        cache_size = int(self.cache_size_var.get()) * 1024 * 1024
+        if cache_size <= 0:
+            raise ValueError("缓存上限必须大于0")
+        return cache_size
 
-    def process_single_image(self, file_path, output_dir, item):
-        """在单独线程中处理单个图片"""
-        original = None
-        new_image = None
+    def show_cache_stats(self):
+        """显示输出缓存的条目数、占用空间和命中率"""
         try:
-            # 初始化状态列表
-            status = []
-            
-            # 构建新文件名
-            file_name = os.path.basename(file_path)
-            name, ext = os.path.splitext(file_name)
-            
-            operations = []
-            if self.clear_metadata_var.get():
-                operations.append("清除元数据")
-                status.append("已清除元数据")
+            cache = OutputCache(default_cache_dir(), self._cache_size())
+            try:
+                stats = cache.stats()
+            finally:
+                cache.close()
+            messagebox.showinfo("缓存统计", f"{format_stats(stats)}\n\n位置: {default_cache_dir()}")
+        except Exception as e:
+            messagebox.showerror("错误", f"读取缓存统计失败: {str(e)}")
 
-            if self.resize_enabled_var.get():
-                width = int(self.width_var.get())
-                height = int(self.height_var.get())
-                if self.crop_enabled_var.get():
-                    operations.append(f"裁剪_{width}x{height}_{self.crop_position_var.get()}")
-                    status.append(f"已裁剪至 {width}x{height}")
-                else:
-                    operations.append(f"调整尺寸_{width}x{height}")
-                    status.append(f"已调整为 {width}x{height}")
+    def clear_cache(self):
+        """删除所有缓存的输出"""
+        if self.batch_controller is not None:
+            messagebox.showwarning("警告", "请等待批量处理完成后再清空缓存！")
+            return
+        if not messagebox.askyesno("确认", "确定要清空输出缓存吗？"):
+            return
+        try:
+            cache = OutputCache(default_cache_dir(), self._cache_size())
+            try:
+                cache.clear()
+            finally:
+                cache.close()
+            messagebox.showinfo("成功", "输出缓存已清空！")
+        except Exception as e:
+            messagebox.showerror("错误", f"清空缓存失败: {str(e)}")
 
-            new_name = "_".join(operations) if operations else "processed"
-            
-            # 生成输出路径
-            counter = 1
-            base_path = os.path.join(output_dir, f"{new_name}_{name}{ext}")
-            new_path = base_path
-            while os.path.exists(new_path):
-                new_path = os.path.join(output_dir, f"{new_name}_{name}_{counter}{ext}")
-                counter += 1
+    def plan_batch_jobs(self, jobs, executor_type, workers):
+        """在后台线程中预检所有文件（只读取文件头）"""
+        try:
+            self.plan_queue.put(plan_jobs(jobs, executor_type, workers))
+        except Exception as e:
+            self.plan_queue.put(e)
 
-            # 打开原始图片
-            original = Image.open(file_path)
-            original_format = original.format or 'JPEG'
-            
-            # 创建新图像（不带元数据）
-            new_image = Image.new(original.mode, original.size)
-            new_image.putdata(list(original.getdata()))
-            
-            # 如果需要调整尺寸
-            if self.resize_enabled_var.get():
-                # ... (调整尺寸的代码保持不变)
-                pass
+    def wait_for_plan(self, jobs, run_args, clean_action):
+        """预检完成后显示各分类数量，确认后开始处理"""
+        try:
+            plans = self.plan_queue.get_nowait()
+        except Empty:
+            self.root.after(PROGRESS_POLL_MS, self.wait_for_plan, jobs, run_args, clean_action)
+            return
+        
+        if isinstance(plans, Exception):
+            self.batch_controller = None
+            self.progress_label['text'] = "就绪"
+            messagebox.showerror("错误", f"预检失败: {str(plans)}")
+            return
+        
+        for job, plan in zip(jobs, plans):
+            self.batch_files.set_status(job.job_id, PLAN_NAMES[plan])
+        self._render_file_rows()
+        
+        action = "硬链接" if clean_action == CLEAN_HARDLINK else "复制"
+        summary = format_summary(summarize(plans))
+        if not messagebox.askyesno("预检结果", f"{summary}\n\n已符合要求的文件将直接{action}到输出目录，是否开始处理？"):
+            self.batch_controller = None
+            self.progress_label['text'] = f"预检完成: {summary}"
+            return
+        self.start_batch(apply_plan(jobs, plans, clean_action), run_args)
 
-            # 保存图片（不带元数据）
-            save_params = {
-                'format': original_format,
-                'quality': 95 if original_format == 'JPEG' else None,
-            }
-            
-            if original_format == 'JPEG':
-                save_params.update({
-                    'optimize': False,
-                    'exif': b"",
-                    'icc_profile': None,
-                    'comment': None,
-                    'subsampling': -1,  # 使用默认的子采样
-                    'qtables': None,    # 使用默认的量化表
-                    'progressive': False,
-                    'smooth': 0,
-                    'streamtype': 0,    # 基本 JPEG
-                    'dpi': (72, 72),    # 标准分辨率
-                    'jfif': None,       # 不写入 JFIF 标记
-                    'adobe': None       # 不写入 Adobe 标记
-                })
-            elif original_format == 'PNG':
-                save_params.update({
-                    'optimize': False,
-                    'pnginfo': None
-                })
-            
-            new_image.save(new_path, **save_params)
-            
-            # 如果需要应用元数据预设
-            if self.apply_metadata_var.get() and self.batch_preset_var.get() != "不使用预设":
-                try:
-                    base_preset = self.phone_presets[self.batch_preset_var.get()]
-                    dynamic_preset = self.generate_dynamic_preset(base_preset)
-                    
-                    temp_editor = ImageMetadataEditor(new_path)
-                    temp_editor.update_metadata(dynamic_preset)
-                    temp_editor.image.close()
-                    status.append(f"已应用{self.batch_preset_var.get()}预设")
-                except Exception as e:
-                    return item, f"元数据应用失败: {str(e)}"
+    def start_batch(self, jobs, run_args):
+        """启动后台处理线程，结果放入队列，由主线程定时批量刷新界面"""
+        self.progress_bar['maximum'] = len(jobs)
+        self.progress_bar['value'] = 0
+        self.batch_total = len(jobs)
+        self.batch_completed = 0
+        self.batch_errors = []
+        self.batch_sizes = {job.job_id: job.size or 0 for job in jobs}
+        workers = run_args[1]  # run_args 的内容见 batch_save_as
+        self.batch_meter = ThroughputMeter(len(jobs), sum(self.batch_sizes.values()), workers)
+        self.throughput_label['text'] = ""
+        self.pause_button.config(state="normal", text="暂停")
+        self.cancel_button.config(state="normal")
+        threading.Thread(
+            target=self.run_batch_jobs,
+            args=(jobs, self.batch_controller) + run_args,
+            daemon=True
+        ).start()
+        self.root.after(PROGRESS_POLL_MS, self.update_progress)
 
-            return item, ", ".join(status) if status else "处理完成"
-            
+    def run_batch_jobs(self, jobs, controller, executor_type, workers, order, memory_budget, journal_path,
+                       report_dir):
+        """在后台线程中执行批量任务，不直接访问任何 Tk 控件
+
+        出错时把错误信息（字符串）放入队列，由主线程在处理结束后显示。
+        """
+        report = RunReport()
+        self.batch_report_text = None
+        try:
+            for result in run_batch(jobs, executor_type, workers, controller, order,
+                                    memory_budget=memory_budget, journal_path=journal_path):
+                if result.status != STATUS_CANCELLED:
+                    report.add(result)
+                self.processing_queue.put(result)
         except Exception as e:
-            return item, f"错误: {str(e)}"
-        finally:
-            # 确保资源被释放
-            if original:
-                try:
-                    original.close()
-                except:
-                    pass
-            if new_image:
+            self.processing_queue.put(f"批量处理失败: {str(e)}")
+        else:
+            if report_dir is not None:
                 try:
-                    new_image.close()
-                except:
-                    pass
+                    self.batch_report_text = self.save_batch_report(report, report_dir)
+                except Exception as e:
+                    self.processing_queue.put(f"保存运行报告失败: {str(e)}")
+        finally:
+            self.processing_queue.put(_BATCH_DONE)
 
-    def update_progress(self, futures):
-        """更新进度条和状态"""
-        completed = 0
-        for future in concurrent.futures.as_completed(futures):
-            item, status = future.result()
-            self.files_tree.set(item, '状态', status)
-            completed += 1
-            self.progress_bar['value'] = completed
-            self.progress_label['text'] = f"已完成: {completed}/{len(futures)}"
-            self.root.update()
-        
-        self.progress_label['text'] = "处理完成"
-        messagebox.showinfo("完成", "所有文件处理完成！")
+    def save_batch_report(self, report, report_dir):
+        """把运行报告保存到输出目录，返回显示在完成提示中的文字"""
+        report.finish()
+        name = f"batch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        report.write_json(os.path.join(report_dir, name + ".json"))
+        report.write_csv(os.path.join(report_dir, name + ".csv"))
+        return f"{format_report(report.summary())}\n\n运行报告已保存: {name}.json/.csv"
+
+    def toggle_batch_pause(self):
+        """暂停或继续批量处理（正在处理的文件会先完成）"""
+        if self.batch_controller is None:
+            return
+        if self.batch_controller.paused:
+            self.batch_controller.resume()
+            self.pause_button.config(text="暂停")
+        else:
+            self.batch_controller.pause()
+            self.pause_button.config(text="继续")
+
+    def cancel_batch(self):
+        """取消批量处理，未开始的文件标记为已取消"""
+        if self.batch_controller is not None:
+            self.batch_controller.cancel()
+            self.pause_button.config(state="disabled")
+            self.cancel_button.config(state="disabled")
+
+    def update_progress(self):
+        """在主线程中取出已完成的结果，合并更新列表、进度条和状态"""
+        done = False
+        for _ in range(PROGRESS_ROWS_PER_TICK):
+            try:
+                result = self.processing_queue.get_nowait()
+            except Empty:
+                break
+            if result is _BATCH_DONE:
+                done = True
+                break
+            if isinstance(result, str):
+                self.batch_errors.append(result)
+                continue
+            self.batch_files.set_status(result.job_id, result.status)
+            self.batch_meter.add(result, self.batch_sizes.get(result.job_id, 0))
+            self.batch_completed += 1
+        
+        self._render_file_rows()
+        self.progress_bar['value'] = self.batch_completed
+        if done:
+            cancelled = self.batch_controller.cancelled
+            self.batch_controller = None
+            self.pause_button.config(state="disabled", text="暂停")
+            self.cancel_button.config(state="disabled")
+            if self.batch_errors:
+                self.progress_label['text'] = "处理出错"
+                messagebox.showerror("错误", "\n".join(self.batch_errors))
+            elif cancelled:
+                self.progress_label['text'] = "处理已取消"
+                messagebox.showinfo("已取消", "批量处理已取消！")
+            else:
+                self.progress_label['text'] = "处理完成"
+                message = "所有文件处理完成！"
+                if self.batch_report_text:
+                    message += f"\n\n{self.batch_report_text}"
+                messagebox.showinfo("完成", message)
+        else:
+            paused = "（已暂停）" if self.batch_controller.paused else ""
+            self.progress_label['text'] = f"已完成: {self.batch_completed}/{self.batch_total}{paused}"
+            self.throughput_label['text'] = format_snapshot(self.batch_meter.snapshot())
+            self.root.after(PROGRESS_POLL_MS, self.update_progress)
 
     def update_metadata(self):
         """更新图片元数据"""
@@ -1060,6 +1502,8 @@ class ImageMetadataEditorGUI:
             messagebox.showerror("错误", f"应用预设失败: {str(e)}")
 
 if __name__ == "__main__":
+    # 打包后的程序启动进程池工作进程时需要
+    multiprocessing.freeze_support()
     try:
         root = tk.Tk()
         app = ImageMetadataEditorGUI(root)
@@ -0,0 +1,213 @@
+"""按内容寻址的输出缓存
+
+缓存键由输入文件内容的 SHA-256、规范化后的操作参数和相关库的版本组成，
+同样的文件用同样的参数处理过一次后，再次处理时直接从缓存复制（优先使用 reflink）。
+缓存总大小超过上限时按最近使用时间淘汰（LRU）。
+
+索引保存在缓存目录的 SQLite 数据库中，可被多个工作进程同时使用。
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import piexif
+import PIL
+
+from batch_journal import operation_key
+
+# 处理逻辑变化导致旧缓存不再有效时递增
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_SIZE = 2 * 1024 * 1024 * 1024
+INDEX_FILE_NAME = 'index.sqlite3'
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Linux 上的 FICLONE ioctl（btrfs/xfs 等支持 reflink 的文件系统）
+_FICLONE = 0x40049409
+
+# 传给工作线程/进程的缓存配置
+CacheConfig = namedtuple('CacheConfig', ['directory', 'max_bytes'])
+
+# 缓存统计
+CacheStats = namedtuple('CacheStats', ['entries', 'total_bytes', 'max_bytes', 'hits', 'misses'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def default_cache_dir():
+    """默认缓存目录：Windows 为 %LOCALAPPDATA%，其他平台为 ~/.cache"""
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        base = os.environ['LOCALAPPDATA']
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'image_metadata_editor', 'outputs')
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_BUFFER_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _clone_or_copy(src_path, dst_path):
+    """复制文件，支持时使用 reflink（写时复制，不占用额外空间）"""
+    if sys.platform.startswith('linux'):
+        try:
+            import fcntl
+            with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            return
+        except (ImportError, OSError):
+            pass
+    shutil.copyfile(src_path, dst_path)
+
+
+class OutputCache:
+    """输出缓存，同一个对象只能在创建它的线程中使用（见 open_cache）"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, INDEX_FILE_NAME), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def key_for(self, source_path, options, metadata=None, preset_name=None):
+        """计算缓存键：输入内容 + 操作参数 + 写入的元数据 + 库版本"""
+        params = json.dumps({
+            'content': hash_file(source_path),
+            'operations': operation_key(options, preset_name),
+            'metadata': metadata,
+            'versions': [CACHE_FORMAT_VERSION, PIL.__version__, piexif.VERSION],
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(params.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, file_name):
+        return os.path.join(self.directory, file_name[:2], file_name)
+
+    def _count(self, name):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def fetch(self, key, output_path):
+        """命中时把缓存的输出复制到 output_path 并返回 True"""
+        row = self._conn.execute("SELECT file_name FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            try:
+                _clone_or_copy(self._entry_path(row[0]), output_path)
+            except OSError:
+                # 缓存文件被外部删除，丢弃这条记录
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            else:
+                self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._count('hits')
+                self._conn.commit()
+                return True
+        self._count('misses')
+        self._conn.commit()
+        return False
+
+    def store(self, key, output_path):
+        """把刚生成的输出加入缓存，然后按需淘汰旧条目"""
+        size = os.path.getsize(output_path)
+        if size > self.max_bytes:
+            return
+        file_name = key + os.path.splitext(output_path)[1].lower()
+        entry_path = self._entry_path(file_name)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # 先写临时文件再改名，其他进程不会读到不完整的缓存文件
+        temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        _clone_or_copy(output_path, temp_path)
+        os.replace(temp_path, entry_path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, file_name, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, file_name, size, time.time())
+        )
+        self._conn.commit()
+        self.evict()
+
+    def evict(self):
+        """删除最久未使用的条目，直到总大小不超过上限"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, file_name, size FROM entries ORDER BY last_used").fetchall()
+        for key, file_name, size in rows:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._entry_path(file_name))
+            except OSError:
+                pass
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        self._conn.commit()
+
+    def stats(self):
+        entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+        return CacheStats(entries, total, self.max_bytes, counters.get('hits', 0), counters.get('misses', 0))
+
+    def clear(self):
+        """删除全部缓存文件和统计"""
+        for (file_name,) in self._conn.execute("SELECT file_name FROM entries").fetchall():
+            try:
+                os.remove(self._entry_path(file_name))
+            except OSError:
+                pass
+        self._conn.execute("DELETE FROM entries")
+        self._conn.execute("DELETE FROM counters")
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def open_cache(config):
+    """返回当前线程中按 CacheConfig 打开的缓存（每个线程/进程复用一个连接）"""
+    caches = getattr(_local, 'caches', None)
+    if caches is None:
+        caches = _local.caches = {}
+    cache = caches.get(config)
+    if cache is None:
+        cache = caches[config] = OutputCache(config.directory, config.max_bytes)
+    return cache
+
+
+def format_stats(stats):
+    """缓存统计的显示文字"""
+    lookups = stats.hits + stats.misses
+    hit_rate = f"{stats.hits / lookups:.1%}" if lookups else "-"
+    return (f"缓存条目: {stats.entries}\n"
+            f"占用空间: {stats.total_bytes / 1024 / 1024:.1f} MB / {stats.max_bytes / 1024 / 1024:.0f} MB\n"
+            f"命中: {stats.hits}，未命中: {stats.misses}，命中率: {hit_rate}")
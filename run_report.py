@@ -0,0 +1,183 @@
+"""处理耗时统计与运行报告
+
+StageTimer 记录单个文件各阶段的耗时，RunReport 汇总一批文件的结果，
+给出每个阶段的 p50/p95/最大耗时、输入输出字节数和每秒处理文件数，
+可保存为 JSON、CSV，或 Prometheus 文本格式（供 node exporter 的 textfile collector 读取）。
+"""
+import contextlib
+import csv
+import functools
+import json
+import os
+import time
+
+# Prometheus 指标名前缀
+METRIC_PREFIX = 'image_batch'
+
+
+class StageTimer:
+    """按阶段累计耗时（秒），嵌套阶段的耗时只计入内层"""
+
+    def __init__(self):
+        self.timings = {}
+        self._nested = []  # 每层已计入内层阶段的耗时
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed - nested
+            if self._nested:
+                self._nested[-1] += elapsed
+
+
+def timed(name):
+    """方法装饰器：把方法耗时记入实例的 timer（StageTimer）"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.timer.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def percentile(sorted_values, fraction):
+    """最近秩百分位数，sorted_values 须已排序且非空"""
+    rank = max(1, round(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class RunReport:
+    """汇总一批任务的 BatchResult（在调用 run_batch 的线程中使用）"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.wall_seconds = None
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.stage_samples = {}  # 阶段 -> [每个文件的耗时]
+
+    def add(self, result):
+        if result.ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        stats = result.stats
+        if not stats:
+            return
+        self.bytes_in += stats.get('bytes_in', 0)
+        self.bytes_out += stats.get('bytes_out', 0)
+        for stage, seconds in stats.get('timings', {}).items():
+            self.stage_samples.setdefault(stage, []).append(seconds)
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self._start
+
+    def summary(self):
+        """返回可直接写为 JSON 的汇总字典"""
+        wall = self.wall_seconds if self.wall_seconds is not None else time.perf_counter() - self._start
+        stages = {}
+        for stage, samples in self.stage_samples.items():
+            ordered = sorted(samples)
+            stages[stage] = {
+                'count': len(ordered),
+                'total_seconds': sum(ordered),
+                'p50_seconds': percentile(ordered, 0.5),
+                'p95_seconds': percentile(ordered, 0.95),
+                'max_seconds': ordered[-1],
+            }
+        files = self.succeeded + self.failed
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'wall_seconds': wall,
+            'files': files,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'files_per_second': files / wall if wall > 0 else 0.0,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'stages': stages,
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+    def write_csv(self, path):
+        """每个阶段一行；最后一行 stage 为 total，给出整批的文件数和耗时"""
+        summary = self.summary()
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['stage', 'count', 'total_seconds', 'p50_seconds', 'p95_seconds', 'max_seconds'])
+            for stage, values in sorted(summary['stages'].items()):
+                writer.writerow([stage, values['count'], f"{values['total_seconds']:.6f}",
+                                 f"{values['p50_seconds']:.6f}", f"{values['p95_seconds']:.6f}",
+                                 f"{values['max_seconds']:.6f}"])
+            writer.writerow(['total', summary['files'], f"{summary['wall_seconds']:.6f}", '', '', ''])
+
+    def write_prometheus(self, path):
+        """写出 Prometheus 文本格式，先写临时文件再改名，避免被读到一半"""
+        summary = self.summary()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Per-file time spent in each processing stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds summary",
+        ]
+        for stage, values in sorted(summary['stages'].items()):
+            for quantile, key in (('0.5', 'p50_seconds'), ('0.95', 'p95_seconds'), ('1', 'max_seconds')):
+                lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {values[key]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {values["total_seconds"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {values["count"]}')
+        lines += [
+            f"# HELP {METRIC_PREFIX}_files Files in the last batch by result.",
+            f"# TYPE {METRIC_PREFIX}_files gauge",
+            f'{METRIC_PREFIX}_files{{result="ok"}} {summary["succeeded"]}',
+            f'{METRIC_PREFIX}_files{{result="failed"}} {summary["failed"]}',
+            f"# HELP {METRIC_PREFIX}_bytes Bytes read and written by the last batch.",
+            f"# TYPE {METRIC_PREFIX}_bytes gauge",
+            f'{METRIC_PREFIX}_bytes{{direction="in"}} {summary["bytes_in"]}',
+            f'{METRIC_PREFIX}_bytes{{direction="out"}} {summary["bytes_out"]}',
+            f"# HELP {METRIC_PREFIX}_duration_seconds Wall time of the last batch.",
+            f"# TYPE {METRIC_PREFIX}_duration_seconds gauge",
+            f"{METRIC_PREFIX}_duration_seconds {summary['wall_seconds']:.6f}",
+            f"# HELP {METRIC_PREFIX}_files_per_second Throughput of the last batch.",
+            f"# TYPE {METRIC_PREFIX}_files_per_second gauge",
+            f"{METRIC_PREFIX}_files_per_second {summary['files_per_second']:.6f}",
+            f"# HELP {METRIC_PREFIX}_last_run_timestamp_seconds Start time of the last batch.",
+            f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{METRIC_PREFIX}_last_run_timestamp_seconds {self.started:.0f}",
+        ]
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
+
+    def write(self, path):
+        """按扩展名保存为 CSV（.csv）、Prometheus 文本格式（.prom）或 JSON（其他）"""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.csv':
+            self.write_csv(path)
+        elif ext == '.prom':
+            self.write_prometheus(path)
+        else:
+            self.write_json(path)
+
+
+def format_report(summary):
+    """运行报告的简要文字：吞吐量和按总耗时排序的各阶段"""
+    lines = [f"{summary['files']} 个文件，耗时 {summary['wall_seconds']:.1f} 秒，"
+             f"{summary['files_per_second']:.1f} 个/秒，"
+             f"读取 {summary['bytes_in'] / 1024 / 1024:.1f} MB，写出 {summary['bytes_out'] / 1024 / 1024:.1f} MB"]
+    stages = sorted(summary['stages'].items(), key=lambda item: item[1]['total_seconds'], reverse=True)
+    for stage, values in stages:
+        lines.append(f"  {stage}: 合计 {values['total_seconds']:.2f} 秒，p50 {values['p50_seconds'] * 1000:.1f} ms，"
+                     f"p95 {values['p95_seconds'] * 1000:.1f} ms，最大 {values['max_seconds'] * 1000:.1f} ms")
+    return "\n".join(lines)
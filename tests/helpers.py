@@ -0,0 +1,95 @@
+"""测试用图片和元数据的生成工具"""
+import functools
+import io
+import random
+import struct
+
+import piexif
+from PIL import Image, ImageCms
+
+
+def make_image(size=(96, 64), mode='RGB', seed=0):
+    """渐变 + 噪声的测试图像，同样的 seed 总是得到同样的像素"""
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient('L').resize(size)
+    noise = Image.frombytes('L', size, rng.randbytes(size[0] * size[1]))
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    return image.convert(mode) if mode != 'RGB' else image
+
+
+@functools.lru_cache(maxsize=None)
+def icc_profile():
+    """sRGB 色彩配置（只生成一次，配置中带有生成时间）"""
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+
+
+def private_exif_dict():
+    """带 GPS、制造商注释、序列号和缩略图的 EXIF"""
+    thumbnail = io.BytesIO()
+    make_image((16, 16)).save(thumbnail, 'JPEG')
+    return {
+        '0th': {
+            piexif.ImageIFD.Make: b'Canon',
+            piexif.ImageIFD.Model: b'EOS R5',
+            piexif.ImageIFD.Orientation: 1,
+        },
+        'Exif': {
+            piexif.ExifIFD.DateTimeOriginal: b'2024:01:01 12:00:00',
+            piexif.ExifIFD.MakerNote: bytes(range(256)) * 4,
+            piexif.ExifIFD.BodySerialNumber: b'0123456789',
+        },
+        'GPS': {
+            piexif.GPSIFD.GPSLatitudeRef: b'N',
+            piexif.GPSIFD.GPSLatitude: ((39, 1), (54, 1), (2700, 100)),
+        },
+        '1st': {
+            piexif.ImageIFD.JPEGInterchangeFormat: 0,
+            piexif.ImageIFD.JPEGInterchangeFormatLength: 0,
+        },
+        'Interop': {},
+        'thumbnail': thumbnail.getvalue(),
+    }
+
+
+def private_exif():
+    return piexif.dump(private_exif_dict())
+
+
+def pixels(path):
+    """解码后的 (模式, 尺寸, 像素字节)"""
+    with Image.open(path) as image:
+        return image.mode, image.size, image.tobytes()
+
+
+def load_exif(path):
+    """文件中的 EXIF（piexif 字典），没有时返回 None"""
+    with Image.open(path) as image:
+        exif = image.info.get('exif')
+    return piexif.load(exif) if exif else None
+
+
+def png_chunks(path):
+    """PNG 文件的 [(类型, 数据)]"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    chunks = []
+    pos = 8
+    while pos < len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        chunks.append((chunk_type, data[pos + 8:pos + 8 + length]))
+        pos += 12 + length
+    return chunks
+
+
+def webp_chunks(path):
+    """WebP 文件的 RIFF 总长度和 [(FourCC, 数据)]"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    riff_size = struct.unpack('<I', data[4:8])[0]
+    chunks = []
+    pos = 12
+    while pos + 8 <= len(data):
+        fourcc, size = struct.unpack('<4sI', data[pos:pos + 8])
+        chunks.append((fourcc, data[pos + 8:pos + 8 + size]))
+        pos += 8 + size + (size & 1)
+    return riff_size, chunks
@@ -0,0 +1,92 @@
+import json
+import os
+import signal
+
+import pytest
+
+from batch_cli import expand_inputs, main
+from helpers import load_exif, make_image, private_exif
+
+
+@pytest.fixture
+def photos(tmp_path):
+    """两张带 EXIF 的 JPEG 和一个非图片文件"""
+    input_dir = tmp_path / 'photos'
+    (input_dir / 'sub').mkdir(parents=True)
+    for path in (input_dir / 'a.jpg', input_dir / 'sub' / 'b.jpg'):
+        make_image((64, 48)).save(str(path), 'JPEG', exif=private_exif())
+    (input_dir / 'notes.txt').write_text('not an image')
+    return input_dir
+
+
+def _outputs(output_dir):
+    return sorted(name for name in os.listdir(output_dir) if not name.startswith('.'))
+
+
+def test_strip_batch_succeeds(photos, tmp_path, capsys):
+    output_dir = str(tmp_path / 'out')
+
+    assert main([str(photos), '-o', output_dir, '--strip', '--executor', 'thread', '-j', '2']) == 0
+
+    outputs = _outputs(output_dir)
+    assert len(outputs) == 2
+    assert all(load_exif(os.path.join(output_dir, name)) is None for name in outputs)
+    assert "处理完成: 成功 2，失败 0" in capsys.readouterr().out
+
+
+def test_sigint_handler_is_restored(photos, tmp_path):
+    previous = signal.getsignal(signal.SIGINT)
+
+    main([str(photos), '-o', str(tmp_path / 'out'), '--strip', '--executor', 'thread'])
+
+    assert signal.getsignal(signal.SIGINT) is previous
+
+
+def test_failed_file_gives_nonzero_exit(photos, tmp_path):
+    (photos / 'broken.jpg').write_bytes(b'not an image')
+
+    assert main([str(photos), '-o', str(tmp_path / 'out'), '--strip', '--executor', 'thread']) == 1
+
+
+def test_no_inputs_gives_nonzero_exit(tmp_path, capsys):
+    assert main([str(tmp_path / 'missing' / '*.jpg'), '-o', str(tmp_path / 'out'), '--strip']) == 1
+    assert "没有找到要处理的图片" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('argv', [
+    ['--executor', 'thread'],
+    ['--crop', 'center', '--strip'],
+    ['--resize', '0x100'],
+    ['--resize', 'big'],
+    ['--strip', '-j', '0'],
+], ids=['no_operation', 'crop_without_resize', 'zero_size', 'bad_size', 'zero_workers'])
+def test_invalid_arguments_exit_with_usage_error(photos, tmp_path, argv):
+    with pytest.raises(SystemExit) as excinfo:
+        main([str(photos), '-o', str(tmp_path / 'out')] + argv)
+
+    assert excinfo.value.code == 2
+
+
+def test_plan_only_does_not_process(photos, tmp_path, capsys):
+    output_dir = str(tmp_path / 'out')
+
+    assert main([str(photos), '-o', output_dir, '--strip', '--plan-only', '--executor', 'thread']) == 0
+
+    assert _outputs(output_dir) == []
+    assert "需清除元数据 2 个" in capsys.readouterr().out
+
+
+def test_report_is_written(photos, tmp_path):
+    report_path = str(tmp_path / 'report.json')
+
+    assert main([str(photos), '-o', str(tmp_path / 'out'), '--strip', '--executor', 'thread',
+                 '--report', report_path]) == 0
+
+    with open(report_path, encoding='utf-8') as f:
+        assert json.load(f)['succeeded'] == 2
+
+
+def test_expand_inputs_skips_duplicates_and_non_images(photos):
+    files = expand_inputs([str(photos), str(photos / 'a.jpg'), str(photos / '**' / '*.jpg')])
+
+    assert sorted(files) == sorted([str(photos / 'a.jpg'), str(photos / 'sub' / 'b.jpg')])
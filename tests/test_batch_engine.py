@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+import batch_engine
+from batch_engine import EXECUTOR_THREAD, BatchJob, BatchResult, run_batch
+from batch_pipeline import BatchOptions, estimate_working_set
+from helpers import make_image
+
+
+class _Recorder:
+    """替代 run_job，记录同时执行的任务及其估算内存"""
+
+    def __init__(self, memory):
+        self.memory = memory  # job_id -> 估算内存
+        self.lock = threading.Lock()
+        self.running = set()
+        self.peak_memory = 0
+        self.overlaps = {}  # job_id -> 执行期间同时运行过的其他任务
+
+    def __call__(self, job):
+        with self.lock:
+            for other in self.running:
+                self.overlaps.setdefault(other, set()).add(job.job_id)
+                self.overlaps.setdefault(job.job_id, set()).add(other)
+            self.running.add(job.job_id)
+            self.peak_memory = max(self.peak_memory, sum(self.memory[job_id] for job_id in self.running))
+        time.sleep(0.05)
+        with self.lock:
+            self.running.discard(job.job_id)
+        return BatchResult(job.job_id, True, "处理完成", None)
+
+
+def _run(monkeypatch, memory, budget, workers=4):
+    recorder = _Recorder(memory)
+    monkeypatch.setattr(batch_engine, 'run_job', recorder)
+    monkeypatch.setattr(batch_engine, '_job_memory', lambda job: memory[job.job_id])
+    jobs = [BatchJob(job_id, job_id, 'out', BatchOptions(strip_metadata=True), None, None, output_path=job_id)
+            for job_id in memory]
+    results = list(run_batch(jobs, EXECUTOR_THREAD, workers, memory_budget=budget))
+    assert sorted(result.job_id for result in results) == sorted(memory)
+    assert all(result.ok for result in results)
+    return recorder
+
+
+def test_concurrent_jobs_stay_within_memory_budget(monkeypatch):
+    memory = {f'job{i}': 40 for i in range(8)}
+
+    recorder = _run(monkeypatch, memory, budget=100)
+
+    assert recorder.peak_memory <= 100
+    # 预算允许两个任务同时执行
+    assert recorder.peak_memory == 80
+
+
+def test_job_larger_than_budget_runs_alone(monkeypatch):
+    memory = {'small1': 10, 'huge': 500, 'small2': 10, 'small3': 10}
+
+    recorder = _run(monkeypatch, memory, budget=100)
+
+    assert not recorder.overlaps.get('huge')
+
+
+def test_jobs_without_decode_are_not_limited(monkeypatch):
+    memory = {f'job{i}': 0 for i in range(8)}
+
+    recorder = _run(monkeypatch, memory, budget=1)
+
+    assert max(len(others) for others in recorder.overlaps.values()) >= 2
+
+
+@pytest.mark.parametrize('options, expected', [
+    (BatchOptions(strip_metadata=True), 0),
+    (BatchOptions(strip_metadata=True, resize_to=(100, 50)), 400 * 200 * 4 + 100 * 50 * 4),
+])
+def test_estimate_working_set(tmp_path, options, expected):
+    path = str(tmp_path / 'image.png')
+    make_image((400, 200)).save(path, 'PNG')
+
+    assert estimate_working_set(path, options) == expected
@@ -0,0 +1,150 @@
+import os
+import sqlite3
+
+import batch_engine
+from batch_engine import EXECUTOR_THREAD, STATUS_SKIPPED, BatchJob, run_batch
+from batch_journal import BatchJournal, default_journal_path
+from batch_pipeline import BatchOptions
+from helpers import make_image, private_exif
+
+
+def _sources(directory, count):
+    paths = []
+    for i in range(count):
+        path = str(directory / f'photo{i}.jpg')
+        make_image((64, 48), seed=i).save(path, 'JPEG', exif=private_exif())
+        paths.append(path)
+    return paths
+
+
+def _jobs(paths, output_dir, options=None):
+    options = options or BatchOptions(strip_metadata=True)
+    return [BatchJob(path, path, output_dir, options, None, None) for path in paths]
+
+
+def _run(monkeypatch, jobs, journal_path):
+    """返回 ({job_id: BatchResult}, 实际执行的 job_id 列表)"""
+    executed = []
+    original_run_job = batch_engine.run_job
+
+    def counting_run_job(job):
+        executed.append(job.job_id)
+        return original_run_job(job)
+
+    monkeypatch.setattr(batch_engine, 'run_job', counting_run_job)
+    results = {result.job_id: result for result in
+               run_batch(jobs, EXECUTOR_THREAD, 2, journal_path=journal_path)}
+    return results, executed
+
+
+def test_resume_skips_finished_files(tmp_path, monkeypatch):
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+    journal_path = default_journal_path(output_dir)
+    paths = _sources(tmp_path, 3)
+
+    first, executed = _run(monkeypatch, _jobs(paths[:2], output_dir), journal_path)
+    assert sorted(executed) == paths[:2]
+    assert all(result.ok and result.status != STATUS_SKIPPED for result in first.values())
+
+    second, executed = _run(monkeypatch, _jobs(paths, output_dir), journal_path)
+    assert executed == [paths[2]]
+    for path in paths[:2]:
+        assert second[path].status == STATUS_SKIPPED
+        assert second[path].output_path == first[path].output_path
+    assert second[paths[2]].ok and second[paths[2]].status != STATUS_SKIPPED
+
+
+def test_resume_reprocesses_changed_inputs(tmp_path, monkeypatch):
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+    journal_path = default_journal_path(output_dir)
+    paths = _sources(tmp_path, 3)
+    first, _ = _run(monkeypatch, _jobs(paths, output_dir), journal_path)
+
+    # 输出被删除、源文件被修改的文件重新处理
+    os.remove(first[paths[0]].output_path)
+    make_image((80, 60), seed=9).save(paths[1], 'JPEG')
+
+    _, executed = _run(monkeypatch, _jobs(paths, output_dir), journal_path)
+    assert sorted(executed) == paths[:2]
+
+    # 操作参数变化后全部重新处理
+    _, executed = _run(monkeypatch, _jobs(paths, output_dir, BatchOptions(strip_private=True)), journal_path)
+    assert sorted(executed) == paths
+
+
+def test_failed_jobs_are_retried(tmp_path, monkeypatch):
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+    journal_path = default_journal_path(output_dir)
+    broken = tmp_path / 'broken.jpg'
+    broken.write_bytes(b'not an image')
+    jobs = _jobs([str(broken)], output_dir)
+
+    first, _ = _run(monkeypatch, jobs, journal_path)
+    assert not first[str(broken)].ok
+
+    _, executed = _run(monkeypatch, jobs, journal_path)
+    assert executed == [str(broken)]
+
+
+def test_journal_survives_reopen(tmp_path):
+    source = tmp_path / 'photo.jpg'
+    make_image((64, 48)).save(str(source), 'JPEG')
+    output = tmp_path / 'out.jpg'
+    output.write_bytes(b'done')
+    job = BatchJob(str(source), str(source), str(tmp_path), BatchOptions(strip_metadata=True), None, None)
+    journal_path = str(tmp_path / 'journal.sqlite3')
+
+    journal = BatchJournal(journal_path)
+    assert journal.completed_output(job) is None
+    journal.record(job, batch_engine.BatchResult(job.job_id, True, "处理完成", str(output)))
+    journal.close()
+
+    journal = BatchJournal(journal_path)
+    try:
+        assert journal.completed_output(job) == str(output)
+    finally:
+        journal.close()
+
+
+def test_shared_journal_keeps_output_dirs_apart(tmp_path, monkeypatch):
+    first_dir = str(tmp_path / 'first')
+    second_dir = str(tmp_path / 'second')
+    os.makedirs(first_dir)
+    os.makedirs(second_dir)
+    journal_path = str(tmp_path / 'shared.sqlite3')
+    paths = _sources(tmp_path, 2)
+
+    _run(monkeypatch, _jobs(paths, first_dir), journal_path)
+    results, executed = _run(monkeypatch, _jobs(paths, second_dir), journal_path)
+
+    # 另一个输出目录中已有的输出不算完成
+    assert sorted(executed) == paths
+    assert all(os.path.dirname(result.output_path) == second_dir for result in results.values())
+
+    # 两个目录的记录互不覆盖
+    _, executed = _run(monkeypatch, _jobs(paths, first_dir), journal_path)
+    assert executed == []
+
+
+def test_old_journal_without_output_dir_is_replaced(tmp_path):
+    journal_path = str(tmp_path / 'old.sqlite3')
+    conn = sqlite3.connect(journal_path)
+    conn.execute("CREATE TABLE jobs (source TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                 " operations TEXT NOT NULL, status TEXT NOT NULL, output_path TEXT, message TEXT,"
+                 " updated REAL NOT NULL, PRIMARY KEY (source, size, mtime_ns, operations))")
+    conn.commit()
+    conn.close()
+    source = tmp_path / 'photo.jpg'
+    make_image((64, 48)).save(str(source), 'JPEG')
+    job = BatchJob(str(source), str(source), str(tmp_path), BatchOptions(strip_metadata=True), None, None)
+
+    journal = BatchJournal(journal_path)
+    try:
+        assert journal.completed_output(job) is None
+        journal.record(job, batch_engine.BatchResult(job.job_id, True, "处理完成", str(source)))
+        assert journal.completed_output(job) == str(source)
+    finally:
+        journal.close()
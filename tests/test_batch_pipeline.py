@@ -0,0 +1,65 @@
+import filecmp
+
+import pytest
+from PIL import Image
+
+from batch_pipeline import STAGE_REWRITE, BatchOptions, build_stages, process_image
+from helpers import icc_profile, load_exif, make_image, pixels, private_exif
+
+
+@pytest.mark.parametrize('image_format', ['JPEG', 'PNG', 'WEBP'])
+@pytest.mark.parametrize('options', [
+    BatchOptions(strip_private=True),
+    BatchOptions(strip_private=True, resize_to=(60, 40)),
+    BatchOptions(strip_private=True, resize_to=(50, 50), crop=True),
+], ids=['rewrite', 'resize', 'crop'])
+def test_strip_private_keeps_icc_profile(tmp_path, image_format, options):
+    ext = image_format.lower()
+    src = str(tmp_path / f'src.{ext}')
+    dst = str(tmp_path / f'dst.{ext}')
+    make_image((120, 80)).save(src, image_format, exif=private_exif(), icc_profile=icc_profile())
+
+    assert process_image(src, dst, options) is True
+
+    with Image.open(dst) as image:
+        assert image.info.get('icc_profile') == icc_profile()
+    exif_dict = load_exif(dst)
+    assert exif_dict['GPS'] == {}
+    assert exif_dict['0th'][271] == b'Canon'
+
+
+def test_strip_metadata_drops_icc_profile_when_reencoding(tmp_path):
+    src = str(tmp_path / 'src.jpg')
+    dst = str(tmp_path / 'dst.jpg')
+    make_image((120, 80)).save(src, 'JPEG', exif=private_exif(), icc_profile=icc_profile())
+
+    assert process_image(src, dst, BatchOptions(strip_metadata=True, resize_to=(60, 40))) is True
+
+    with Image.open(dst) as image:
+        assert 'icc_profile' not in image.info
+        assert image.size == (60, 40)
+    assert load_exif(dst) is None
+
+
+@pytest.mark.parametrize('image_format', ['GIF', 'BMP'])
+def test_strip_private_copies_formats_without_exif(tmp_path, image_format):
+    ext = image_format.lower()
+    src = str(tmp_path / f'src.{ext}')
+    dst = str(tmp_path / f'dst.{ext}')
+    make_image((120, 80)).save(src, image_format)
+    options = BatchOptions(strip_private=True)
+
+    assert build_stages(options, image_format) == [STAGE_REWRITE]
+    assert process_image(src, dst, options, metadata={'Make': 'Nikon'}) is True
+    assert filecmp.cmp(src, dst, shallow=False)
+
+
+def test_strip_metadata_reencodes_gif(tmp_path):
+    src = str(tmp_path / 'src.gif')
+    dst = str(tmp_path / 'dst.gif')
+    make_image((120, 80)).save(src, 'GIF', comment=b'private comment')
+
+    assert process_image(src, dst, BatchOptions(strip_metadata=True)) is True
+
+    assert b'private' not in open(dst, 'rb').read()
+    assert pixels(dst) == pixels(src)
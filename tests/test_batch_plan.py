@@ -0,0 +1,119 @@
+import io
+import os
+
+import pytest
+
+import batch_plan
+import image_container
+from batch_pipeline import BatchOptions
+from batch_plan import (CLEAN_COPY, CLEAN_HARDLINK, PLAN_CLEAN, PLAN_ERROR, PLAN_RESIZE, PLAN_STRIP,
+                        classify_file, link_or_copy)
+from helpers import icc_profile, make_image, private_exif
+
+
+def _jpeg(path, **save_params):
+    make_image((96, 64)).save(path, 'JPEG', **save_params)
+    return str(path)
+
+
+def _jpeg_bytes():
+    data = io.BytesIO()
+    make_image((96, 64)).save(data, 'JPEG')
+    return data.getvalue()
+
+
+def test_classify_clean_file(tmp_path):
+    path = _jpeg(tmp_path / 'clean.jpg')
+
+    assert classify_file(path, BatchOptions(strip_metadata=True)) == PLAN_CLEAN
+    assert classify_file(path, BatchOptions(strip_private=True)) == PLAN_CLEAN
+    assert classify_file(path, BatchOptions(resize_to=(96, 64))) == PLAN_CLEAN
+
+
+def test_classify_file_with_metadata(tmp_path):
+    path = _jpeg(tmp_path / 'exif.jpg', exif=private_exif())
+
+    assert classify_file(path, BatchOptions(strip_metadata=True)) == PLAN_STRIP
+    assert classify_file(path, BatchOptions(strip_private=True)) == PLAN_STRIP
+    # 尺寸已符合要求，但重新编码会去掉原有元数据
+    assert classify_file(path, BatchOptions(resize_to=(96, 64))) == PLAN_STRIP
+    # 写入预设时文件不可能已经符合要求
+    assert classify_file(_jpeg(tmp_path / 'clean.jpg'), BatchOptions(strip_metadata=True),
+                         writes_metadata=True) == PLAN_STRIP
+
+
+def test_classify_at_size_keeps_icc_only_when_stripping_private(tmp_path):
+    path = _jpeg(tmp_path / 'icc.jpg', icc_profile=icc_profile())
+
+    assert classify_file(path, BatchOptions(strip_private=True, resize_to=(96, 64))) == PLAN_CLEAN
+    assert classify_file(path, BatchOptions(strip_metadata=True, resize_to=(96, 64))) == PLAN_STRIP
+
+
+@pytest.mark.parametrize('options', [
+    BatchOptions(resize_to=(48, 32)),
+    BatchOptions(resize_to=(96, 96), keep_ratio=False),
+    BatchOptions(resize_to=(50, 50), crop=True),
+])
+def test_classify_resize(tmp_path, options):
+    path = _jpeg(tmp_path / 'photo.jpg')
+
+    assert classify_file(path, options) == PLAN_RESIZE
+
+
+def test_classify_truncated_jpeg_is_error(tmp_path):
+    path = tmp_path / 'truncated.jpg'
+    path.write_bytes(_jpeg_bytes()[:22])
+
+    assert classify_file(str(path), BatchOptions(strip_metadata=True)) == PLAN_ERROR
+
+
+def test_classify_corrupt_marker_is_error(tmp_path):
+    # APP0 之后插入一个非 0xFF 字节：Pillow 会跳过并正常打开，无损清除则会报错
+    data = _jpeg_bytes()
+    path = tmp_path / 'corrupt.jpg'
+    path.write_bytes(data[:20] + b'\x00' + data[20:])
+
+    with pytest.raises(ValueError):
+        image_container.has_metadata(str(path), 'JPEG')
+    assert classify_file(str(path), BatchOptions(strip_metadata=True)) == PLAN_ERROR
+
+
+def test_classify_unreadable_file_is_error(tmp_path):
+    path = tmp_path / 'garbage.jpg'
+    path.write_bytes(b'not an image')
+
+    assert classify_file(str(path), BatchOptions(strip_metadata=True)) == PLAN_ERROR
+
+
+def test_link_or_copy_copies(tmp_path):
+    src = _jpeg(tmp_path / 'src.jpg')
+    dst = str(tmp_path / 'dst.jpg')
+
+    link_or_copy(src, dst, CLEAN_COPY)
+
+    assert open(dst, 'rb').read() == open(src, 'rb').read()
+    assert not os.path.samefile(src, dst)
+
+
+def test_link_or_copy_hardlinks_and_replaces_existing_output(tmp_path):
+    src = _jpeg(tmp_path / 'src.jpg')
+    dst = tmp_path / 'dst.jpg'
+    dst.write_bytes(b'old output')
+
+    link_or_copy(src, str(dst), CLEAN_HARDLINK)
+
+    assert os.path.samefile(src, str(dst))
+
+
+def test_link_or_copy_falls_back_to_copy(tmp_path, monkeypatch):
+    def fail_link(src, dst):
+        raise OSError('跨磁盘')
+
+    monkeypatch.setattr(batch_plan.os, 'link', fail_link)
+    src = _jpeg(tmp_path / 'src.jpg')
+    dst = str(tmp_path / 'dst.jpg')
+
+    link_or_copy(src, dst, CLEAN_HARDLINK)
+
+    assert open(dst, 'rb').read() == open(src, 'rb').read()
+    assert not os.path.samefile(src, dst)
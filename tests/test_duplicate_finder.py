@@ -0,0 +1,84 @@
+import os
+
+import duplicate_finder
+from batch_engine import EXECUTOR_THREAD, BatchJob, run_batch, split_duplicates
+from batch_pipeline import BatchOptions
+from duplicate_finder import DuplicateIndex, find_duplicates
+from helpers import make_image
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_find_duplicates_by_content(tmp_path):
+    a = _write(tmp_path / 'a.jpg', b'x' * 1000)
+    b = _write(tmp_path / 'b.jpg', b'y' * 1000)
+    a_copy = _write(tmp_path / 'a_copy.jpg', b'x' * 1000)
+    shorter = _write(tmp_path / 'shorter.jpg', b'x' * 999)
+    a_copy2 = _write(tmp_path / 'a_copy2.jpg', b'x' * 1000)
+
+    duplicates = find_duplicates((path, None) for path in (a, b, a_copy, shorter, a_copy2))
+
+    assert duplicates == {a_copy: a, a_copy2: a}
+
+
+def test_same_head_and_tail_is_not_a_duplicate(tmp_path):
+    size = duplicate_finder.PARTIAL_HASH_SIZE * 3
+    head_tail = b'h' * duplicate_finder.PARTIAL_HASH_SIZE
+    first = _write(tmp_path / 'first.bin', head_tail + b'1' * (size - 2 * len(head_tail)) + head_tail)
+    second = _write(tmp_path / 'second.bin', head_tail + b'2' * (size - 2 * len(head_tail)) + head_tail)
+
+    assert find_duplicates([(first, None), (second, None)]) == {}
+
+
+def test_unique_sizes_are_not_read(tmp_path, monkeypatch):
+    paths = [_write(tmp_path / f'{i}.jpg', b'x' * (100 + i)) for i in range(5)]
+    monkeypatch.setattr(duplicate_finder, 'partial_hash', None)
+    monkeypatch.setattr(duplicate_finder, 'hash_file', None)
+
+    index = DuplicateIndex()
+    assert [index.add(path, os.path.getsize(path)) for path in paths] == [None] * 5
+
+
+def test_unreadable_file_is_not_a_duplicate(tmp_path):
+    a = _write(tmp_path / 'a.jpg', b'x' * 100)
+    missing = str(tmp_path / 'missing.jpg')
+
+    assert find_duplicates([(a, 100), (missing, 100)]) == {}
+
+
+def test_duplicates_are_processed_once(tmp_path):
+    source = str(tmp_path / 'photo.jpg')
+    make_image((64, 48)).save(source, 'JPEG')
+    copy = str(tmp_path / 'copy.jpg')
+    with open(source, 'rb') as f, open(copy, 'wb') as g:
+        g.write(f.read())
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+    options = BatchOptions(strip_metadata=True)
+    jobs = [BatchJob(source, source, output_dir, options, None, None),
+            BatchJob(copy, copy, output_dir, options, None, None, duplicate_of=source)]
+
+    results = {result.job_id: result for result in run_batch(jobs, EXECUTOR_THREAD, 1)}
+
+    assert results[source].ok and results[copy].ok
+    # 重复文件直接复制输出，不经过处理，没有工作者标识
+    assert 'worker' in results[source].stats
+    assert 'worker' not in results[copy].stats
+    assert open(results[source].output_path, 'rb').read() == open(results[copy].output_path, 'rb').read()
+
+
+def test_split_duplicates_requires_same_operations(tmp_path):
+    options = BatchOptions(strip_metadata=True)
+    original = BatchJob('a', 'a.jpg', 'out', options, None, None)
+    same = BatchJob('b', 'b.jpg', 'out', options, None, None, duplicate_of='a')
+    other_metadata = BatchJob('c', 'c.jpg', 'out', options, {'Make': 'Nikon'}, None, duplicate_of='a')
+    missing_original = BatchJob('d', 'd.jpg', 'out', options, None, None, duplicate_of='z')
+
+    primaries, followers = split_duplicates([original, same, other_metadata, missing_original])
+
+    assert [job.job_id for job in primaries] == ['a', 'c', 'd']
+    assert all(job.duplicate_of is None for job in primaries)
+    assert [job.job_id for job in followers['a']] == ['b']
@@ -0,0 +1,181 @@
+import struct
+
+import pytest
+
+from exif_reader import parse_exif_fields, read_exif_block, read_exif_fields
+from helpers import make_image, private_exif
+
+# TIFF 数据类型 -> struct 格式字符
+_TYPE_FORMATS = {3: 'H', 4: 'I', 5: 'I'}
+
+
+def _raw_value(endian, tag_type, value):
+    """返回 (个数, 数据)"""
+    if tag_type == 2:
+        raw = value.encode() + b'\x00'
+        return len(raw), raw
+    if tag_type == 7:
+        return len(value), value
+    values = value if isinstance(value, tuple) else (value,)
+    if tag_type == 5:
+        if not isinstance(values[0], tuple):
+            values = (values,)
+        flat = [number for pair in values for number in pair]
+        return len(values), struct.pack(f'{endian}{len(flat)}I', *flat)
+    return len(values), struct.pack(f'{endian}{len(values)}{_TYPE_FORMATS[tag_type]}', *values)
+
+
+def build_tiff(endian, ifds):
+    """按给定字节序生成 TIFF 数据
+
+    Args:
+        endian: '<'（II）或 '>'（MM）
+        ifds: {'0th'/'Exif'/'GPS': [(标签ID, 类型, 值)]}，子 IFD 指针自动加入 0th
+    """
+    entries = {name: list(items) for name, items in ifds.items()}
+    entries.setdefault('0th', [])
+    pointers = {'Exif': 0x8769, 'GPS': 0x8825}
+    for name, tag_id in pointers.items():
+        if name in entries:
+            entries['0th'].append((tag_id, 4, 0))
+    order = [name for name in ('0th', 'Exif', 'GPS') if name in entries]
+
+    def ifd_size(items):
+        data_size = 0
+        for _, tag_type, value in items:
+            raw = _raw_value(endian, tag_type, value)[1]
+            if len(raw) > 4:
+                data_size += len(raw) + (len(raw) & 1)
+        return 2 + 12 * len(items) + 4 + data_size
+
+    offsets = {}
+    offset = 8
+    for name in order:
+        offsets[name] = offset
+        offset += ifd_size(entries[name])
+    # 偏移确定后填入子 IFD 指针
+    pointer_ifds = {tag_id: name for name, tag_id in pointers.items()}
+    entries['0th'] = [(tag_id, tag_type, offsets[pointer_ifds[tag_id]] if tag_id in pointer_ifds else value)
+                      for tag_id, tag_type, value in entries['0th']]
+
+    data = (b'II' if endian == '<' else b'MM') + struct.pack(endian + 'HI', 42, 8)
+    for name in order:
+        items = sorted(entries[name])
+        data_pos = offsets[name] + 2 + 12 * len(items) + 4
+        table = struct.pack(endian + 'H', len(items))
+        extra = b''
+        for tag_id, tag_type, value in items:
+            count, raw = _raw_value(endian, tag_type, value)
+            if len(raw) > 4:
+                field = struct.pack(endian + 'I', data_pos + len(extra))
+                extra += raw + b'\x00' * (len(raw) & 1)
+            else:
+                field = raw.ljust(4, b'\x00')
+            table += struct.pack(endian + 'HHI', tag_id, tag_type, count) + field
+        data += table + struct.pack(endian + 'I', 0) + extra
+    return data
+
+
+SAMPLE_IFDS = {
+    '0th': [(271, 2, 'Canon'), (272, 2, 'EOS R5'), (274, 3, 6)],
+    'Exif': [(33434, 5, (1, 250)), (36867, 2, '2024:01:01 12:00:00'), (37500, 7, b'\x01\x02\x03\x04\x05')],
+    'GPS': [(1, 2, 'N'), (2, 5, ((39, 1), (54, 1), (2700, 100)))],
+}
+
+
+@pytest.mark.parametrize('endian', ['<', '>'], ids=['II', 'MM'])
+def test_parse_all_fields(endian):
+    fields = parse_exif_fields(build_tiff(endian, SAMPLE_IFDS))
+
+    assert fields['Make'] == 'Canon'
+    assert fields['Model'] == 'EOS R5'
+    assert fields['Orientation'] == 6
+    assert fields['ExposureTime'] == (1, 250)
+    assert fields['DateTimeOriginal'] == '2024:01:01 12:00:00'
+    assert fields['MakerNote'] == b'\x01\x02\x03\x04\x05'
+    assert fields['GPSLatitudeRef'] == 'N'
+    assert fields['GPSLatitude'] == ((39, 1), (54, 1), (2700, 100))
+
+
+@pytest.mark.parametrize('endian', ['<', '>'], ids=['II', 'MM'])
+def test_parse_selected_fields(endian):
+    tiff_data = build_tiff(endian, SAMPLE_IFDS)
+
+    assert parse_exif_fields(tiff_data, ['Model', 'GPSLatitude', 'Unknown']) == {
+        'Model': 'EOS R5',
+        'GPSLatitude': ((39, 1), (54, 1), (2700, 100)),
+    }
+    # 只请求子 IFD 中的字段时，仍通过 0th 中的指针找到子 IFD，但不返回指针本身
+    assert parse_exif_fields(tiff_data, ['DateTimeOriginal']) == {'DateTimeOriginal': '2024:01:01 12:00:00'}
+
+
+def test_parse_without_sub_ifds():
+    tiff_data = build_tiff('<', {'0th': [(271, 2, 'Nikon')]})
+
+    assert parse_exif_fields(tiff_data, ['Make', 'DateTimeOriginal', 'GPSLatitude']) == {'Make': 'Nikon'}
+
+
+def test_parse_garbage_raises():
+    with pytest.raises(ValueError):
+        parse_exif_fields(b'garbage data')
+    with pytest.raises(ValueError):
+        parse_exif_fields(b'II*\x00')
+
+
+def test_parse_truncated_data_skips_missing_values():
+    tiff_data = build_tiff('>', SAMPLE_IFDS)
+    # IFD 偏移超出数据范围
+    assert parse_exif_fields(b'MM\x00*\x00\x00\xff\xff') == {}
+    # 截断在 0th 的数据区中：表内的短值仍可读取，指向截断部分的值被跳过
+    fields = parse_exif_fields(tiff_data[:60])
+    assert fields['Orientation'] == 6
+    assert 'Make' not in fields
+    assert 'DateTimeOriginal' not in fields
+
+
+@pytest.mark.parametrize('image_format', ['JPEG', 'PNG', 'WEBP'])
+def test_read_exif_block_from_container(tmp_path, image_format):
+    path = str(tmp_path / f'photo.{image_format.lower()}')
+    make_image().save(path, image_format, exif=private_exif())
+
+    tiff_data = read_exif_block(path)
+
+    assert tiff_data[:2] in (b'II', b'MM')
+    assert read_exif_fields(path, ['Make', 'Model', 'BodySerialNumber', 'GPSLatitudeRef']) == {
+        'Make': 'Canon',
+        'Model': 'EOS R5',
+        'BodySerialNumber': '0123456789',
+        'GPSLatitudeRef': 'N',
+    }
+
+
+@pytest.mark.parametrize('image_format', ['JPEG', 'PNG', 'WEBP', 'GIF'])
+def test_read_exif_without_exif(tmp_path, image_format):
+    path = str(tmp_path / f'photo.{image_format.lower()}')
+    make_image().save(path, image_format)
+
+    assert read_exif_block(path) is None
+    assert read_exif_fields(path) == {}
+
+
+def test_read_exif_block_truncated_or_garbage(tmp_path):
+    garbage = tmp_path / 'garbage.jpg'
+    garbage.write_bytes(b'not an image at all')
+    assert read_exif_block(str(garbage)) is None
+
+    # 截断在 APP1 段头之前
+    truncated = tmp_path / 'truncated.jpg'
+    truncated.write_bytes(b'\xff\xd8\xff\xe1\x00')
+    assert read_exif_block(str(truncated)) is None
+
+    # SOS 之后的 EXIF 不会被读到
+    path = str(tmp_path / 'photo.jpg')
+    make_image().save(path, 'JPEG')
+    with open(path, 'rb') as f:
+        data = f.read()
+    sos = data.index(b'\xff\xda')
+    late_exif = private_exif()
+    segment = b'\xff\xe1' + struct.pack('>H', len(late_exif) + 2) + late_exif
+    late = tmp_path / 'late.jpg'
+    late.write_bytes(data[:sos + 2] + segment + data[sos + 2:])
+    assert read_exif_block(str(late)) is None
@@ -0,0 +1,40 @@
+import piexif
+import pytest
+
+import exif_tags
+from helpers import private_exif_dict
+
+
+def test_remove_exif_blocks_removes_private_data_only():
+    exif_dict = private_exif_dict()
+
+    assert exif_tags.remove_exif_blocks(exif_dict, tuple(exif_tags.SELECTIVE_STRIP_BLOCKS)) is True
+
+    assert exif_dict['GPS'] == {}
+    assert piexif.ExifIFD.MakerNote not in exif_dict['Exif']
+    assert piexif.ExifIFD.BodySerialNumber not in exif_dict['Exif']
+    assert exif_dict['thumbnail'] is None
+    assert exif_dict['1st'] == {}
+    assert exif_dict['0th'][piexif.ImageIFD.Make] == b'Canon'
+    assert exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal] == b'2024:01:01 12:00:00'
+    # 结果仍可序列化
+    piexif.dump(exif_dict)
+    # 再次清除时没有变化
+    assert exif_tags.remove_exif_blocks(exif_dict, tuple(exif_tags.SELECTIVE_STRIP_BLOCKS)) is False
+
+
+@pytest.mark.parametrize('block', sorted(exif_tags.SELECTIVE_STRIP_BLOCKS))
+def test_remove_single_block(block):
+    exif_dict = private_exif_dict()
+
+    assert exif_tags.remove_exif_blocks(exif_dict, (block,)) is True
+
+    assert (exif_dict['GPS'] == {}) == (block == 'gps')
+    assert (piexif.ExifIFD.MakerNote not in exif_dict['Exif']) == (block == 'makernote')
+    assert (exif_dict['thumbnail'] is None) == (block == 'thumbnail')
+    assert (piexif.ExifIFD.BodySerialNumber not in exif_dict['Exif']) == (block == 'serial')
+
+
+def test_remove_unknown_block():
+    with pytest.raises(ValueError):
+        exif_tags.remove_exif_blocks(private_exif_dict(), ('faces',))
@@ -0,0 +1,311 @@
+import piexif
+import pytest
+from PIL import Image, PngImagePlugin
+
+import image_container
+from helpers import (icc_profile, load_exif, make_image, pixels, png_chunks, private_exif, private_exif_dict,
+                     webp_chunks)
+
+# 各种 JPEG 编码方式：名称 -> (图像模式, 保存参数)
+JPEG_VARIANTS = {
+    'baseline': ('RGB', {}),
+    'progressive': ('RGB', {'progressive': True}),
+    'cmyk': ('CMYK', {}),
+    'grayscale': ('L', {}),
+    'restart_markers': ('RGB', {'restart_marker_blocks': 1}),
+}
+
+
+def _jpeg_with_metadata(path, mode='RGB', **save_params):
+    make_image((120, 80), mode).save(path, 'JPEG', exif=private_exif(), icc_profile=icc_profile(),
+                                     comment=b'private comment', xmp=b'<x:xmpmeta>private</x:xmpmeta>',
+                                     **save_params)
+
+
+@pytest.mark.parametrize('variant', sorted(JPEG_VARIANTS))
+def test_strip_jpeg_keeps_pixels_and_removes_metadata(tmp_path, variant):
+    mode, save_params = JPEG_VARIANTS[variant]
+    src = str(tmp_path / 'src.jpg')
+    dst = str(tmp_path / 'dst.jpg')
+    _jpeg_with_metadata(src, mode, **save_params)
+
+    image_container.strip_metadata(src, dst, 'JPEG')
+
+    assert pixels(dst) == pixels(src)
+    assert not image_container.has_metadata(dst, 'JPEG')
+    with Image.open(dst) as image:
+        for key in ('exif', 'icc_profile', 'comment', 'xmp'):
+            assert key not in image.info
+    data = open(dst, 'rb').read()
+    assert b'private' not in data
+    assert b'Canon' not in data
+
+
+def test_strip_jpeg_keeps_restart_interval(tmp_path):
+    src = str(tmp_path / 'src.jpg')
+    dst = str(tmp_path / 'dst.jpg')
+    _jpeg_with_metadata(src, restart_marker_blocks=1)
+    assert b'\xff\xd0' in open(src, 'rb').read()
+
+    image_container.strip_jpeg_metadata(src, dst)
+
+    data = open(dst, 'rb').read()
+    # DRI 段和扫描数据中的 RST 标记都原样保留
+    assert b'\xff\xdd' in data
+    assert b'\xff\xd0' in data
+    assert pixels(dst) == pixels(src)
+
+
+def test_strip_cmyk_jpeg_keeps_adobe_segment(tmp_path):
+    src = str(tmp_path / 'src.jpg')
+    dst = str(tmp_path / 'dst.jpg')
+    _jpeg_with_metadata(src, 'CMYK')
+
+    image_container.strip_jpeg_metadata(src, dst)
+
+    # 没有 APP14 时 CMYK 数据会被按反相解码
+    assert b'Adobe' in open(dst, 'rb').read()
+    assert pixels(dst) == pixels(src)
+
+
+def test_strip_jpeg_keep_icc(tmp_path):
+    src = str(tmp_path / 'src.jpg')
+    dst = str(tmp_path / 'dst.jpg')
+    _jpeg_with_metadata(src)
+
+    image_container.strip_jpeg_metadata(src, dst, keep_icc=True)
+
+    with Image.open(dst) as image:
+        assert image.info.get('icc_profile') == icc_profile()
+        assert 'exif' not in image.info
+    assert image_container.has_metadata(src, 'JPEG', keep_icc=True)
+    assert not image_container.has_metadata(dst, 'JPEG', keep_icc=True)
+    assert pixels(dst) == pixels(src)
+
+
+def test_strip_jpeg_writes_new_exif(tmp_path):
+    src = str(tmp_path / 'src.jpg')
+    dst = str(tmp_path / 'dst.jpg')
+    _jpeg_with_metadata(src)
+    exif_bytes = private_exif()
+
+    image_container.strip_jpeg_metadata(src, dst, exif_bytes=exif_bytes)
+
+    assert load_exif(dst)['0th'] == load_exif(src)['0th']
+    assert pixels(dst) == pixels(src)
+
+
+def test_strip_jpeg_rejects_invalid_file(tmp_path):
+    src = tmp_path / 'src.jpg'
+    src.write_bytes(b'not a jpeg')
+    with pytest.raises(ValueError):
+        image_container.strip_jpeg_metadata(str(src), str(tmp_path / 'dst.jpg'))
+
+
+def _png_with_metadata(path, mode='RGB'):
+    info = PngImagePlugin.PngInfo()
+    info.add_text('Comment', 'private comment')
+    info.add_text('Author', 'private author', zip=True)
+    info.add_itxt('Description', 'private description', lang='en')
+    make_image((120, 80), mode).save(path, 'PNG', pnginfo=info, exif=private_exif(), icc_profile=icc_profile())
+
+
+def _idat(path):
+    return [data for chunk_type, data in png_chunks(path) if chunk_type == b'IDAT']
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L', 'P'])
+def test_strip_png_keeps_idat_and_removes_metadata(tmp_path, mode):
+    src = str(tmp_path / 'src.png')
+    dst = str(tmp_path / 'dst.png')
+    _png_with_metadata(src, mode)
+
+    image_container.strip_metadata(src, dst, 'PNG')
+
+    assert _idat(dst) == _idat(src)
+    assert pixels(dst) == pixels(src)
+    chunk_types = {chunk_type for chunk_type, _ in png_chunks(dst)}
+    assert not chunk_types & image_container.PNG_METADATA_CHUNKS
+    assert not image_container.has_metadata(dst, 'PNG')
+    assert b'private' not in open(dst, 'rb').read()
+
+
+def test_strip_png_keep_icc(tmp_path):
+    src = str(tmp_path / 'src.png')
+    dst = str(tmp_path / 'dst.png')
+    _png_with_metadata(src)
+
+    image_container.strip_png_metadata(src, dst, keep_icc=True)
+
+    chunk_types = [chunk_type for chunk_type, _ in png_chunks(dst)]
+    assert b'iCCP' in chunk_types
+    assert b'eXIf' not in chunk_types
+    with Image.open(dst) as image:
+        assert image.info.get('icc_profile') == icc_profile()
+    assert pixels(dst) == pixels(src)
+
+
+def test_strip_png_writes_exif_before_idat(tmp_path):
+    src = str(tmp_path / 'src.png')
+    dst = str(tmp_path / 'dst.png')
+    _png_with_metadata(src)
+
+    image_container.strip_png_metadata(src, dst, exif_bytes=private_exif())
+
+    chunk_types = [chunk_type for chunk_type, _ in png_chunks(dst)]
+    assert chunk_types.count(b'eXIf') == 1
+    assert chunk_types.index(b'eXIf') < chunk_types.index(b'IDAT')
+    assert load_exif(dst)['GPS'] == load_exif(src)['GPS']
+    assert pixels(dst) == pixels(src)
+
+
+def test_strip_png_rejects_truncated_file(tmp_path):
+    src = tmp_path / 'src.png'
+    _png_with_metadata(str(src))
+    data = src.read_bytes()
+    src.write_bytes(data[:-12])  # 去掉 IEND
+    with pytest.raises(ValueError):
+        image_container.strip_png_metadata(str(src), str(tmp_path / 'dst.png'))
+
+
+def _webp_with_metadata(path, lossless=False):
+    make_image((120, 80)).save(path, 'WEBP', lossless=lossless, exif=private_exif(), icc_profile=icc_profile(),
+                               xmp=b'<x:xmpmeta>private</x:xmpmeta>')
+
+
+def _vp8x_flags(chunks):
+    return dict(chunks)[b'VP8X'][0]
+
+
+@pytest.mark.parametrize('lossless', [False, True])
+def test_strip_webp_removes_metadata_and_fixes_vp8x(tmp_path, lossless):
+    src = str(tmp_path / 'src.webp')
+    dst = str(tmp_path / 'dst.webp')
+    _webp_with_metadata(src, lossless)
+    _, src_chunks = webp_chunks(src)
+    assert _vp8x_flags(src_chunks) & 0x2C == 0x2C
+
+    image_container.strip_metadata(src, dst, 'WEBP')
+
+    riff_size, chunks = webp_chunks(dst)
+    fourccs = [fourcc for fourcc, _ in chunks]
+    assert not {b'EXIF', b'XMP ', b'ICCP'} & set(fourccs)
+    # ICC、EXIF、XMP 标志位都已清除
+    assert _vp8x_flags(chunks) & 0x2C == 0
+    assert riff_size == len(open(dst, 'rb').read()) - 8
+    # 图像数据块原样复制
+    image_chunk = b'VP8L' if lossless else b'VP8 '
+    assert dict(chunks)[image_chunk] == dict(src_chunks)[image_chunk]
+    assert pixels(dst) == pixels(src)
+    assert not image_container.has_metadata(dst, 'WEBP')
+
+
+def test_strip_webp_keep_icc(tmp_path):
+    src = str(tmp_path / 'src.webp')
+    dst = str(tmp_path / 'dst.webp')
+    _webp_with_metadata(src)
+
+    image_container.strip_webp_metadata(src, dst, keep_icc=True)
+
+    _, chunks = webp_chunks(dst)
+    assert b'ICCP' in dict(chunks)
+    assert _vp8x_flags(chunks) & 0x2C == 0x20
+    with Image.open(dst) as image:
+        assert image.info.get('icc_profile') == icc_profile()
+    assert pixels(dst) == pixels(src)
+
+
+def test_strip_webp_writes_new_exif(tmp_path):
+    src = str(tmp_path / 'src.webp')
+    dst = str(tmp_path / 'dst.webp')
+    _webp_with_metadata(src)
+
+    image_container.strip_webp_metadata(src, dst, exif_bytes=private_exif())
+
+    riff_size, chunks = webp_chunks(dst)
+    assert _vp8x_flags(chunks) & 0x2C == 0x08
+    assert riff_size == len(open(dst, 'rb').read()) - 8
+    assert load_exif(dst)['0th'] == load_exif(src)['0th']
+    assert pixels(dst) == pixels(src)
+
+
+def test_strip_simple_webp_cannot_add_exif(tmp_path):
+    src = str(tmp_path / 'src.webp')
+    make_image((120, 80)).save(src, 'WEBP')
+    _, chunks = webp_chunks(src)
+    assert b'VP8X' not in dict(chunks)
+
+    image_container.strip_webp_metadata(src, str(tmp_path / 'dst.webp'))
+    assert pixels(str(tmp_path / 'dst.webp')) == pixels(src)
+    with pytest.raises(ValueError):
+        image_container.strip_webp_metadata(src, str(tmp_path / 'dst.webp'), exif_bytes=private_exif())
+
+
+def _updated_exif_dict():
+    exif_dict = private_exif_dict()
+    exif_dict['0th'][piexif.ImageIFD.Make] = b'Nikon'
+    exif_dict['0th'][piexif.ImageIFD.Artist] = b'Someone'
+    return exif_dict
+
+
+@pytest.mark.parametrize('image_format, make_source', [
+    ('JPEG', _jpeg_with_metadata),
+    ('PNG', _png_with_metadata),
+    ('WEBP', _webp_with_metadata),
+])
+def test_replace_exif_round_trip(tmp_path, image_format, make_source):
+    ext = image_format.lower()
+    src = str(tmp_path / f'src.{ext}')
+    dst = str(tmp_path / f'dst.{ext}')
+    back = str(tmp_path / f'back.{ext}')
+    make_source(src)
+    original = open(src, 'rb').read()
+    exif_bytes = piexif.dump(_updated_exif_dict())
+
+    image_container.replace_exif(src, dst, image_format, exif_bytes)
+
+    assert load_exif(dst) == piexif.load(exif_bytes)
+    assert pixels(dst) == pixels(src)
+    with Image.open(dst) as image:
+        # EXIF 以外的元数据原样保留
+        assert image.info.get('icc_profile') == icc_profile()
+
+    # 换回原来的 EXIF 后与原文件的 EXIF 相同
+    image_container.replace_exif(dst, back, image_format, piexif.dump(load_exif(src)))
+    assert load_exif(back)['0th'] == load_exif(src)['0th']
+    assert pixels(back) == pixels(src)
+    assert open(src, 'rb').read() == original
+
+
+@pytest.mark.parametrize('image_format, make_source', [
+    ('JPEG', _jpeg_with_metadata),
+    ('PNG', _png_with_metadata),
+    ('WEBP', _webp_with_metadata),
+])
+def test_replace_exif_with_empty_bytes_removes_exif(tmp_path, image_format, make_source):
+    ext = image_format.lower()
+    src = str(tmp_path / f'src.{ext}')
+    dst = str(tmp_path / f'dst.{ext}')
+    make_source(src)
+
+    image_container.replace_exif(src, dst, image_format, b'')
+
+    assert load_exif(dst) is None
+    assert pixels(dst) == pixels(src)
+    if image_format == 'WEBP':
+        riff_size, chunks = webp_chunks(dst)
+        assert _vp8x_flags(chunks) & 0x08 == 0
+        assert riff_size == len(open(dst, 'rb').read()) - 8
+
+
+def test_replace_jpeg_exif_keeps_trailing_data(tmp_path):
+    src = tmp_path / 'src.jpg'
+    dst = str(tmp_path / 'dst.jpg')
+    _jpeg_with_metadata(str(src))
+    # EOI 之后附加的数据（如 MPF 附加图像）
+    src.write_bytes(src.read_bytes() + b'trailing image')
+
+    image_container.replace_jpeg_exif(str(src), dst, private_exif())
+
+    assert open(dst, 'rb').read().endswith(b'trailing image')
+    assert pixels(dst) == pixels(str(src))
@@ -0,0 +1,131 @@
+import pytest
+from PIL import Image
+
+from image_metadata_editor import RESIZE_BALANCED, RESIZE_BEST, RESIZE_FAST, ImageMetadataEditor, fit_size
+from helpers import icc_profile, load_exif, make_image, pixels, private_exif
+
+
+def _jpeg(path):
+    make_image((120, 80)).save(path, 'JPEG', exif=private_exif(), icc_profile=icc_profile())
+
+
+def test_update_metadata_splices_exif_without_reencoding(tmp_path):
+    path = str(tmp_path / 'photo.jpg')
+    _jpeg(path)
+    before = pixels(path)
+    scan_data = open(path, 'rb').read().split(b'\xff\xda', 1)[1]
+
+    editor = ImageMetadataEditor(path)
+    assert editor.update_metadata({'Make': 'Nikon', 'Artist': 'Someone'}) is True
+    editor.image.close()
+
+    exif_dict = load_exif(path)
+    assert exif_dict['0th'][271] == b'Nikon'
+    assert exif_dict['0th'][315] == b'Someone'
+    # 原有的其他 EXIF 字段和 ICC 保留
+    assert exif_dict['0th'][272] == b'EOS R5'
+    with Image.open(path) as image:
+        assert image.info.get('icc_profile') == icc_profile()
+    assert pixels(path) == before
+    assert open(path, 'rb').read().split(b'\xff\xda', 1)[1] == scan_data
+
+
+def test_update_metadata_png(tmp_path):
+    path = str(tmp_path / 'image.png')
+    make_image((120, 80)).save(path, 'PNG')
+    before = pixels(path)
+
+    editor = ImageMetadataEditor(path)
+    assert editor.update_metadata({'Make': 'Nikon'}) is True
+    editor.image.close()
+
+    assert load_exif(path)['0th'][271] == b'Nikon'
+    assert pixels(path) == before
+
+
+def test_strip_selected_metadata_keeps_other_metadata(tmp_path):
+    path = str(tmp_path / 'photo.jpg')
+    output = str(tmp_path / 'clean.jpg')
+    _jpeg(path)
+    original = open(path, 'rb').read()
+
+    editor = ImageMetadataEditor(path)
+    assert editor.strip_selected_metadata(('gps', 'serial'), output_path=output) is True
+    editor.image.close()
+
+    exif_dict = load_exif(output)
+    assert exif_dict['GPS'] == {}
+    assert 42033 not in exif_dict['Exif']  # BodySerialNumber
+    assert 37500 in exif_dict['Exif']  # MakerNote
+    assert exif_dict['0th'][271] == b'Canon'
+    with Image.open(output) as image:
+        assert image.info.get('icc_profile') == icc_profile()
+    assert pixels(output) == pixels(path)
+    assert open(path, 'rb').read() == original
+
+
+def test_strip_selected_metadata_in_place(tmp_path):
+    path = str(tmp_path / 'photo.png')
+    make_image((120, 80)).save(path, 'PNG', exif=private_exif())
+    before = pixels(path)
+
+    editor = ImageMetadataEditor(path)
+    assert editor.strip_selected_metadata() is True
+    editor.image.close()
+
+    exif_dict = load_exif(path)
+    assert exif_dict['GPS'] == {}
+    assert 37500 not in exif_dict['Exif']
+    assert pixels(path) == before
+
+
+def test_strip_selected_metadata_rejects_gif(tmp_path):
+    path = str(tmp_path / 'image.gif')
+    make_image((120, 80)).save(path, 'GIF')
+
+    editor = ImageMetadataEditor(path)
+    result = editor.strip_selected_metadata()
+    editor.image.close()
+
+    assert isinstance(result, str)
+
+
+@pytest.mark.parametrize('new_size, keep_ratio', [((203, 150), True), ((97, 61), False)])
+def test_resize_modes_give_same_dimensions(tmp_path, new_size, keep_ratio):
+    sizes = {}
+    for mode in (RESIZE_BEST, RESIZE_BALANCED, RESIZE_FAST):
+        path = str(tmp_path / f'{mode}.jpg')
+        make_image((1601, 1067)).save(path, 'JPEG')
+        editor = ImageMetadataEditor(path)
+        assert editor.resize_image(new_size, keep_ratio=keep_ratio, resize_mode=mode) is True
+        editor.image.close()
+        with Image.open(path) as image:
+            sizes[mode] = image.size
+
+    assert sizes[RESIZE_BALANCED] == sizes[RESIZE_FAST] == sizes[RESIZE_BEST]
+    assert sizes[RESIZE_BEST] == (fit_size((1601, 1067), new_size) if keep_ratio else new_size)
+
+
+def test_resize_does_not_shrink_editor_image(tmp_path):
+    path = str(tmp_path / 'photo.jpg')
+    make_image((1600, 1200)).save(path, 'JPEG')
+    editor = ImageMetadataEditor(path)
+
+    assert editor.resize_image((200, 150), resize_mode=RESIZE_FAST) is True
+    assert editor.image.size == (200, 150)
+    assert editor.resize_image((100, 100), resize_mode=RESIZE_FAST) is True
+    editor.image.close()
+
+    with Image.open(path) as image:
+        assert image.size == fit_size((200, 150), (100, 100))
+
+
+def test_failed_resize_keeps_editor_image_size(tmp_path):
+    path = str(tmp_path / 'photo.jpg')
+    make_image((1600, 1200)).save(path, 'JPEG')
+    editor = ImageMetadataEditor(path)
+
+    # 无效的质量参数使保存失败
+    assert editor.resize_image((200, 150), quality='bad', resize_mode=RESIZE_FAST) is not True
+    assert editor.image.size == (1600, 1200)
+    editor.image.close()
@@ -0,0 +1,33 @@
+"""大图峰值内存回归测试
+
+在 50 和 150 百万像素的生成图片上逐个执行 ImageMetadataEditor 的方法和批量处理流水线，
+检查峰值 RSS 增量和 Python 对象峰值（tracemalloc）不超过解码帧大小的规定倍数。
+每个用例在独立的子进程中运行，完整运行需要几分钟。
+"""
+import pytest
+
+import benchmark
+
+MEGAPIXELS = (50, 150)
+
+
+@pytest.fixture(scope='module', params=MEGAPIXELS, ids=lambda megapixels: f'{megapixels}MP')
+def memory_sources(request, tmp_path_factory):
+    """同一尺寸的测试图片只生成一次，返回 (工作目录, 帧大小, {格式: 路径})"""
+    size = benchmark.memory_image_size(request.param)
+    work_dir = tmp_path_factory.mktemp(f'memory_{request.param}mp')
+    sources = benchmark.prepare_memory_sources(str(work_dir), size)
+    return str(work_dir), size[0] * size[1] * 4, sources
+
+
+@pytest.mark.parametrize('case', list(benchmark.MEMORY_CASES))
+def test_peak_memory_within_limit(case, memory_sources):
+    work_dir, frame_bytes, sources = memory_sources
+    image_format, limit = benchmark.MEMORY_CASES[case][1:]
+
+    result, rss_delta, python_peak = benchmark.measure_memory_case(case, sources[image_format], work_dir)
+
+    assert result is True
+    assert python_peak <= max(benchmark.PYTHON_HEAP_LIMIT_RATIO * frame_bytes, benchmark.MEMORY_FLOOR)
+    if rss_delta is not None:
+        assert rss_delta <= max(limit * frame_bytes, benchmark.MEMORY_FLOOR)
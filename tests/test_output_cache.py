@@ -0,0 +1,109 @@
+import itertools
+import os
+
+import pytest
+
+import output_cache
+from batch_engine import BatchJob, run_job
+from batch_pipeline import BatchOptions
+from helpers import make_image
+from output_cache import CacheConfig, OutputCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """每次调用 time.time() 前进一秒，使最近使用时间严格递增"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(output_cache.time, 'time', lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = OutputCache(str(tmp_path / 'cache'), max_bytes=250)
+    yield cache
+    cache.close()
+
+
+def _output(tmp_path, name, size=100):
+    path = tmp_path / name
+    path.write_bytes(name.encode().ljust(size, b'.'))
+    return str(path)
+
+
+def _cached_keys(cache):
+    return {key for (key,) in cache._conn.execute("SELECT key FROM entries")}
+
+
+def test_eviction_keeps_total_size_within_limit(tmp_path, cache):
+    for name in ('a', 'b', 'c'):
+        cache.store(name, _output(tmp_path, name))
+
+    stats = cache.stats()
+    assert stats.total_bytes <= cache.max_bytes
+    assert _cached_keys(cache) == {'b', 'c'}
+    # 被淘汰的缓存文件已从磁盘删除
+    files = [name for _, _, names in os.walk(cache.directory) for name in names
+             if not name.startswith(output_cache.INDEX_FILE_NAME)]
+    assert len(files) == 2
+
+
+def test_fetch_refreshes_recency(tmp_path, cache):
+    cache.store('a', _output(tmp_path, 'a'))
+    cache.store('b', _output(tmp_path, 'b'))
+    assert cache.fetch('a', str(tmp_path / 'fetched'))
+
+    cache.store('c', _output(tmp_path, 'c'))
+
+    assert _cached_keys(cache) == {'a', 'c'}
+    assert (tmp_path / 'fetched').read_bytes() == (tmp_path / 'a').read_bytes()
+
+
+def test_entry_larger_than_limit_is_not_stored(tmp_path, cache):
+    cache.store('a', _output(tmp_path, 'a'))
+    cache.store('big', _output(tmp_path, 'big', size=300))
+
+    assert _cached_keys(cache) == {'a'}
+
+
+def test_stats_and_clear(tmp_path, cache):
+    cache.store('a', _output(tmp_path, 'a'))
+    assert cache.fetch('a', str(tmp_path / 'hit'))
+    assert not cache.fetch('missing', str(tmp_path / 'miss'))
+
+    stats = cache.stats()
+    assert (stats.entries, stats.total_bytes, stats.hits, stats.misses) == (1, 100, 1, 1)
+
+    cache.clear()
+    stats = cache.stats()
+    assert (stats.entries, stats.total_bytes, stats.hits, stats.misses) == (0, 0, 0, 0)
+
+
+def test_key_depends_on_content_and_options(tmp_path, cache):
+    first = str(tmp_path / 'first.png')
+    copy = str(tmp_path / 'copy.png')
+    other = str(tmp_path / 'other.png')
+    make_image((32, 32)).save(first, 'PNG')
+    make_image((32, 32)).save(copy, 'PNG')
+    make_image((32, 32), seed=1).save(other, 'PNG')
+    strip = BatchOptions(strip_metadata=True)
+
+    assert cache.key_for(first, strip) == cache.key_for(copy, strip)
+    assert cache.key_for(first, strip) != cache.key_for(other, strip)
+    assert cache.key_for(first, strip) != cache.key_for(first, BatchOptions(strip_private=True))
+    assert cache.key_for(first, strip) != cache.key_for(first, strip, metadata={'Make': 'Nikon'})
+
+
+def test_run_job_uses_cache(tmp_path):
+    source = str(tmp_path / 'photo.jpg')
+    make_image((64, 48)).save(source, 'JPEG')
+    config = CacheConfig(str(tmp_path / 'cache'), 10 * 1024 * 1024)
+    options = BatchOptions(strip_metadata=True, resize_to=(32, 24))
+
+    first = run_job(BatchJob(source, source, str(tmp_path), options, None, None,
+                             output_path=str(tmp_path / 'first.jpg'), cache=config))
+    second = run_job(BatchJob(source, source, str(tmp_path), options, None, None,
+                              output_path=str(tmp_path / 'second.jpg'), cache=config))
+
+    assert first.ok and "来自缓存" not in first.status
+    assert second.ok and "来自缓存" in second.status
+    assert open(first.output_path, 'rb').read() == open(second.output_path, 'rb').read()
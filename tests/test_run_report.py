@@ -0,0 +1,119 @@
+import csv
+import json
+
+import pytest
+
+import run_report
+from batch_engine import BatchResult
+from run_report import RunReport, StageTimer, format_report, percentile
+
+
+class FakeClock:
+    def __init__(self, *times):
+        self.times = list(times)
+
+    def __call__(self):
+        return self.times.pop(0)
+
+
+def test_stage_timer_counts_nested_time_once(monkeypatch):
+    # 外层 0~6 秒，内层 1~3 秒
+    monkeypatch.setattr(run_report.time, 'perf_counter', FakeClock(0.0, 1.0, 3.0, 6.0))
+    timer = StageTimer()
+
+    with timer.stage('outer'):
+        with timer.stage('inner'):
+            pass
+
+    assert timer.timings == {'outer': 4.0, 'inner': 2.0}
+
+
+def test_percentile():
+    values = list(range(1, 21))
+    assert percentile(values, 0.5) == 10
+    assert percentile(values, 0.95) == 19
+    assert percentile(values, 1.0) == 20
+    assert percentile([7], 0.5) == 7
+
+
+@pytest.fixture
+def report(monkeypatch):
+    """20 个成功文件（decode 0.01~0.20 秒，encode 各 0.05 秒）和 1 个失败文件，总耗时 2 秒"""
+    monkeypatch.setattr(run_report.time, 'perf_counter', FakeClock(10.0, 12.0))
+    report = RunReport()
+    for i in range(1, 21):
+        report.add(BatchResult(str(i), True, "处理完成", f'{i}.jpg',
+                               {'timings': {'decode': i / 100, 'encode': 0.05}, 'bytes_in': 100, 'bytes_out': 50}))
+    report.add(BatchResult('bad', False, "无法打开", None))
+    report.finish()
+    return report
+
+
+def test_summary_aggregates_stages(report):
+    summary = report.summary()
+
+    assert summary['files'] == 21
+    assert summary['succeeded'] == 20
+    assert summary['failed'] == 1
+    assert summary['wall_seconds'] == 2.0
+    assert summary['files_per_second'] == 10.5
+    assert summary['bytes_in'] == 2000
+    assert summary['bytes_out'] == 1000
+    decode = summary['stages']['decode']
+    assert decode['count'] == 20
+    assert decode['total_seconds'] == pytest.approx(2.1)
+    assert (decode['p50_seconds'], decode['p95_seconds'], decode['max_seconds']) == (0.1, 0.19, 0.2)
+    assert summary['stages']['encode']['total_seconds'] == pytest.approx(1.0)
+    # 按总耗时排序，decode 在前
+    assert format_report(summary).splitlines()[1].strip().startswith('decode:')
+
+
+def test_json_round_trip(report, tmp_path):
+    path = str(tmp_path / 'report.json')
+    report.write(path)
+
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == report.summary()
+
+
+def test_csv_round_trip(report, tmp_path):
+    path = str(tmp_path / 'report.csv')
+    report.write(path)
+
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['stage'] for row in rows] == ['decode', 'encode', 'total']
+    decode = rows[0]
+    assert int(decode['count']) == 20
+    assert float(decode['total_seconds']) == pytest.approx(2.1)
+    assert (float(decode['p50_seconds']), float(decode['p95_seconds']), float(decode['max_seconds'])) == \
+        (0.1, 0.19, 0.2)
+    assert int(rows[2]['count']) == 21
+    assert float(rows[2]['total_seconds']) == 2.0
+
+
+def test_prometheus_round_trip(report, tmp_path):
+    path = str(tmp_path / 'report.prom')
+    report.write(path)
+
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    samples = {}
+    for line in lines:
+        if not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    assert samples['image_batch_stage_seconds{stage="decode",quantile="0.5"}'] == 0.1
+    assert samples['image_batch_stage_seconds{stage="decode",quantile="0.95"}'] == 0.19
+    assert samples['image_batch_stage_seconds{stage="decode",quantile="1"}'] == 0.2
+    assert samples['image_batch_stage_seconds_sum{stage="decode"}'] == pytest.approx(2.1)
+    assert samples['image_batch_stage_seconds_count{stage="decode"}'] == 20
+    assert samples['image_batch_files{result="ok"}'] == 20
+    assert samples['image_batch_files{result="failed"}'] == 1
+    assert samples['image_batch_bytes{direction="in"}'] == 2000
+    assert samples['image_batch_bytes{direction="out"}'] == 1000
+    assert samples['image_batch_duration_seconds'] == 2.0
+    assert samples['image_batch_files_per_second'] == 10.5
+    # 每个指标都有 HELP 和 TYPE，临时文件已改名
+    assert sum(line.startswith('# TYPE') for line in lines) == sum(line.startswith('# HELP') for line in lines) == 6
+    assert not (tmp_path / 'report.prom.tmp').exists()
@@ -0,0 +1,69 @@
+import pytest
+
+import throughput_meter
+from batch_engine import BatchResult
+from throughput_meter import ThroughputMeter, format_duration, format_snapshot
+
+
+def _result(worker, seconds):
+    return BatchResult('job', True, "处理完成", 'out.jpg', {'timings': {'decode': seconds}, 'worker': worker})
+
+
+@pytest.fixture
+def meter(monkeypatch):
+    """从时刻 100 开始，10 个文件共 1000 字节，2 个工作者，窗口 10 秒"""
+    monkeypatch.setattr(throughput_meter.time, 'monotonic', lambda: 100.0)
+    return ThroughputMeter(total_files=10, total_bytes=1000, workers=2, window_seconds=10)
+
+
+def test_rate_and_eta_in_window(meter):
+    meter.add(_result('w1', 1.0), size=100, now=102)
+    meter.add(_result('w2', 2.0), size=100, now=104)
+    # 跳过的任务只减少剩余量
+    meter.add(BatchResult('skipped', True, "已跳过", 'out.jpg'), size=100, now=105)
+
+    # 刚开始 5 秒，窗口按实际运行时间计算
+    snapshot = meter.snapshot(now=105)
+    assert snapshot.files_per_second == pytest.approx(0.4)
+    assert snapshot.bytes_per_second == pytest.approx(40)
+    assert snapshot.eta_seconds == pytest.approx(700 / 40)
+    assert snapshot.worker_utilization == pytest.approx([0.2, 0.4])
+    assert snapshot.utilization == pytest.approx(0.3)
+
+
+def test_old_samples_leave_window(meter):
+    meter.add(_result('w1', 1.0), size=100, now=102)
+    meter.add(_result('w2', 2.0), size=100, now=104)
+
+    # 窗口为 103~113：w1 的任务已移出，w2 的任务只有 103~104 在窗口内
+    snapshot = meter.snapshot(now=113)
+    assert snapshot.files_per_second == pytest.approx(0.1)
+    assert snapshot.bytes_per_second == pytest.approx(10)
+    assert snapshot.eta_seconds == pytest.approx(800 / 10)
+    assert snapshot.worker_utilization == pytest.approx([0.0, 0.1])
+    assert snapshot.utilization == pytest.approx(0.05)
+
+
+def test_eta_without_rate_or_sizes(meter, monkeypatch):
+    assert meter.snapshot(now=101).eta_seconds is None
+
+    # 没有字节数时按文件数估算
+    by_files = ThroughputMeter(total_files=4, total_bytes=0, workers=1, window_seconds=10)
+    by_files.add(_result('w1', 0.5), now=102)
+    assert by_files.snapshot(now=104).eta_seconds == pytest.approx(3 / 0.25)
+
+    for _ in range(3):
+        by_files.add(_result('w1', 0.5), now=104)
+    assert by_files.snapshot(now=104).eta_seconds == 0.0
+
+
+def test_format_snapshot(meter):
+    assert format_duration(75) == "01:15"
+    assert format_duration(3725.4) == "1:02:05"
+
+    text = format_snapshot(meter.snapshot(now=101))
+    assert "剩余 --:--" in text
+
+    meter.add(_result('w1', 2.0), size=100, now=102)
+    text = format_snapshot(meter.snapshot(now=104))
+    assert "0.2 个/秒" in text and "剩余 00:36" in text and "利用率 25%（50%）" in text
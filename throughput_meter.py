@@ -0,0 +1,105 @@
+"""批量处理的实时吞吐量与剩余时间估算
+
+由取出结果的线程按批调用 add()，界面每次刷新时调用 snapshot() 一次，
+不需要为每个文件访问界面控件。速度按最近 window_seconds 秒内完成的文件计算，
+剩余时间按尚未处理的输入字节数估算（大文件排在后面时比按文件数估算准确）。
+"""
+import time
+from collections import deque, namedtuple
+
+# 滚动窗口长度（秒）
+DEFAULT_WINDOW_SECONDS = 10.0
+
+# 某一时刻的吞吐量
+#   eta_seconds: 预计剩余秒数，无法估算时为 None
+#   utilization: 整体利用率（0~1），即各工作者忙碌时间之和 / (工作者数 x 窗口长度)
+#   worker_utilization: 按首次出现顺序排列的各工作者利用率列表
+ThroughputSnapshot = namedtuple('ThroughputSnapshot', [
+    'files_per_second', 'bytes_per_second', 'eta_seconds', 'utilization', 'worker_utilization'])
+
+
+class ThroughputMeter:
+    """只在一个线程中使用（界面中为 Tk 主线程）"""
+
+    def __init__(self, total_files, total_bytes, workers, window_seconds=DEFAULT_WINDOW_SECONDS):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.workers = max(1, workers)
+        self.window_seconds = window_seconds
+        self.completed_files = 0
+        self.completed_bytes = 0
+        self._started = time.monotonic()
+        self._recent = deque()   # (完成时间, 输入字节数)，只保留窗口内的
+        self._busy = {}          # 工作者 -> deque((完成时间, 忙碌秒数))
+
+    def add(self, result, size=0, now=None):
+        """记录一个 BatchResult，size 为该任务的输入字节数"""
+        now = time.monotonic() if now is None else now
+        size = size or 0
+        self.completed_files += 1
+        self.completed_bytes += size
+        stats = result.stats
+        if not stats:
+            # 跳过、取消的任务只减少剩余量，不计入速度
+            return
+        self._recent.append((now, size))
+        worker = stats.get('worker')
+        if worker is not None:
+            self._busy.setdefault(worker, deque()).append((now, sum(stats['timings'].values())))
+
+    def _trim(self, now):
+        start = now - self.window_seconds
+        while self._recent and self._recent[0][0] < start:
+            self._recent.popleft()
+        for samples in self._busy.values():
+            # 保留结束时间在窗口内的任务，它们的忙碌时段可能与窗口重叠
+            while samples and samples[0][0] < start:
+                samples.popleft()
+
+    def snapshot(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._trim(now)
+        # 刚开始时窗口按实际运行时间计算
+        window = max(min(self.window_seconds, now - self._started), 1e-6)
+        window_start = now - window
+
+        files_per_second = len(self._recent) / window
+        bytes_per_second = sum(size for _, size in self._recent) / window
+
+        eta_seconds = None
+        remaining_files = self.total_files - self.completed_files
+        if remaining_files <= 0:
+            eta_seconds = 0.0
+        elif bytes_per_second > 0 and self.total_bytes:
+            eta_seconds = max(0, self.total_bytes - self.completed_bytes) / bytes_per_second
+        elif files_per_second > 0:
+            eta_seconds = remaining_files / files_per_second
+
+        worker_utilization = []
+        for samples in self._busy.values():
+            # 任务的忙碌时段视为 [完成时间 - 忙碌秒数, 完成时间]，只计与窗口重叠的部分
+            busy = sum(end - max(end - seconds, window_start) for end, seconds in samples
+                       if end - seconds < now)
+            worker_utilization.append(min(1.0, busy / window))
+        utilization = min(1.0, sum(worker_utilization) / self.workers)
+        return ThroughputSnapshot(files_per_second, bytes_per_second, eta_seconds, utilization, worker_utilization)
+
+
+def format_duration(seconds):
+    """把秒数格式化为 时:分:秒 或 分:秒"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def format_snapshot(snapshot):
+    """进度面板中显示的速度、剩余时间和利用率文字"""
+    eta = "--:--" if snapshot.eta_seconds is None else format_duration(snapshot.eta_seconds)
+    text = (f"{snapshot.files_per_second:.1f} 个/秒，{snapshot.bytes_per_second / 1024 / 1024:.1f} MB/秒，"
+            f"剩余 {eta}，利用率 {snapshot.utilization:.0%}")
+    if snapshot.worker_utilization:
+        text += "（" + " ".join(f"{value:.0%}" for value in snapshot.worker_utilization) + "）"
+    return text